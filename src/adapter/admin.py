@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from stellar_adapter.models import UserAccount, AdminAccount, Asset
+from .models import UserAccount, AdminAccount, Asset
 
 
 class CustomModelAdmin(admin.ModelAdmin):
@@ -0,0 +1,116 @@
+"""
+Daily transaction counts and volumes (DailyVolume).
+
+The ingest and send paths keep today's numbers current with small upserts. A periodic
+refresh recomputes every day from the latest aggregated day (the watermark), minus a
+lookback for late status changes, so the table stays exact even if an update was missed.
+"""
+from datetime import datetime, timedelta
+from logging import getLogger
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import DailyVolume, ReceiveTransaction, SendTransaction
+
+logger = getLogger('django')
+
+DIRECTION_MODELS = {
+    'receive': ReceiveTransaction,
+    'send': SendTransaction,
+}
+
+UPSERT_SQL = """
+INSERT INTO {table} (day, admin_account_id, currency, issuer, direction, status, count, volume)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+ON CONFLICT (day, admin_account_id, currency, issuer, direction, status)
+DO UPDATE SET count = {table}.count + EXCLUDED.count, volume = {table}.volume + EXCLUDED.volume
+"""
+
+REFRESH_SQL = """
+INSERT INTO {table} (day, admin_account_id, currency, issuer, direction, status, count, volume)
+SELECT (created AT TIME ZONE 'UTC')::date, admin_account_id, COALESCE(currency, ''), COALESCE(issuer, ''),
+       %s, COALESCE(status, ''), count(*), COALESCE(sum(amount), 0)
+FROM {source}
+WHERE created >= %s AND admin_account_id IS NOT NULL AND status IS DISTINCT FROM 'Skipped'
+GROUP BY 1, 2, 3, 4, 6
+ON CONFLICT (day, admin_account_id, currency, issuer, direction, status)
+DO UPDATE SET count = EXCLUDED.count, volume = EXCLUDED.volume
+"""
+
+
+def _day(tx):
+    return tx.created.astimezone(timezone.utc).date()
+
+
+def record_volume(tx, direction: str, status: str=None, count: int=1):
+    """
+    Add (or with a negative count, remove) a transaction to its day's aggregate.
+    """
+    if not tx.admin_account_id:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(UPSERT_SQL.format(table=DailyVolume._meta.db_table),
+                       [_day(tx), tx.admin_account_id, tx.currency or '', tx.issuer or '', direction,
+                        (tx.status if status is None else status) or '', count, tx.amount * count])
+
+
+def move_volume(tx, direction: str, old_status: str):
+    """
+    Move a transaction between status buckets after its status changed.
+    """
+    if old_status != tx.status:
+        with transaction.atomic():
+            record_volume(tx, direction, status=old_status, count=-1)
+            record_volume(tx, direction)
+
+
+def refresh_volumes(since=None):
+    """
+    Recompute all days from `since` (defaults to the watermark minus the lookback) up to today.
+    """
+    if since is None:
+        watermark = DailyVolume.objects.aggregate(day=Max('day'))['day']
+        if watermark:
+            since = watermark - timedelta(days=getattr(settings, 'DAILY_VOLUME_LOOKBACK_DAYS', 2))
+        else:
+            oldest = [m.objects.aggregate(created=Min('created'))['created'] for m in DIRECTION_MODELS.values()]
+            oldest = [created for created in oldest if created]
+            if not oldest:
+                return None
+            since = min(oldest).astimezone(timezone.utc).date()
+
+    logger.info('Refreshing daily volumes since %s' % since)
+    start = datetime(since.year, since.month, since.day, tzinfo=timezone.utc)
+
+    # A record_volume upsert can land between the delete and the insert, the recomputed
+    # numbers (which already include that transaction) replace it instead of conflicting:
+    with transaction.atomic(), connection.cursor() as cursor:
+        DailyVolume.objects.filter(day__gte=since).delete()
+        for direction, model in DIRECTION_MODELS.items():
+            cursor.execute(REFRESH_SQL.format(table=DailyVolume._meta.db_table, source=model._meta.db_table),
+                           [direction, start])
+
+    return since
+
+
+def daily_volumes(date_from=None, date_to=None, account=None, currency=None, direction=None, status=None):
+    queryset = DailyVolume.objects.all()
+    if date_from:
+        queryset = queryset.filter(day__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(day__lt=date_to)
+    if account:
+        queryset = queryset.filter(admin_account__account_id=account)
+    if currency:
+        queryset = queryset.filter(currency=currency)
+    if direction:
+        queryset = queryset.filter(direction=direction)
+    if status:
+        queryset = queryset.filter(status=status)
+
+    return queryset.order_by('day', 'currency', 'issuer', 'direction', 'status').values(
+        'day', 'admin_account__account_id', 'currency', 'issuer', 'direction', 'status', 'count', 'volume')
@@ -1,19 +1,30 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
 from logging import getLogger
-from decimal import Decimal
 
-import requests
 from django.conf import settings
-from stellar_base.address import Address
-from stellar_base.builder import Builder
-from stellar_base.exceptions import APIException
+from django.db.models import Max
 
+from .aggregates import record_volume, move_volume
+from .cache import get_balances, invalidate_balances
 from .exceptions import NotImplementedAPIError
-from .stellar_federation import get_federation_details, address_from_domain
-from .utils import to_cents, create_qr_code_url
-from.models import ReceiveTransaction, UserAccount, Asset
+from .horizon import get_horizon
+from .metrics import INGEST_LAG, RECEIVES, SEND_SUBMISSIONS
+from .registry import asset_registry
+from .stellar_federation import get_federation_details, currencies_from_domain
+from .tracing import span, current_span
+from .utils import create_qr_code_url, compact_horizon_record, horizon_datetime, parse_horizon_time, str_to_stroops, \
+    stroops_to_str
+from.models import ReceiveTransaction, UserAccount
 
 logger = getLogger('django')
 
+# Payments fetched per Horizon page (Horizon's maximum):
+PAYMENTS_PAGE_SIZE = 200
+
+# Protocol limit on operations in a single Stellar transaction:
+MAX_OPERATIONS_PER_TRANSACTION = 100
+
 
 class Interface:
     """
@@ -21,80 +32,128 @@ class Interface:
     """
     def __init__(self, account):
         self.account = account
-        if account.secret:
-            self.builder = Builder(secret=account.secret,
-                                   network=account.network)
-        self.address = Address(address=account.account_id,
-                               network=account.network)
-
-    def _get_new_receives(self):
-        # Get all stored transactions for account
-        transactions = ReceiveTransaction.filter(admin_account=self.account)
-
-        # Set the cursor according to latest stored transaction:
-        if not transactions:
-            cursor = None
-        else:
-            cursor = int(transactions.latest().data['paging_token']) + 1
-
-        # Get new transactions from the stellar network:
-        new_transactions = self._get_receives(cursor=cursor)
-
-        return new_transactions
+        self.horizon = get_horizon(account.network)
+        self._builder = None
+
+    @property
+    def builder(self):
+        # Created on first use by the send and trust paths, reads never build (or load a sequence):
+        if self._builder is None:
+            self._builder = self._new_builder()
+        return self._builder
+
+    def _new_builder(self):
+        from stellar_base.builder import Builder
+
+        # The sequence number is loaded through the pool, from the node submissions are pinned to:
+        return Builder(secret=self.account.secret,
+                       horizon=self.horizon.submit_url,
+                       network=self.account.network,
+                       sequence=self.horizon.sequence(self.account.account_id))
+
+    def _submit(self, builder):
+        with span('send.sign'):
+            builder.sign()
+            xdr = builder.gen_xdr()
+        with span('send.submit'):
+            return self.horizon.submit(xdr)
+
+    def _get_cursor(self):
+        # Paging token of the last payment page processed, or of the latest stored receive
+        # (index-only on admin_account, paging_token). Horizon cursors are exclusive so the token is used as is:
+        cursor = ReceiveTransaction.objects.filter(
+            admin_account=self.account).aggregate(cursor=Max('paging_token'))['cursor']
+        if self.account.paging_token and (cursor is None or self.account.paging_token > cursor):
+            cursor = self.account.paging_token
+        return cursor
+
+    def _get_payments(self, cursor=None):
+        # Get a page of payments after the cursor (or from the start if there is none):
+        return self.horizon.payments(self.account.account_id,
+                                     cursor=cursor,
+                                     limit=PAYMENTS_PAGE_SIZE)['_embedded']['records']
 
     def _get_receives(self, cursor=None):
-        # If cursor was specified, get all transactions after the cursor:
-        if cursor:
-            transactions = self.address.payments(cursor=cursor)['_embedded']['records']
-            print(transactions)
-            for i, tx in enumerate(transactions):
-                if tx.get('to') != self.account.account_id:
-                    transactions.pop(i)  # remove sends
-
-        # else just get all the transactions:
-        else:
-            transactions = self.address.payments()['_embedded']['records']
-            for i, tx in enumerate(transactions):
-                if tx.get('from') == self.account.account_id:
-                    transactions.pop(i)  # remove sends
-
-        return transactions
+        # Remove sends:
+        return [tx for tx in self._get_payments(cursor=cursor)
+                if tx.get('to') == self.account.account_id and tx.get('from') != self.account.account_id]
 
     def _process_receive(self, tx):
-        # Get memo:
-        details = requests.get(url=tx['_links']['transaction']['href']).json()
-        memo = details.get('memo')
-        print('memo: ' + str(memo))
-        if memo:
-            account_id = memo + '*rehive.com'
-            user_account = UserAccount.objects.get(account_id=account_id)
-            user_email = user_account.user_id  # for this implementation, user_id is the user's email
-            amount = to_cents(Decimal(tx['amount']), 7)
-
-            if tx['asset_type'] == 'native':
-                currency = 'XLM'
-                issuer = ''
-            else:
-                currency = tx['asset_code']
-                issuer_address = tx['asset_issuer']
-                issuer = Asset.objects.get(account_id=issuer_address, code=currency).issuer
-
-            # Create Transaction:
-            tx = ReceiveTransaction.objects.create(user_account=user_account,
-                                                   external_id=tx['hash'],
-                                                   recipient=user_email,
-                                                   amount=amount,
-                                                   currency=currency,
-                                                   issuer=issuer,
-                                                   status='Waiting',
-                                                   data=tx,
-                                                   metadata={'type': 'stellar'}
-                                                   )
-
-            # TODO: Move tx.upload_to_rehive() to a signal to auto-run after Transaction creation.
-            tx.upload_to_rehive()
-
-            return True
+        with span('ingest.receive', correlation_id=tx['transaction_hash'], operation_id=tx['id']):
+            # Get memo:
+            with span('ingest.memo'):
+                details = self.horizon.transaction(tx['transaction_hash'])
+            memo = details.get('memo')
+            print('memo: ' + str(memo))
+            if memo:
+                account_id = memo + '*rehive.com'
+                with span('ingest.user_account'):
+                    user_account = UserAccount.objects.filter(account_id=account_id).first()
+                amount = str_to_stroops(tx['amount'])
+                skipped = None
+
+                if tx['asset_type'] == 'native':
+                    currency = 'XLM'
+                    issuer = ''
+                else:
+                    currency = tx['asset_code']
+                    issuer = tx['asset_issuer']
+                    with span('ingest.asset'):
+                        asset = asset_registry.get(currency, issuer)
+                    if asset is None:
+                        skipped = 'untrusted asset'
+                    else:
+                        issuer = asset.issuer
+
+                if user_account is None:
+                    skipped = 'unknown memo'
+                # for this implementation, user_id is the user's email:
+                user_email = user_account.user_id if user_account else None
+
+                # Create Transaction, payments we can't credit are kept as Skipped for manual review:
+                operation_id = int(tx['id'])
+                metadata = {'type': 'stellar'}
+                if skipped:
+                    metadata.update({'skipped': skipped, 'memo': memo})
+                with span('ingest.insert'):
+                    tx = ReceiveTransaction.create_once(admin_account=self.account,
+                                                        user_account=user_account,
+                                                        external_id=tx['transaction_hash'],
+                                                        recipient=user_email,
+                                                        amount=amount,
+                                                        currency=currency,
+                                                        issuer=issuer,
+                                                        status='Skipped' if skipped else 'Waiting',
+                                                        paging_token=int(tx['paging_token']),
+                                                        operation_id=operation_id,
+                                                        ledger=details.get('ledger'),
+                                                        created=horizon_datetime(tx['created_at']),
+                                                        data=compact_horizon_record(tx),
+                                                        metadata=metadata
+                                                        )
+                    if tx is None:
+                        # Already stored by an earlier (or overlapping) run:
+                        logger.info('Receive already ingested: %s' % operation_id)
+                        return False
+
+                    if skipped:
+                        logger.warning('Skipped receive %s (%s): memo %s, %s %s' % (
+                            operation_id, skipped, memo, currency, issuer))
+                        return False
+
+                    record_volume(tx, 'receive')
+                RECEIVES.labels(currency).inc()
+                if details.get('created_at'):
+                    INGEST_LAG.observe(max(0, time.time() - parse_horizon_time(details['created_at'])))
+
+                # TODO: Move tx.upload_to_rehive() to a signal to auto-run after Transaction creation.
+                with span('ingest.rehive_upload'):
+                    tx.upload_to_rehive()
+
+                # The account balance changed, drop any cached balances:
+                invalidate_balances(self.account.account_id)
+
+                return True
 
     @staticmethod
     def _is_valid_address(address: str) -> bool:
@@ -106,19 +165,36 @@ class Interface:
 
     # This function should always be included if transactions are received to admin account and not added via webhooks:
     def process_receives(self):
-        # Get new receive transactions
-        new_transactions = self._get_new_receives()
+        # Get the next page of payments:
+        with span('ingest.payments'):
+            payments = self._get_payments(cursor=self._get_cursor())
+        receives = [tx for tx in payments
+                    if tx.get('to') == self.account.account_id and tx.get('from') != self.account.account_id]
 
         # Add each transaction to Rehive and log in transaction table:
-        for tx in new_transactions:
+        for tx in receives:
             self._process_receive(tx)
 
+        # Move past the whole page, including sends and payments without a known memo:
+        if payments:
+            self.account.paging_token = int(payments[-1]['paging_token'])
+            self.account.save(update_fields=['paging_token'])
+
+        return {'payments': len(payments),
+                'receives': len(receives),
+                'page_full': len(payments) >= PAYMENTS_PAGE_SIZE}
+
     # This function should always be included.
     def process_send(self, tx):
+        with span('send.execute', correlation_id=tx.rehive_code or str(tx.id)):
+            self._process_send(tx)
+
+    def _process_send(self, tx):
         if self._is_valid_address(tx.recipient):
             address = tx.recipient
         else:
-            federation = get_federation_details(tx.recipient)
+            with span('send.federation'):
+                federation = get_federation_details(tx.recipient)
             if federation['memo_type'] == 'text':
                 self.builder.add_text_memo(federation['memo'])
             elif federation['memo_type'] == 'id':
@@ -130,35 +206,87 @@ class Interface:
 
             address = federation['account_id']
 
-        # Create account or create payment:
-        if tx.currency == 'XLM':
-            try:
-                address_obj = self.address
-                address_obj.get()
-                self.builder.append_payment_op(address, tx.amount, 'XLM')
-            except APIException as exc:
-                if exc.status_code == 404:
-                    self.builder.append_create_account_op(address, tx.amount)
-        else:
-            # Get issuer address details:
-            issuer_address = get_issuer_address(tx.issuer, tx.currency)
+        # Amounts are stored in stroops:
+        amount = stroops_to_str(tx.amount)
 
-            address_obj = self.address
-            address_obj.get()
-            self.builder.append_payment_op(address, tx.amount, tx.currency, issuer_address)
+        # Create account or create payment:
+        with span('send.build'):
+            if tx.currency == 'XLM':
+                with span('send.account_exists'):
+                    exists = self.horizon.account_exists(address)
+                if exists:
+                    self.builder.append_payment_op(address, amount, 'XLM')
+                else:
+                    self.builder.append_create_account_op(address, amount)
+            else:
+                # Get issuer address details:
+                issuer_address = self.get_issuer_address(tx.issuer, tx.currency)
+                self.builder.append_payment_op(address, amount, tx.currency, issuer_address)
 
         try:
-            self.builder.sign()
-            self.builder.submit()
+            response = self._submit(self.builder)
+            if response.get('hash'):
+                current_span().set('stellar.hash', response['hash'])
+                old_status = tx.status
+                tx.status = 'Complete'
+                tx.data = response
+                tx.save(update_fields=['status', 'data'])
+                move_volume(tx, 'send', old_status)
+                SEND_SUBMISSIONS.labels('success').inc()
+            else:
+                SEND_SUBMISSIONS.labels('failed').inc()
+                logger.info('Failed send transaction: %s' % (response,))
+                self._fail_send(tx, response)
         except Exception as exc:
-            print(exc.payload)
+            SEND_SUBMISSIONS.labels('error').inc()
+            logger.exception(exc)
+            self._fail_send(tx, {'error': str(exc)})
+        finally:
+            invalidate_balances(self.account.account_id)
 
-    def get_balance(self):
-        address = self.address
-        address.get()
-        for balance in address.balances:
+    @staticmethod
+    def _fail_send(tx, data: dict):
+        # Rejected or errored submissions are no longer in flight, keep the reason for manual review:
+        old_status = tx.status
+        tx.status = 'Failed'
+        tx.data = data
+        tx.save(update_fields=['status', 'data'])
+        move_volume(tx, 'send', old_status)
+
+    def _get_balances(self):
+        # Single account fetch for all balances:
+        account = self.horizon.account(self.account.account_id)
+
+        balances = []
+        for balance in account['balances']:
             if balance['asset_type'] == 'native':
-                return to_cents(Decimal(balance['balance']), 7)
+                currency = 'XLM'
+                issuer = ''
+                issuer_address = ''
+                metadata = {}
+            else:
+                currency = balance['asset_code']
+                issuer_address = balance['asset_issuer']
+                asset = asset_registry.get(currency, issuer_address)
+                issuer = asset.issuer if asset else issuer_address
+                metadata = asset.metadata if asset else {}
+
+            balances.append({'currency': currency,
+                             'issuer': issuer,
+                             'issuer_address': issuer_address,
+                             'balance': str_to_stroops(balance['balance']),
+                             'limit': balance.get('limit'),
+                             'metadata': metadata})
+
+        return balances
+
+    def get_balances(self):
+        return get_balances(self.account.account_id, self._get_balances)
+
+    def get_balance(self):
+        for balance in self.get_balances():
+            if balance['currency'] == 'XLM' and not balance['issuer']:
+                return balance['balance']
 
     def get_issuer_address(self, issuer, asset_code):
         if self._is_valid_address(issuer):
@@ -167,7 +295,7 @@ class Interface:
             if '*' in issuer:
                 address = get_federation_details(issuer)['account_id']
             else:  # assume it is an anchor domain
-                address = address_from_domain(issuer, asset_code)
+                address = asset_registry.address_for_domain(asset_code, issuer)
 
         return address
 
@@ -177,10 +305,69 @@ class Interface:
         self.builder.append_trust_op(address, asset_code)
 
         try:
-            self.builder.sign()
-            self.builder.submit()
+            self._submit(self.builder)
         except Exception as exc:
-            print(exc.payload)
+            logger.exception(exc)
+        finally:
+            invalidate_balances(self.account.account_id)
+
+    def resolve_issuer_addresses(self, assets):
+        """
+        Resolve (code, issuer) pairs to issuer addresses concurrently, fetching
+        each anchor domain's stellar.toml only once. Unresolvable issuers map to None.
+        """
+        domains = {issuer for code, issuer in assets
+                   if not self._is_valid_address(issuer) and '*' not in issuer}
+        federated = {issuer for code, issuer in assets if '*' in issuer}
+
+        def safe(func, arg):
+            try:
+                return func(arg)
+            except Exception as exc:
+                logger.exception(exc)
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, min(16, len(domains) + len(federated)))) as executor:
+            currencies = dict(zip(domains, executor.map(lambda d: safe(currencies_from_domain, d), domains)))
+            federations = dict(zip(federated, executor.map(lambda f: safe(get_federation_details, f), federated)))
+
+        addresses = {}
+        for code, issuer in assets:
+            if self._is_valid_address(issuer):
+                addresses[(code, issuer)] = issuer
+            elif issuer in federations:
+                addresses[(code, issuer)] = (federations[issuer] or {}).get('account_id')
+            else:
+                addresses[(code, issuer)] = (currencies[issuer] or {}).get(code)
+
+        return addresses
+
+    def trust_issuers(self, assets):
+        """
+        Trust many (code, issuer_address) pairs, packing the change_trust operations into
+        as few transactions as possible. Returns the pairs that were submitted successfully.
+        """
+        trusted = []
+        for i in range(0, len(assets), MAX_OPERATIONS_PER_TRANSACTION):
+            batch = assets[i:i + MAX_OPERATIONS_PER_TRANSACTION]
+            logger.info('Trusting %s assets in one transaction.' % len(batch))
+
+            # Fresh builder per transaction so each picks up the next sequence number:
+            builder = self._new_builder()
+            for code, address in batch:
+                builder.append_trust_op(address, code)
+
+            try:
+                response = self._submit(builder)
+                if response.get('hash'):
+                    trusted.extend(batch)
+                else:
+                    logger.info('Failed trust transaction: %s' % (response,))
+            except Exception as exc:
+                logger.exception(exc)
+
+        invalidate_balances(self.account.account_id)
+        return trusted
 
     # Generate new crypto address/ account id
     @staticmethod
@@ -192,6 +379,7 @@ class Interface:
     def get_account_details(self):
         address = self.account.account_id
         qr_code = create_qr_code_url('stellar:' + str(address))
-        return {'account_id': address, 'metadata': {'qr_code': qr_code}}
+        qr_code_svg = create_qr_code_url('stellar:' + str(address), fmt='svg')
+        return {'account_id': address, 'metadata': {'qr_code': qr_code, 'qr_code_svg': qr_code_svg}}
 
 
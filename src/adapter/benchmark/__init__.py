@@ -0,0 +1,5 @@
+"""
+Throughput benchmark of the adapter against local stand-ins for Horizon and Rehive.
+
+Run with `manage.py benchmark`, see runner.py.
+"""
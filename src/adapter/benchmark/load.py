@@ -0,0 +1,260 @@
+"""
+Load test of the public federation endpoint and the operating balance/account endpoints
+served by gunicorn.
+
+For every gunicorn configuration (worker class, workers, threads) a server is started
+against the load test database (gevent workers serve config.async_wsgi), with Horizon pointed at a local FakeHorizon. Concurrency
+is then stepped up, each step running for a fixed duration with a mix of:
+
+- federation hits (seeded user accounts), misses and malformed queries
+- operating balance and account requests
+
+Each step reports throughput, latency percentiles, status codes per request kind and the
+number of database connections the server held (from pg_stat_activity).
+"""
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import quote
+
+import requests
+from django.conf import settings
+from django.db import connections
+from stellar_base.keypair import Keypair
+
+from ..models import AdminAccount, UserAccount
+from .runner import percentile, git_commit
+from .servers import FakeHorizon
+
+# Relative weight of each kind of request in the mix:
+DEFAULT_MIX = {
+    'federation_hit': 60,
+    'federation_miss': 20,
+    'federation_malformed': 5,
+    'balance': 10,
+    'account': 5,
+}
+
+SEED_BATCH_SIZE = 10000
+
+
+def seed_user_accounts(count: int, domain: str='rehive.com'):
+    for start in range(0, count, SEED_BATCH_SIZE):
+        UserAccount.bulk_get_or_create([('user%s@example.com' % i, 'user%s*%s' % (i, domain))
+                                        for i in range(start, min(count, start + SEED_BATCH_SIZE))])
+
+
+def seed_admin_account() -> AdminAccount:
+    account = AdminAccount.objects.filter(default=True).first()
+    if account is None:
+        keypair = Keypair.random()
+        account = AdminAccount.objects.create(name='hotwallet', default=True, network='testnet',
+                                              secret=keypair.seed().decode(), account_id=keypair.address().decode())
+    return account
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+# Worker classes that serve the cooperative entry point, with worker connections instead of threads:
+ASYNC_WORKER_CLASSES = ('gevent',)
+
+
+class GunicornServer:
+    def __init__(self, worker_class: str='sync', workers: int=None, threads: int=1, worker_connections: int=200,
+                 env: dict=None):
+        self.worker_class = worker_class
+        self.workers = workers or os.cpu_count() * 2 + 1
+        self.threads = threads
+        self.worker_connections = worker_connections
+        self.env = env or {}
+        self.port = _free_port()
+        self.process = None
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:%s' % self.port
+
+    def __enter__(self):
+        if self.worker_class in ASYNC_WORKER_CLASSES:
+            app = 'config.async_wsgi:application'
+            options = ['--worker-connections', str(self.worker_connections)]
+            env = dict(self.env, HTTP_POOL_MAXSIZE=str(self.worker_connections))
+        else:
+            app = 'config.wsgi:application'
+            options = ['--threads', str(self.threads)]
+            env = self.env
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', app, '--config', 'file:config/gunicorn.py',
+             '--bind', '127.0.0.1:%s' % self.port, '--worker-class', self.worker_class,
+             '--workers', str(self.workers), '--log-level', 'warning'] + options,
+            cwd=settings.BASE_DIR, env=dict(os.environ, **env))
+
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError('gunicorn exited with status %s' % self.process.returncode)
+            try:
+                requests.get(self.url + '/api/1/federation/', timeout=1)
+                return self
+            except requests.exceptions.RequestException:
+                time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError('gunicorn did not start')
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class RequestMix:
+    def __init__(self, users: int, token: str, mix: dict=None):
+        self.users = users
+        self.headers = {'Authorization': 'Secret ' + token}
+        mix = mix or DEFAULT_MIX
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+
+    def next(self, rand: random.Random):
+        kind = self._choice(rand)
+        if kind == 'federation_hit':
+            address = 'user%s*rehive.com' % rand.randrange(self.users)
+            return kind, '/api/1/federation/?type=name&q=' + quote(address), None
+        if kind == 'federation_miss':
+            address = 'nobody%s*rehive.com' % rand.randrange(self.users)
+            return kind, '/api/1/federation/?type=name&q=' + quote(address), None
+        if kind == 'federation_malformed':
+            return kind, rand.choice(['/api/1/federation/', '/api/1/federation/?type=name',
+                                      '/api/1/federation/?type=id&q=1', '/api/1/federation/?q=%00']), None
+        if kind == 'balance':
+            return kind, '/api/1/operating/balance/', self.headers
+        return kind, '/api/1/operating/account/', self.headers
+
+    def _choice(self, rand):
+        point = rand.random() * sum(self.weights)
+        for kind, weight in zip(self.kinds, self.weights):
+            point -= weight
+            if point < 0:
+                return kind
+        return self.kinds[-1]
+
+
+def count_connections(alias: str='default') -> int:
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() '
+                       'AND pid != pg_backend_pid()')
+        return cursor.fetchone()[0]
+
+
+def run_step(base_url: str, concurrency: int, duration: float, mix: RequestMix) -> dict:
+    latencies = []
+    statuses = {}
+    failures = Counter()
+    lock = threading.Lock()
+    stop = time.time() + duration
+
+    def client(seed):
+        rand = random.Random(seed)
+        session = requests.Session()
+        own_latencies, own_statuses = [], Counter()
+        while time.time() < stop:
+            kind, path, headers = mix.next(rand)
+            start = time.perf_counter()
+            try:
+                status = session.get(base_url + path, headers=headers, timeout=30).status_code
+            except requests.exceptions.RequestException as exc:
+                status = type(exc).__name__
+            own_latencies.append(time.perf_counter() - start)
+            own_statuses[(kind, status)] += 1
+        with lock:
+            latencies.extend(own_latencies)
+            for (kind, status), count in own_statuses.items():
+                statuses.setdefault(kind, Counter())[str(status)] += count
+                if not isinstance(status, int) or status >= 500:
+                    failures[kind] += count
+
+    db_connections = []
+    sampling = threading.Event()
+
+    def sample_connections():
+        try:
+            while not sampling.wait(0.5):
+                db_connections.append(count_connections())
+        finally:
+            connections['default'].close()
+
+    sampler = threading.Thread(target=sample_connections, daemon=True)
+    sampler.start()
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    sampling.set()
+    sampler.join()
+
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'per_second': len(latencies) / duration,
+        'p50': percentile(latencies, 50),
+        'p90': percentile(latencies, 90),
+        'p99': percentile(latencies, 99),
+        'failures': sum(failures.values()),
+        'statuses': {kind: dict(counts) for kind, counts in statuses.items()},
+        'db_connections_max': max(db_connections) if db_connections else None,
+        'db_connections_mean': sum(db_connections) / len(db_connections) if db_connections else None,
+    }
+
+
+class LoadTest:
+    def __init__(self, users: int=100000, configs=None, concurrency=(1, 4, 16, 64, 128),
+                 step_duration: float=20, horizon_latency: float=0.05, mix: dict=None):
+        self.users = users
+        self.configs = configs or [{'worker_class': 'sync'}]
+        self.concurrency = concurrency
+        self.step_duration = step_duration
+        self.horizon_latency = horizon_latency
+        self.mix = mix
+
+    def run(self) -> dict:
+        seed_user_accounts(self.users)
+        seed_admin_account()
+        token = os.environ.get('ADAPTER_TOKEN', 'secret')
+        mix = RequestMix(self.users, token, self.mix)
+
+        results = []
+        with FakeHorizon(latency=self.horizon_latency) as horizon:
+            env = {
+                'POSTGRES_DB': connections['default'].settings_dict['NAME'],
+                'HORIZON_TESTNET_ENDPOINTS': horizon.url,
+                'HORIZON_PUBLIC_ENDPOINTS': horizon.url,
+                'STELLAR_RECEIVE_ADDRESS': Keypair.random().address().decode(),
+                'ADAPTER_TOKEN': token,
+            }
+            for config in self.configs:
+                server = GunicornServer(env=env, **config)
+                with server:
+                    steps = [run_step(server.url, c, self.step_duration, mix) for c in self.concurrency]
+                results.append({'worker_class': server.worker_class, 'workers': server.workers,
+                                'threads': server.threads, 'worker_connections': server.worker_connections,
+                                'steps': steps})
+        connections['default'].close()
+
+        return {
+            'commit': git_commit(),
+            'config': {'users': self.users, 'step_duration': self.step_duration,
+                       'horizon_latency': self.horizon_latency, 'mix': self.mix or DEFAULT_MIX},
+            'results': results,
+        }
@@ -0,0 +1,275 @@
+"""
+End-to-end throughput benchmark.
+
+Seeds an admin account, user accounts and a payment stream, points Horizon, the anchor
+federation server and Rehive at the local stand-ins and drives the real code paths:
+
+- receive: AdminAccount.process_receive_transactions, page by page, over a synthetic stream
+- rehive: the create_rehive_receive task for every stored receive, or the drainer (drainer.py)
+- federation: get_federation_details
+- send: the process_send task (federation, existence check, build, sign, submit)
+
+Each operation reports its rate, p50/p99 latency, database queries per operation and
+errors. The startup time and RSS of a fresh process (django.setup() plus the adapter urls
+and tasks) is reported for the full and the lean settings profiles. Reports are JSON so
+that runs on different commits can be compared.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from stellar_base.keypair import Keypair
+
+from .. import horizon
+from ..drainer import RehiveDrainer
+from ..models import AdminAccount, ReceiveTransaction, SendTransaction
+from ..stellar_federation import STELLAR_TOML_KEY, get_federation_details
+from ..tasks import create_rehive_receive, process_send
+from .servers import FakeHorizon, FakeRehive
+from .stream import SyntheticPayments
+
+FEDERATION_DOMAIN = 'benchmark.example'
+
+STARTUP_PROFILES = ('config.settings', 'config.settings_adapter')
+
+# Run in a fresh interpreter, prints seconds to a ready process and its peak RSS in kilobytes:
+STARTUP_SCRIPT = '''
+import json, resource, time
+start = time.perf_counter()
+import django
+django.setup()
+import adapter.urls, adapter.tasks
+print(json.dumps([time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss]))
+'''
+
+
+def percentile(samples, percent: float):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+class Measurement:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies = []
+        self.items = 0
+        self.queries = 0
+        self.errors = 0
+
+    @contextmanager
+    def measure(self, items: int=1):
+        """
+        Time one call handling `items` operations. Errors are counted, not raised.
+        """
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            try:
+                yield
+            except Exception:
+                self.errors += 1
+        self.latencies.append(time.perf_counter() - start)
+        self.items += items
+        self.queries += len(queries.captured_queries)
+
+    def summary(self) -> dict:
+        seconds = sum(self.latencies)
+        return {
+            'operations': self.items,
+            'calls': len(self.latencies),
+            'seconds': seconds,
+            'per_second': self.items / seconds if seconds else None,
+            'p50': percentile(self.latencies, 50),
+            'p99': percentile(self.latencies, 99),
+            'queries_per_operation': self.queries / self.items if self.items else None,
+            'errors': self.errors,
+        }
+
+
+class Benchmark:
+    def __init__(self, receives: int=1000, sends: int=200, federation: int=500, users: int=100,
+                 latency: float=0, jitter: float=0, error_rate: float=0, seed: int=0, mix: dict=None,
+                 rehive: str='tasks'):
+        """
+        `receives` is the number of transactions in the synthetic payment stream (see stream.py).
+        """
+        self.receives = receives
+        self.sends = sends
+        self.federation = federation
+        self.users = users
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.mix = mix
+        self.rehive = rehive
+        self.results = {}
+
+    @property
+    def config(self) -> dict:
+        return {'receives': self.receives, 'sends': self.sends, 'federation': self.federation,
+                'users': self.users, 'latency': self.latency, 'jitter': self.jitter, 'error_rate': self.error_rate,
+                'seed': self.seed, 'mix': self.mix, 'rehive': self.rehive}
+
+    def setup(self):
+        keypair = Keypair.random()
+        self.account = AdminAccount.objects.create(name='hotwallet', default=True, network='testnet',
+                                                   secret=keypair.seed().decode(),
+                                                   account_id=keypair.address().decode())
+        self.payments = SyntheticPayments(self.account.account_id, seed=self.seed, transactions=self.receives,
+                                          users=self.users, mix=self.mix)
+        self.payments.load_fixtures()
+
+    def run(self) -> dict:
+        self.setup()
+        started = time.time()
+
+        fake_horizon = FakeHorizon(self.payments, federation_account=Keypair.random().address().decode(),
+                                   latency=self.latency, jitter=self.jitter, error_rate=self.error_rate)
+        fake_rehive = FakeRehive(latency=self.latency, jitter=self.jitter, error_rate=self.error_rate)
+
+        with fake_horizon, fake_rehive, override_settings(
+                HORIZON_ENDPOINTS={'testnet': [fake_horizon.url], 'public': [fake_horizon.url]},
+                REHIVE_API_URL=fake_rehive.url,
+                REHIVE_API_TOKEN='benchmark'):
+            horizon._pools.clear()
+            cache.set(STELLAR_TOML_KEY % FEDERATION_DOMAIN, {'FEDERATION_SERVER': fake_horizon.url + '/federation'})
+
+            self.run_receives()
+            self.run_rehive()
+            self.run_federation()
+            self.run_sends()
+
+            requests = {'horizon': fake_horizon.requests, 'rehive': fake_rehive.requests,
+                        'injected_errors': fake_horizon.errors + fake_rehive.errors}
+
+        horizon._pools.clear()
+        return {
+            'commit': git_commit(),
+            'created': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'config': self.config,
+            'duration': time.time() - started,
+            'requests': requests,
+            'results': {name: m.summary() for name, m in self.results.items()},
+            'startup': {module: measure_startup(module) for module in STARTUP_PROFILES},
+        }
+
+    def run_receives(self):
+        m = self.results['receive'] = Measurement('receive')
+        failures = 0
+        while True:
+            before = ReceiveTransaction.objects.count()
+            result = None
+            with m.measure(items=0):
+                result = self.account.process_receive_transactions()
+            m.items += ReceiveTransaction.objects.count() - before
+            if result is None:
+                # The poll failed (e.g. an injected Horizon error), retry it unless Horizon keeps failing:
+                failures += 1
+                if failures >= 10:
+                    break
+                continue
+            failures = 0
+            if not result['page_full']:
+                break
+
+    def run_rehive(self):
+        m = self.results['rehive'] = Measurement('rehive')
+        if self.rehive == 'drain':
+            drainer = RehiveDrainer()
+            with m.measure(items=0):
+                drainer.run(['receive'])
+            m.items += drainer.stats.get('receive', {}).get('processed', 0)
+            return
+        for tx_id in ReceiveTransaction.objects.filter(status='Waiting', rehive_code__isnull=True).values_list(
+                'id', flat=True):
+            with m.measure():
+                create_rehive_receive.apply(args=(tx_id,), throw=True)
+
+    def run_federation(self):
+        m = self.results['federation'] = Measurement('federation')
+        for i in range(self.federation):
+            with m.measure():
+                get_federation_details('user%s*%s' % (i % self.users, FEDERATION_DOMAIN))
+
+    def run_sends(self):
+        m = self.results['send'] = Measurement('send')
+        for i in range(self.sends):
+            tx = SendTransaction.objects.create(admin_account=self.account,
+                                                rehive_code='benchmark-%s' % i,
+                                                recipient='user%s*%s' % (i % self.users, FEDERATION_DOMAIN),
+                                                amount=10 ** 7,
+                                                currency='XLM',
+                                                issuer='')
+            with m.measure():
+                process_send.apply(args=(tx.id,), throw=True)
+                if SendTransaction.objects.get(id=tx.id).status != 'Complete':
+                    raise RuntimeError('Send %s not completed' % tx.id)
+
+
+def measure_startup(settings_module: str, runs: int=3) -> dict:
+    """
+    Median startup seconds and peak RSS (MB) of a process using `settings_module`.
+    """
+    seconds, rss = [], []
+    for _ in range(runs):
+        try:
+            output = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT], cwd=settings.BASE_DIR,
+                                             env=dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module),
+                                             stderr=subprocess.DEVNULL)
+        except (OSError, subprocess.CalledProcessError):
+            return {'error': 'startup failed'}
+        elapsed, max_rss = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+        seconds.append(elapsed)
+        rss.append(max_rss / 1024)
+    return {'seconds': percentile(seconds, 50), 'rss_mb': percentile(rss, 50)}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                                       stderr=subprocess.DEVNULL).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_report(report: dict, directory: str=None) -> str:
+    directory = directory or getattr(settings, 'BENCHMARK_DIR')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, '%s-%s.json' % (datetime.utcnow().strftime('%Y%m%dT%H%M%S'),
+                                                   (report.get('commit') or 'unknown')[:8]))
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """
+    Relative change of rates and latencies against a baseline report (0.1 is 10% higher).
+    """
+    changes = {}
+    for name, result in report['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        changes[name] = {key: (result[key] - base[key]) / base[key] if result[key] and base[key] else None
+                         for key in ('per_second', 'p50', 'p99', 'queries_per_operation')}
+    for module, result in report.get('startup', {}).items():
+        base = baseline.get('startup', {}).get(module)
+        if not base:
+            continue
+        changes['startup:' + module] = {key: (result[key] - base[key]) / base[key]
+                                        if result.get(key) and base.get(key) else None
+                                        for key in ('seconds', 'rss_mb')}
+    return changes
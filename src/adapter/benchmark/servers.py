@@ -0,0 +1,229 @@
+"""
+Local stand-in HTTP servers for Horizon (plus an anchor's stellar.toml and federation
+server) and for the Rehive admin API, with configurable latency and error injection.
+"""
+import bisect
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class PaymentLog:
+    """
+    In-memory payments and their transactions, in paging token order.
+    """
+
+    def __init__(self):
+        self.tokens = []
+        self.payments = []
+        self.transactions = {}
+
+    def add(self, payment: dict, transaction: dict):
+        self.tokens.append(int(payment['paging_token']))
+        self.payments.append(payment)
+        self.transactions[transaction['hash']] = transaction
+
+    def page(self, account_id: str, cursor=None, limit: int=200) -> list:
+        start = bisect.bisect_right(self.tokens, int(cursor)) if cursor else 0
+        return [p for p in self.payments[start:start + limit]
+                if account_id in (p.get('to'), p.get('from'), p.get('account'))]
+
+    def transaction(self, tx_hash: str):
+        return self.transactions.get(tx_hash)
+
+    def events(self, account_id: str, cursor=None):
+        while True:
+            records = self.page(account_id, cursor)
+            if not records:
+                return
+            for record in records:
+                yield 'id: %s\ndata: %s\n\n' % (record['paging_token'], json.dumps(record))
+            cursor = records[-1]['paging_token']
+
+
+class FakeServer:
+    """
+    HTTP server in a background thread. Every request waits `latency` seconds (plus up to
+    `jitter`) and fails with a 503 with probability `error_rate`.
+    """
+
+    def __init__(self, latency: float=0, jitter: float=0, error_rate: float=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:%s' % self._server.server_address[1]
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._handle(self, 'GET')
+
+            def do_POST(self):
+                fake._handle(self, 'POST')
+
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handle(self, handler, method):
+        with self._lock:
+            self.requests += 1
+        delay = self.latency + random.random() * self.jitter
+        if delay:
+            time.sleep(delay)
+
+        if self.error_rate and random.random() < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return self.respond(handler, 503, {'title': 'Injected error'})
+
+        url = urlparse(handler.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body = None
+        if method == 'POST':
+            raw = handler.rfile.read(int(handler.headers.get('Content-Length') or 0)).decode('utf-8')
+            if 'json' in (handler.headers.get('Content-Type') or ''):
+                body = json.loads(raw or '{}')
+            else:
+                body = {k: v[0] for k, v in parse_qs(raw).items()}
+
+        result = self.route(handler, method, url.path, query, body)
+        if result is not None:
+            self.respond(handler, *result)
+
+    def route(self, handler, method: str, path: str, query: dict, body):
+        """
+        Return (status, payload) or None if the response was already written.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def respond(handler, status: int, payload, content_type: str='application/json'):
+        data = payload.encode('utf-8') if isinstance(payload, str) else json.dumps(payload).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+
+class FakeHorizon(FakeServer):
+    """
+    Horizon endpoints used by the adapter, serving payments from a PaymentLog or any object with
+    the same page()/transaction()/events() interface, like stream.SyntheticPayments. Also serves
+    stellar.toml and federation lookups, resolving `<name>*<domain>` to `federation_account`
+    with a text memo of <name>.
+    """
+
+    def __init__(self, payments=None, federation_account: str=None, missing_accounts=(), **kwargs):
+        super().__init__(**kwargs)
+        self.payments = payments if payments is not None else PaymentLog()
+        self.federation_account = federation_account
+        self.missing_accounts = set(missing_accounts)
+        self.ledger = 1000
+        self.submitted = 0
+
+    def route(self, handler, method, path, query, body):
+        parts = [p for p in path.split('/') if p]
+
+        if method == 'POST' and parts == ['transactions']:
+            return self.submit(body.get('tx', ''))
+        if method != 'GET':
+            return 405, {'title': 'Method not allowed'}
+
+        if parts == ['ledgers']:
+            return 200, {'_embedded': {'records': [self.latest_ledger()]}}
+        if len(parts) == 2 and parts[0] == 'accounts':
+            if parts[1] in self.missing_accounts:
+                return 404, {'title': 'Resource Missing'}
+            return 200, self.account(parts[1])
+        if len(parts) == 3 and parts[0] == 'accounts' and parts[2] == 'payments':
+            if 'text/event-stream' in (handler.headers.get('Accept') or ''):
+                return self.stream(handler, parts[1], query.get('cursor'))
+            records = self.payments.page(parts[1], query.get('cursor'), int(query.get('limit', 10)))
+            return 200, {'_embedded': {'records': records}}
+        if len(parts) == 2 and parts[0] == 'transactions':
+            transaction = self.payments.transaction(parts[1])
+            return (200, transaction) if transaction else (404, {'title': 'Resource Missing'})
+        if parts == ['.well-known', 'stellar.toml']:
+            return 200, 'FEDERATION_SERVER = "%s/federation"\n' % self.url, 'text/plain'
+        if parts == ['federation']:
+            name, _, domain = query.get('q', '').partition('*')
+            if not name or not domain:
+                return 400, {'detail': 'Invalid federation address'}
+            return 200, {'stellar_address': query['q'], 'account_id': self.federation_account,
+                         'memo_type': 'text', 'memo': name}
+        return 404, {'title': 'Resource Missing'}
+
+    def latest_ledger(self) -> dict:
+        # A new ledger closes on every head request, so the ingest always finds a new head:
+        self.ledger += 1
+        return {'sequence': self.ledger, 'closed_at': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')}
+
+    @staticmethod
+    def account(account_id: str) -> dict:
+        return {'id': account_id, 'account_id': account_id, 'sequence': '1000',
+                'balances': [{'asset_type': 'native', 'balance': '100000.0000000'}]}
+
+    def submit(self, xdr: str):
+        self.submitted += 1
+        return 200, {'hash': hashlib.sha256(xdr.encode('utf-8')).hexdigest(), 'ledger': self.ledger}
+
+    def stream(self, handler, account_id, cursor):
+        # Server sent events of the payments after the cursor, then the stream ends:
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.send_header('Connection', 'close')
+        handler.end_headers()
+        handler.close_connection = True
+        for event in self.payments.events(account_id, cursor):
+            handler.wfile.write(event.encode('utf-8'))
+        return None
+
+
+class FakeRehive(FakeServer):
+    """
+    Rehive admin transaction endpoints used by the Rehive tasks.
+    """
+
+    def route(self, handler, method, path, query, body):
+        if method == 'POST' and path == '/admins/transactions/receive/':
+            return 200, {'status': 'success', 'data': {'tx_code': uuid.uuid4().hex, 'status': 'Pending'}}
+        if method == 'POST' and path == '/admins/transactions/update/':
+            return 200, {'status': 'success', 'data': {'tx_code': body.get('tx_code'), 'status': body.get('status')}}
+        return 404, {'status': 'error', 'message': 'Not found.'}
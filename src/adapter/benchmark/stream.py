@@ -0,0 +1,228 @@
+"""
+Deterministic synthetic payment stream in Horizon JSON shape.
+
+Every transaction is derived from (seed, transaction index) alone, so streams of any length
+are generated lazily: a page is produced from its cursor without generating what came
+before it, and a transaction is looked up from the index encoded in its hash.
+
+The stream mixes native and credit asset payments, multi-operation transactions, text/id/hash
+memos, memos of unknown users, payments sent from our own account and account creations.
+fixtures() returns the UserAccount and Asset rows the stream refers to.
+
+SyntheticPayments has the page()/transaction()/events() interface of PaymentLog, so it can
+back a FakeHorizon.
+"""
+import base64
+import hashlib
+import json
+import random
+import struct
+from datetime import datetime, timedelta
+
+from ..utils import stroops_to_str
+
+# Paging tokens are (transaction number << 12) + operation index, like Horizon's operation ids:
+OPERATION_BITS = 12
+
+ACCOUNT_VERSION_BYTE = 6 << 3
+
+DEFAULT_MIX = {
+    'credit': 0.3,          # Payment in one of the trusted assets instead of XLM
+    'untrusted': 0.02,      # Payment in an asset we do not trust
+    'multi_op': 0.1,        # Transaction with 2-4 operations
+    'outgoing': 0.1,        # Payment sent from our own account
+    'create_account': 0.1,  # Account creation instead of an outgoing payment
+    'unknown_memo': 0.05,   # Text memo that matches no user
+    'id_memo': 0.03,
+    'hash_memo': 0.02,
+    'no_memo': 0.02,
+}
+
+
+def _crc16(data: bytes) -> int:
+    # CRC16-XModem, the StrKey checksum:
+    crc = 0
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+            crc &= 0xffff
+    return crc
+
+
+def account_address(key: bytes) -> str:
+    """
+    Stellar account address (StrKey G...) of a 32 byte public key.
+    """
+    payload = bytes([ACCOUNT_VERSION_BYTE]) + key
+    return base64.b32encode(payload + struct.pack('<H', _crc16(payload))).decode('ascii')
+
+
+def _derived_address(*parts) -> str:
+    return account_address(hashlib.sha256(json.dumps(parts).encode('utf-8')).digest())
+
+
+class SyntheticPayments:
+    def __init__(self, account_id: str, seed: int=0, transactions: int=None, users: int=100, assets: int=3,
+                 user_domain: str='rehive.com', start: datetime=None, transactions_per_ledger: int=20,
+                 mix: dict=None):
+        """
+        `transactions` limits the stream length, None gives an endless stream.
+        """
+        self.account_id = account_id
+        self.seed = seed
+        self.transactions = transactions
+        self.users = users
+        self.user_domain = user_domain
+        self.start = start or datetime(2018, 1, 1)
+        self.transactions_per_ledger = transactions_per_ledger
+        self.mix = dict(DEFAULT_MIX, **(mix or {}))
+        self.assets = [('AST%s' % i, _derived_address(seed, 'issuer', i)) for i in range(assets)]
+        self.untrusted_asset = ('JUNK', _derived_address(seed, 'untrusted'))
+
+    # Fixtures
+    # -----------------------------------------------------------------------------------------------------------------
+    def fixtures(self) -> dict:
+        return {
+            'user_accounts': [('user%s@example.com' % i, 'user%s*%s' % (i, self.user_domain))
+                              for i in range(self.users)],
+            'assets': [{'code': code, 'issuer': issuer, 'account_id': issuer} for code, issuer in self.assets],
+        }
+
+    def load_fixtures(self):
+        from ..models import Asset, UserAccount
+
+        fixtures = self.fixtures()
+        UserAccount.bulk_get_or_create(fixtures['user_accounts'])
+        for asset in fixtures['assets']:
+            Asset.objects.get_or_create(code=asset['code'], account_id=asset['account_id'],
+                                        defaults={'issuer': asset['issuer']})
+
+    # Generation
+    # -----------------------------------------------------------------------------------------------------------------
+    def _hash(self, number: int) -> str:
+        # The transaction number is kept in the first 16 hex digits so lookups need no index:
+        return '%016x' % number + hashlib.sha256(('%s:%s' % (self.seed, number)).encode('utf-8')).hexdigest()[:48]
+
+    def _exists(self, number: int) -> bool:
+        return number >= 1 and (self.transactions is None or number <= self.transactions)
+
+    def _generate(self, number: int):
+        """
+        Transaction record and payment operation records of transaction `number` (1-based).
+        """
+        rand = random.Random('%s:%s' % (self.seed, number))
+        mix = self.mix
+        tx_hash = self._hash(number)
+        ledger = 1000 + (number - 1) // self.transactions_per_ledger
+        created_at = (self.start + timedelta(seconds=5 * (ledger - 1000))).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        outgoing = rand.random() < mix['outgoing']
+        counterparty = _derived_address(self.seed, 'counterparty', rand.randrange(10 * self.users + 1))
+        source = self.account_id if outgoing else counterparty
+
+        point = rand.random()
+        for memo_type in ('unknown_memo', 'id_memo', 'hash_memo', 'no_memo'):
+            point -= mix[memo_type]
+            if point < 0:
+                break
+        else:
+            memo_type = 'text'
+
+        if memo_type == 'text':
+            memo = {'memo_type': 'text', 'memo': 'user%s' % rand.randrange(self.users)}
+        elif memo_type == 'unknown_memo':
+            memo = {'memo_type': 'text', 'memo': 'stranger%s' % rand.randrange(10 ** 6)}
+        elif memo_type == 'id_memo':
+            memo = {'memo_type': 'id', 'memo': str(rand.randrange(10 ** 9))}
+        elif memo_type == 'hash_memo':
+            memo = {'memo_type': 'hash', 'memo': base64.b64encode(rand.getrandbits(256).to_bytes(32, 'big')).decode()}
+        else:
+            memo = {'memo_type': 'none'}
+
+        count = rand.randint(2, 4) if rand.random() < mix['multi_op'] else 1
+        operations = []
+        for index in range(count):
+            token = str((number << OPERATION_BITS) + index + 1)
+            record = {
+                '_links': {'transaction': {'href': '/transactions/%s' % tx_hash}},
+                'id': token,
+                'paging_token': token,
+                'source_account': source,
+                'created_at': created_at,
+                'transaction_hash': tx_hash,
+            }
+            amount = stroops_to_str(rand.randint(1, 10 ** 6) * 10 ** rand.randint(1, 5))
+
+            if outgoing and rand.random() < mix['create_account']:
+                record.update({'type': 'create_account', 'type_i': 0, 'funder': source,
+                               'account': _derived_address(self.seed, 'created', number, index),
+                               'starting_balance': amount})
+            else:
+                record.update({'type': 'payment', 'type_i': 1, 'amount': amount,
+                               'from': source, 'to': counterparty if outgoing else self.account_id})
+                draw = rand.random()
+                if draw < mix['untrusted']:
+                    record.update({'asset_type': 'credit_alphanum4', 'asset_code': self.untrusted_asset[0],
+                                   'asset_issuer': self.untrusted_asset[1]})
+                elif draw < mix['untrusted'] + mix['credit'] and self.assets:
+                    code, issuer = self.assets[rand.randrange(len(self.assets))]
+                    record.update({'asset_type': 'credit_alphanum4' if len(code) <= 4 else 'credit_alphanum12',
+                                   'asset_code': code, 'asset_issuer': issuer})
+                else:
+                    record['asset_type'] = 'native'
+            operations.append(record)
+
+        transaction = dict(memo, **{
+            'id': tx_hash,
+            'hash': tx_hash,
+            'paging_token': str(number << OPERATION_BITS),
+            'ledger': ledger,
+            'created_at': created_at,
+            'source_account': source,
+            'operation_count': count,
+            'fee_paid': 100 * count,
+        })
+        return transaction, operations
+
+    def iter_payments(self, cursor=None):
+        """
+        Operations after the (exclusive) cursor, generated lazily.
+        """
+        token = int(cursor) if cursor else 0
+        number = max(1, token >> OPERATION_BITS)
+        while self._exists(number):
+            for record in self._generate(number)[1]:
+                if int(record['paging_token']) > token:
+                    yield record
+            number += 1
+
+    # PaymentLog interface
+    # -----------------------------------------------------------------------------------------------------------------
+    def page(self, account_id: str, cursor=None, limit: int=200) -> list:
+        if account_id != self.account_id:
+            return []
+        records = []
+        for record in self.iter_payments(cursor):
+            records.append(record)
+            if len(records) >= limit:
+                break
+        return records
+
+    def transaction(self, tx_hash: str):
+        try:
+            number = int(tx_hash[:16], 16)
+        except (TypeError, ValueError):
+            return None
+        if not self._exists(number) or self._hash(number) != tx_hash:
+            return None
+        return self._generate(number)[0]
+
+    def events(self, account_id: str, cursor=None):
+        """
+        The stream as server sent events, like Horizon's streaming payments endpoint.
+        """
+        if account_id != self.account_id:
+            return
+        for record in self.iter_payments(cursor):
+            yield 'id: %s\ndata: %s\n\n' % (record['paging_token'], json.dumps(record))
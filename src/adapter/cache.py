@@ -0,0 +1,48 @@
+import uuid
+from logging import getLogger
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = getLogger('django')
+
+BALANCE_KEY = 'adapter:balances:%s:%s'
+BALANCE_GENERATION_KEY = 'adapter:balances:generation:%s'
+
+
+def balance_timeout() -> int:
+    # Maximum time a cached balance is served for if no invalidation arrives:
+    return getattr(settings, 'ADAPTER_BALANCE_CACHE_TIMEOUT', 15)
+
+
+def _generation(account_id: str) -> str:
+    generation = cache.get(BALANCE_GENERATION_KEY % account_id)
+    if generation is None:
+        cache.add(BALANCE_GENERATION_KEY % account_id, uuid.uuid4().hex, None)
+        generation = cache.get(BALANCE_GENERATION_KEY % account_id)
+    return generation
+
+
+def get_balances(account_id: str, fetch):
+    """
+    Return the cached balances for an account, calling `fetch` on a miss.
+
+    Entries are keyed by a per-account generation so a fetch that was already
+    in flight when the account changed can never overwrite a newer invalidation.
+    """
+    generation = _generation(account_id)
+    key = BALANCE_KEY % (account_id, generation)
+    balances = cache.get(key)
+
+    if balances is None:
+        balances = fetch()
+        cache.set(key, balances, balance_timeout())
+
+    return balances
+
+
+def invalidate_balances(account_id: str):
+    logger.info('Invalidating cached balances: %s' % (account_id,))
+    # A new random generation rather than cache.incr, which is a non-atomic get and set on the
+    # file based cache and would reset the key to the default timeout. The key never expires:
+    cache.set(BALANCE_GENERATION_KEY % account_id, uuid.uuid4().hex, None)
@@ -0,0 +1,221 @@
+"""
+Asyncio drainer for the Rehive notification backlog, for outage recovery.
+
+Instead of one Celery task (and broker round trip) per Rehive call, pending receives are
+claimed from the database in chunks, their Rehive requests run concurrently on one event
+loop under a semaphore, and each chunk's results are written back with a single statement:
+
+- receive: Waiting receives without a Rehive code are created in Rehive (create_rehive_receive)
+- confirm: Complete receives Rehive has not confirmed yet are confirmed (confirm_rehive_transaction)
+
+Rows are claimed with FOR UPDATE SKIP LOCKED, so several drainers can run side by side.
+Rows whose request could not connect stay pending for the next run. Creating a receive is not
+idempotent, so one that failed after the request was sent (a timeout or a dropped connection) is
+marked Failed with an unknown outcome for reconciliation (Rehive has the receive id in its metadata)
+rather than posted again. Confirmations are retried up to REHIVE_CONFIRM_MAX_ATTEMPTS times.
+"""
+import asyncio
+import json
+import time
+from logging import getLogger
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .metrics import REHIVE_LATENCY
+from .models import DailyVolume, ReceiveTransaction
+from .tasks import REHIVE_RECEIVE_ENDPOINT, REHIVE_UPDATE_ENDPOINT, rehive_headers, rehive_receive_request, \
+    rehive_confirm_request, apply_rehive_receive, apply_rehive_confirm
+
+logger = getLogger('django')
+
+KINDS = ('receive', 'confirm')
+
+# Rehive's answer once a transaction is confirmed:
+CONFIRMED = {'data': {'status': 'Confirmed'}}
+
+# Status code stored when a request may or may not have reached Rehive:
+UNKNOWN_OUTCOME = 0
+
+CLAIM_SQL = {
+    'receive': """
+SELECT * FROM {table}
+WHERE id > %s AND status = 'Waiting' AND rehive_code IS NULL
+ORDER BY id
+LIMIT %s
+FOR UPDATE SKIP LOCKED
+""",
+    'confirm': """
+SELECT * FROM {table}
+WHERE id > %s AND status = 'Complete' AND rehive_code IS NOT NULL
+  AND NOT COALESCE(rehive_response, '{{}}'::jsonb) @> %s::jsonb
+  AND COALESCE((rehive_response->>'attempts')::int, 0) < %s
+ORDER BY id
+LIMIT %s
+FOR UPDATE SKIP LOCKED
+""",
+}
+
+# Store created receives and move them out of the Waiting volume bucket in one statement:
+RECEIVE_WRITE_SQL = """
+WITH changes (id, status, rehive_code, rehive_response) AS (VALUES {values}),
+updated AS (
+    UPDATE {table} AS t
+    SET status = c.status, rehive_code = c.rehive_code, rehive_response = c.rehive_response
+    FROM changes AS c
+    WHERE t.id = c.id AND t.status = 'Waiting'
+    RETURNING t.created, t.admin_account_id, t.currency, t.issuer, t.status, t.amount
+)
+INSERT INTO {volumes} (day, admin_account_id, currency, issuer, direction, status, count, volume)
+SELECT (created AT TIME ZONE 'UTC')::date, admin_account_id, COALESCE(currency, ''), COALESCE(issuer, ''),
+       'receive', s.status, sum(s.count), sum(s.count * amount)
+FROM updated, LATERAL (VALUES (updated.status, 1), ('Waiting', -1)) AS s (status, count)
+WHERE admin_account_id IS NOT NULL
+GROUP BY 1, 2, 3, 4, 6
+ON CONFLICT (day, admin_account_id, currency, issuer, direction, status)
+DO UPDATE SET count = {volumes}.count + EXCLUDED.count, volume = {volumes}.volume + EXCLUDED.volume
+"""
+
+CONFIRM_WRITE_SQL = """
+UPDATE {table} AS t
+SET rehive_response = c.rehive_response
+FROM (VALUES {values}) AS c (id, rehive_response)
+WHERE t.id = c.id
+"""
+
+
+class RehiveDrainer:
+    def __init__(self, chunk_size: int=500, concurrency: int=50, timeout: float=30, limit: int=None):
+        """
+        `limit` caps the number of rows handled per kind, None drains the whole backlog.
+        """
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.limit = limit
+        self.stats = {}
+
+    def run(self, kinds=KINDS) -> dict:
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._run(kinds))
+        finally:
+            loop.close()
+        return self.stats
+
+    async def _run(self, kinds):
+        import aiohttp
+
+        # One pooled session for the whole run, at most `concurrency` connections to Rehive:
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=rehive_headers()) as session:
+            for kind in kinds:
+                await self._drain(kind, session, semaphore)
+
+    async def _drain(self, kind: str, session, semaphore):
+        stats = self.stats[kind] = {'processed': 0, 'succeeded': 0, 'failed': 0, 'unknown': 0, 'retry': 0,
+                                    'seconds': 0}
+        start = time.time()
+        last_id = 0
+
+        while self.limit is None or stats['processed'] < self.limit:
+            size = self.chunk_size if self.limit is None else min(self.chunk_size, self.limit - stats['processed'])
+
+            # Row locks are held while the chunk's requests run:
+            with transaction.atomic():
+                rows = self._claim(kind, last_id, size)
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                results = await asyncio.gather(*[self._post(session, semaphore, kind, tx) for tx in rows])
+
+                done = []
+                for tx, (status_code, body) in zip(rows, results):
+                    if status_code is None:
+                        stats['retry'] += 1
+                        continue
+                    if status_code == UNKNOWN_OUTCOME:
+                        stats['unknown'] += 1
+                    else:
+                        stats['succeeded' if status_code == 200 else 'failed'] += 1
+                    if kind == 'receive':
+                        apply_rehive_receive(tx, status_code, body)
+                    else:
+                        apply_rehive_confirm(tx, status_code, body)
+                    done.append(tx)
+                self._write(kind, done)
+
+            stats['processed'] += len(rows)
+            logger.info('Drained %s Rehive %s requests (last id: %s)' % (stats['processed'], kind, last_id))
+
+        stats['seconds'] = time.time() - start
+        return stats
+
+    def _claim(self, kind: str, last_id: int, size: int) -> list:
+        sql = CLAIM_SQL[kind].format(table=ReceiveTransaction._meta.db_table)
+        if kind == 'receive':
+            params = [last_id, size]
+        else:
+            params = [last_id, json.dumps(CONFIRMED), getattr(settings, 'REHIVE_CONFIRM_MAX_ATTEMPTS', 24), size]
+        return list(ReceiveTransaction.objects.raw(sql, params))
+
+    async def _post(self, session, semaphore, kind: str, tx):
+        """
+        (status code, body) of a Rehive request, (None, error) when it should be retried and
+        (UNKNOWN_OUTCOME, error) for a receive creation that may have reached Rehive.
+        """
+        import aiohttp
+
+        if kind == 'receive':
+            endpoint, payload = REHIVE_RECEIVE_ENDPOINT, rehive_receive_request(tx)
+        else:
+            endpoint, payload = REHIVE_UPDATE_ENDPOINT, rehive_confirm_request(tx)
+
+        async with semaphore:
+            start = time.time()
+            try:
+                async with session.post(getattr(settings, 'REHIVE_API_URL') + endpoint, json=payload) as response:
+                    body = await response.text()
+            except aiohttp.ClientConnectorError as exc:
+                # Could not connect, the request was never sent:
+                REHIVE_LATENCY.labels(endpoint, 'error').observe(time.time() - start)
+                logger.info('Rehive request for receive %s failed, left for the next run: %r' % (tx.id, exc))
+                return None, str(exc)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                REHIVE_LATENCY.labels(endpoint, 'error').observe(time.time() - start)
+                if kind == 'confirm':
+                    # Confirming twice is harmless:
+                    logger.info('Rehive request for receive %s failed, left for the next run: %r' % (tx.id, exc))
+                    return None, str(exc)
+                # Rehive may have created the transaction already, posting it again could credit the user twice:
+                logger.warning('Rehive request for receive %s failed after it was sent, reconcile it: %r'
+                               % (tx.id, exc))
+                return UNKNOWN_OUTCOME, str(exc)
+
+        REHIVE_LATENCY.labels(endpoint, response.status).observe(time.time() - start)
+        return response.status, body
+
+    @staticmethod
+    def _write(kind: str, rows: list):
+        if not rows:
+            return
+
+        if kind == 'receive':
+            sql = RECEIVE_WRITE_SQL.format(table=ReceiveTransaction._meta.db_table,
+                                           volumes=DailyVolume._meta.db_table,
+                                           values=', '.join(['(%s, %s, %s, %s::jsonb)'] * len(rows)))
+            params = []
+            for tx in rows:
+                params += [tx.id, tx.status, tx.rehive_code, json.dumps(tx.rehive_response)]
+        else:
+            sql = CONFIRM_WRITE_SQL.format(table=ReceiveTransaction._meta.db_table,
+                                           values=', '.join(['(%s, %s::jsonb)'] * len(rows)))
+            params = []
+            for tx in rows:
+                params += [tx.id, json.dumps(tx.rehive_response)]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
@@ -29,3 +29,18 @@ class AdapterError(Exception):
 class PlatformRequestFailedError(AdapterError):
     default_detail = 'Adapter platform request post failed.'
     default_error_slug = 'adapter_platform_failed_error.'
+
+
+class HorizonUnavailableError(AdapterError):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'No Horizon server available.'
+    default_error_slug = 'horizon_unavailable_error'
+
+
+class HorizonError(AdapterError):
+    default_detail = 'Horizon request failed.'
+    default_error_slug = 'horizon_error'
+
+    def __init__(self, status_code, detail=None):
+        super(HorizonError, self).__init__(detail or self.default_detail, self.default_error_slug)
+        self.status_code = status_code
@@ -0,0 +1,137 @@
+import csv
+import io
+import uuid
+import zlib
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import ReceiveTransaction, SendTransaction
+from .routers import get_replica
+
+EXPORT_MODELS = {
+    'receive': ReceiveTransaction,
+    'send': SendTransaction,
+}
+
+# Only flat columns are exported, the Horizon/Rehive JSON blobs are left out:
+EXPORT_FIELDS = {
+    'receive': ('id', 'created', 'admin_account_id', 'user_account_id', 'external_id', 'rehive_code',
+                'recipient', 'amount', 'currency', 'issuer', 'status', 'paging_token', 'ledger'),
+    'send': ('id', 'created', 'admin_account_id', 'external_id', 'rehive_code',
+             'recipient', 'amount', 'currency', 'issuer', 'status'),
+}
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+# Rows fetched from the server side cursor per round trip:
+FETCH_SIZE = 2000
+
+# Approximate size of each chunk handed to the response/file:
+CHUNK_SIZE = 64 * 1024
+
+
+def _parse_date(value):
+    return timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'), timezone.utc) if value else None
+
+
+def filter_transactions(tx_type: str, date_from=None, date_to=None, status=None, currency=None, account=None):
+    """
+    Build the export queryset. `account` is the Stellar address of the admin account.
+    """
+    if tx_type not in EXPORT_MODELS:
+        raise ValueError('Invalid transaction type specified.')
+
+    queryset = EXPORT_MODELS[tx_type].objects.all()
+    if date_from:
+        queryset = queryset.filter(created__gte=_parse_date(date_from))
+    if date_to:
+        queryset = queryset.filter(created__lt=_parse_date(date_to))
+    if status:
+        queryset = queryset.filter(status=status)
+    if currency:
+        queryset = queryset.filter(currency=currency)
+    if account:
+        queryset = queryset.filter(admin_account__account_id=account)
+
+    return queryset.order_by('id').values_list(*EXPORT_FIELDS[tx_type])
+
+
+def stream_rows(queryset):
+    """
+    Iterate over a values_list queryset through a named (server side) cursor,
+    so only FETCH_SIZE rows are ever held in memory.
+    """
+    alias = get_replica()
+    connection = connections[alias]
+    sql, params = queryset.query.sql_with_params()
+
+    # Named cursors only live inside a transaction:
+    with transaction.atomic(using=alias):
+        cursor = connection.connection.cursor(name='export_%s' % uuid.uuid4().hex)
+        cursor.itersize = FETCH_SIZE
+        try:
+            cursor.execute(sql, params)
+            for row in cursor:
+                yield row
+        finally:
+            cursor.close()
+
+
+def render_ndjson(rows, fields):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(fields, row))) + '\n'
+
+
+def render_csv(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def chunked(lines, compress=False):
+    """
+    Join rendered lines into roughly CHUNK_SIZE byte chunks, optionally gzipped.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    parts = []
+    size = 0
+
+    for line in lines:
+        data = line.encode('utf-8')
+        parts.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            chunk = b''.join(parts)
+            parts, size = [], 0
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    chunk = b''.join(parts)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def export_transactions(tx_type: str, output: str='ndjson', compress: bool=False, **filters):
+    """
+    Return an iterator of byte chunks for the filtered transactions in the requested format.
+    """
+    if output not in EXPORT_FORMATS:
+        raise ValueError('Invalid export format specified.')
+
+    rows = stream_rows(filter_transactions(tx_type, **filters))
+    fields = EXPORT_FIELDS[tx_type]
+    render = render_ndjson if output == 'ndjson' else render_csv
+    return chunked(render(rows, fields), compress=compress)
@@ -0,0 +1,92 @@
+"""
+Ingest lag and backlog health, cheap enough to be polled every few seconds.
+
+Ledger positions come from the ingest scheduler state in the shared cache: the lag is the Horizon
+head minus the head seen by the last successful payments poll, so a quiet account that is caught up
+has no lag. The last payment ingested (the upper 32 bits of its paging token are the ledger) and the
+backlog numbers come from indexed queries (admin_account, status[, created]). An account is
+unhealthy when any number crosses its HEALTH_* threshold.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import AdminAccount, ReceiveTransaction, SendTransaction
+from .scheduler import IngestScheduler
+
+
+def _capped_count(queryset) -> int:
+    # Counting a large backlog exactly is slow, and past the limit the exact number does not matter:
+    return queryset.values('id')[:getattr(settings, 'HEALTH_COUNT_LIMIT', 10000)].count()
+
+
+def last_payment_ledger(account: AdminAccount):
+    """
+    Ledger of the last payment ingested for the account, from the same cursor the ingest resumes from.
+    """
+    token = ReceiveTransaction.objects.filter(
+        admin_account=account).aggregate(token=Max('paging_token'))['token']
+    if account.paging_token and (token is None or account.paging_token > token):
+        token = account.paging_token
+    return token >> 32 if token else None
+
+
+def account_health(account: AdminAccount) -> dict:
+    now = time.time()
+    scheduler = IngestScheduler(account)
+    state = scheduler.state
+    heartbeat = scheduler.last_heartbeat()
+
+    head, processed = state.get('ledger'), state.get('processed_ledger')
+    lag_ledgers = head - processed if head and processed else None
+    lag_seconds = now - state['processed_closed_at'] if state.get('processed_closed_at') else None
+
+    # Waiting receives are only moved on by the Rehive drainer, recent ones are still between runs:
+    stale_waiting = timezone.now() - timedelta(seconds=getattr(settings, 'HEALTH_WAITING_RECEIVE_AGE', 300))
+
+    oldest_send = SendTransaction.objects.filter(
+        admin_account=account, status='Pending').aggregate(created=Min('created'))['created']
+
+    report = {
+        'account_id': account.account_id,
+        'name': account.name,
+        'paging_token': account.paging_token,
+        'ingest_running': heartbeat is not None,
+        'horizon_ledger': head,
+        'horizon_ledger_age': now - state['closed_at'] if state.get('closed_at') else None,
+        'processed_ledger': processed,
+        'last_payment_ledger': last_payment_ledger(account),
+        'lag_ledgers': lag_ledgers,
+        'lag_seconds': lag_seconds,
+        'stale_waiting_receives': _capped_count(ReceiveTransaction.objects.filter(
+            admin_account=account, status='Waiting', created__lt=stale_waiting)),
+        'pending_sends': _capped_count(SendTransaction.objects.filter(admin_account=account, status='Pending')),
+        'oldest_pending_send_age': (timezone.now() - oldest_send).total_seconds() if oldest_send else None,
+    }
+
+    problems = []
+    # Only the hot wallet is ingested (see tasks.process_receive), until its first poll there is no lag to report:
+    if account.name == 'hotwallet':
+        if not report['ingest_running']:
+            problems.append('ingest not running')
+        if lag_ledgers is not None and lag_ledgers > getattr(settings, 'HEALTH_MAX_LAG_LEDGERS', 12):
+            problems.append('ingest lag (ledgers)')
+        if lag_seconds is not None and lag_seconds > getattr(settings, 'HEALTH_MAX_LAG_SECONDS', 60):
+            problems.append('ingest lag (seconds)')
+    if (getattr(settings, 'REHIVE_DRAINER_ENABLED', False) and
+            report['stale_waiting_receives'] > getattr(settings, 'HEALTH_MAX_WAITING_RECEIVES', 500)):
+        problems.append('waiting receives')
+    if (report['oldest_pending_send_age'] or 0) > getattr(settings, 'HEALTH_MAX_PENDING_SEND_AGE', 300):
+        problems.append('pending sends')
+
+    report['healthy'] = not problems
+    report['problems'] = problems
+    return report
+
+
+def ingest_health() -> dict:
+    accounts = [account_health(account) for account in AdminAccount.objects.order_by('id')]
+    return {'healthy': all(a['healthy'] for a in accounts), 'accounts': accounts}
@@ -0,0 +1,45 @@
+from .models import ReceiveTransaction, SendTransaction, UserAccount
+
+HISTORY_MODELS = {
+    'receive': ReceiveTransaction,
+    'send': SendTransaction,
+}
+
+# Columns returned per row, large JSON columns are never loaded:
+HISTORY_FIELDS = {
+    'receive': ('id', 'created', 'external_id', 'rehive_code', 'amount', 'currency', 'issuer', 'status',
+                'paging_token', 'ledger'),
+    'send': ('id', 'created', 'external_id', 'rehive_code', 'recipient', 'amount', 'currency', 'issuer',
+             'status'),
+}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def user_account_ids(user_id=None, account_id=None) -> list:
+    if account_id:
+        queryset = UserAccount.objects.filter(account_id=account_id)
+    else:
+        queryset = UserAccount.objects.filter(user_id=user_id)
+    return list(queryset.values_list('id', flat=True))
+
+
+def transaction_history(tx_type: str, account_ids: list, cursor: int=None, limit: int=DEFAULT_PAGE_SIZE):
+    """
+    Newest first page of a user's transactions, keyset paginated on the (user_account, id) index.
+
+    Returns the rows and the cursor for the next page (None on the last page).
+    """
+    if tx_type not in HISTORY_MODELS:
+        raise ValueError('Invalid transaction type specified.')
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    queryset = HISTORY_MODELS[tx_type].objects.filter(user_account_id__in=account_ids)
+    if cursor is not None:
+        queryset = queryset.filter(id__lt=cursor)
+
+    # Fetch one extra row to know whether there is a next page:
+    rows = list(queryset.order_by('-id').values(*HISTORY_FIELDS[tx_type])[:limit + 1])
+    next_cursor = rows[limit - 1]['id'] if len(rows) > limit else None
+    return rows[:limit], next_cursor
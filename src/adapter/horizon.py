@@ -0,0 +1,228 @@
+"""
+Pool of Horizon servers per network.
+
+Reads go to the healthy node with the lowest latency (EWMA). Hedged reads are
+duplicated to the next best node when the first has not answered within its
+recent latency percentile, and the first successful answer wins. Submissions
+stay pinned to one node and only fail over on connection errors or 5xx responses.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from logging import getLogger
+
+from django.conf import settings
+
+from .exceptions import HorizonError, HorizonUnavailableError
+from .metrics import HORIZON_LATENCY, horizon_endpoint
+from .utils import http_session
+
+logger = getLogger('django')
+
+DEFAULT_HORIZON_ENDPOINTS = {
+    'public': ['https://horizon.stellar.org'],
+    'testnet': ['https://horizon-testnet.stellar.org'],
+}
+
+# Weight of the latest sample in the latency EWMA:
+EWMA_ALPHA = 0.2
+
+_executor = ThreadPoolExecutor(max_workers=32)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class HorizonNode:
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self._session = None
+        self.latency = None
+        self.samples = deque(maxlen=200)
+        self.failures = 0
+        self.unhealthy_until = 0
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = http_session()
+        return self._session
+
+    @property
+    def healthy(self) -> bool:
+        return time.time() >= self.unhealthy_until
+
+    def record_success(self, elapsed: float):
+        with self._lock:
+            self.latency = elapsed if self.latency is None else EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * self.latency
+            self.samples.append(elapsed)
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            # Exponential back off, capped at a minute:
+            self.unhealthy_until = time.time() + min(60, 2 ** self.failures)
+
+    def percentile(self, percent: float) -> float:
+        samples = sorted(self.samples)
+        if not samples:
+            return getattr(settings, 'HORIZON_HEDGE_DEFAULT_DELAY', 0.5)
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+    def request(self, method: str, path: str, **kwargs):
+        """
+        Request against this node. Connection errors and 5xx answers raise HorizonUnavailableError.
+        """
+        import requests
+
+        start = time.time()
+        try:
+            response = self.session.request(method, self.url + path,
+                                            timeout=getattr(settings, 'HORIZON_TIMEOUT', 20), **kwargs)
+        except requests.exceptions.RequestException as exc:
+            HORIZON_LATENCY.labels(horizon_endpoint(path), method, 'error').observe(time.time() - start)
+            self.record_failure()
+            raise HorizonUnavailableError('Horizon %s error: %s' % (self.url, exc))
+
+        HORIZON_LATENCY.labels(horizon_endpoint(path), method, response.status_code).observe(time.time() - start)
+
+        if response.status_code >= 500:
+            self.record_failure()
+            raise HorizonUnavailableError('Horizon %s error: HTTP %s' % (self.url, response.status_code))
+
+        self.record_success(time.time() - start)
+        return response
+
+
+class HorizonPool:
+    def __init__(self, urls):
+        self.nodes = [HorizonNode(url) for url in urls]
+        self._submit_node = self.nodes[0]
+
+    def ranked(self):
+        """
+        Healthy nodes fastest first (unmeasured nodes get tried first), then unhealthy nodes as a last resort.
+        """
+        healthy = sorted((n for n in self.nodes if n.healthy),
+                         key=lambda n: -1 if n.latency is None else n.latency)
+        return healthy + [n for n in self.nodes if not n.healthy]
+
+    @staticmethod
+    def _json(response):
+        if response.status_code >= 400:
+            raise HorizonError(response.status_code, response.text)
+        return response.json()
+
+    def get(self, path: str, params=None, hedge: bool=False):
+        """
+        GET a Horizon resource (path relative to the server root) and return its JSON.
+        Raises HorizonError for 4xx answers, which are not failures of the node.
+        """
+        nodes = self.ranked()
+
+        if hedge and len(nodes) > 1:
+            return self._json(self._hedged_get(nodes, path, params))
+
+        for node in nodes:
+            try:
+                return self._json(node.request('GET', path, params=params))
+            except HorizonUnavailableError as exc:
+                logger.info('Horizon read failed on %s: %s' % (node.url, exc))
+
+        raise HorizonUnavailableError()
+
+    def _hedged_get(self, nodes, path, params):
+        primary, backups = nodes[0], list(nodes[1:])
+        futures = {_executor.submit(primary.request, 'GET', path, params=params): primary}
+
+        # Only duplicate the read once the primary is slower than usual:
+        delay = primary.percentile(getattr(settings, 'HORIZON_HEDGE_PERCENTILE', 95))
+        done, pending = wait(futures, timeout=delay)
+
+        while True:
+            for future in done:
+                try:
+                    return future.result()
+                except HorizonUnavailableError as exc:
+                    logger.info('Horizon read failed on %s: %s' % (futures[future].url, exc))
+            if backups:
+                node = backups.pop(0)
+                future = _executor.submit(node.request, 'GET', path, params=params)
+                futures[future] = node
+                pending.add(future)
+            if not pending:
+                raise HorizonUnavailableError()
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+    def account(self, account_id: str):
+        return self.get('/accounts/%s' % account_id, hedge=True)
+
+    def account_exists(self, account_id: str) -> bool:
+        try:
+            self.account(account_id)
+            return True
+        except HorizonError as exc:
+            if exc.status_code == 404:
+                return False
+            raise
+
+    def payments(self, account_id: str, cursor=None, limit: int=200):
+        params = {'order': 'asc', 'limit': limit}
+        if cursor is not None:
+            params['cursor'] = cursor
+        return self.get('/accounts/%s/payments' % account_id, params=params, hedge=True)
+
+    def transaction(self, tx_hash: str):
+        return self.get('/transactions/%s' % tx_hash, hedge=True)
+
+    @property
+    def submit_url(self) -> str:
+        return self._submit_node.url
+
+    def _submit_candidates(self):
+        return [self._submit_node] + [n for n in self.ranked() if n is not self._submit_node]
+
+    def sequence(self, account_id: str) -> str:
+        """
+        Current sequence number of an account, read from the node submissions are pinned to
+        (failing over like submissions) so it matches the ledger state the transaction is checked against.
+        """
+        for node in self._submit_candidates():
+            try:
+                response = node.request('GET', '/accounts/%s' % account_id)
+            except HorizonUnavailableError as exc:
+                logger.info('Horizon sequence read failed on %s: %s' % (node.url, exc))
+                continue
+            self._submit_node = node
+            return self._json(response)['sequence']
+
+        raise HorizonUnavailableError()
+
+    def submit(self, xdr):
+        """
+        Submit a signed transaction envelope. Resubmitting the same envelope is safe,
+        so a node that fails is swapped for the next healthy one and the submission retried.
+        """
+        if isinstance(xdr, bytes):
+            xdr = xdr.decode('utf-8')
+
+        for node in self._submit_candidates():
+            try:
+                response = node.request('POST', '/transactions', data={'tx': xdr})
+                self._submit_node = node
+                return response.json()
+            except HorizonUnavailableError as exc:
+                logger.info('Horizon submission failed on %s: %s' % (node.url, exc))
+
+        raise HorizonUnavailableError()
+
+
+def get_horizon(network: str) -> HorizonPool:
+    network = (network or 'testnet').lower()
+    with _pools_lock:
+        if network not in _pools:
+            endpoints = dict(DEFAULT_HORIZON_ENDPOINTS, **getattr(settings, 'HORIZON_ENDPOINTS', {}))
+            _pools[network] = HorizonPool(endpoints[network])
+        return _pools[network]
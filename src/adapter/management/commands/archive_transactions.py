@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...partitions import PARTITIONED_MODELS, archive_partitions, add_months, month_start
+
+
+class Command(BaseCommand):
+    help = 'Archive monthly transaction partitions older than the retention period to gzipped CSV and drop them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int,
+                            default=getattr(settings, 'TRANSACTION_RETENTION_MONTHS', 12),
+                            help='Number of months (including the current one) to keep in the database.')
+        parser.add_argument('--before', help='Archive partitions ending on or before this date (YYYY-MM-DD).')
+        parser.add_argument('--directory', default=getattr(settings, 'ARCHIVE_DIR'))
+
+    def handle(self, *args, **options):
+        if options['before']:
+            before = datetime.strptime(options['before'], '%Y-%m-%d').date()
+        else:
+            before = add_months(month_start(timezone.now()), 1 - options['months'])
+
+        for model in PARTITIONED_MODELS:
+            for path in archive_partitions(model, before, options['directory']):
+                self.stdout.write('Archived %s' % path)
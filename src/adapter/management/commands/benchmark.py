@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ...benchmark.runner import Benchmark, save_report, compare
+
+
+class Command(BaseCommand):
+    help = ('Benchmark receive ingest, Rehive uploads, federation and sends against local Horizon and Rehive '
+            'stand-ins, on a throwaway test database. Writes a JSON report to BENCHMARK_DIR.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--receives', type=int, default=1000, help='Transactions in the payment stream.')
+        parser.add_argument('--sends', type=int, default=200)
+        parser.add_argument('--federation', type=int, default=500)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic payment stream.')
+        parser.add_argument('--rehive', choices=('tasks', 'drain'), default='tasks',
+                            help='Upload receives with one create_rehive_receive task each, or with the drainer.')
+        parser.add_argument('--latency', type=float, default=0, help='Upstream latency in milliseconds.')
+        parser.add_argument('--jitter', type=float, default=0, help='Random extra latency in milliseconds.')
+        parser.add_argument('--error-rate', type=float, default=0, help='Fraction of upstream requests failing.')
+        parser.add_argument('--output-dir', help='Defaults to BENCHMARK_DIR.')
+        parser.add_argument('--compare', help='Baseline report to compare against.')
+        parser.add_argument('--keepdb', action='store_true', default=False)
+
+    def handle(self, *args, **options):
+        benchmark = Benchmark(receives=options['receives'],
+                              sends=options['sends'],
+                              federation=options['federation'],
+                              users=options['users'],
+                              latency=options['latency'] / 1000,
+                              jitter=options['jitter'] / 1000,
+                              error_rate=options['error_rate'],
+                              seed=options['seed'],
+                              rehive=options['rehive'])
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, keepdb=options['keepdb'])
+        try:
+            report = benchmark.run()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                report['comparison'] = compare(report, json.load(f))
+
+        path = save_report(report, options['output_dir'])
+        self.stdout.write(json.dumps(report['results'], indent=2))
+        self.stdout.write(json.dumps(report['startup'], indent=2))
+        if options['compare']:
+            self.stdout.write(json.dumps(report['comparison'], indent=2))
+        self.stdout.write('Report written to %s' % path)
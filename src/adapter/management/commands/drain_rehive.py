@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from ...drainer import KINDS, RehiveDrainer
+
+
+class Command(BaseCommand):
+    help = ('Drain the Rehive backlog (receive creations and confirmations) in chunks, with concurrent '
+            'requests on one event loop, e.g. to catch up after a Rehive outage.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', nargs='+', choices=KINDS, default=list(KINDS))
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows claimed and written back at once.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Concurrent Rehive requests.')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds per Rehive request.')
+        parser.add_argument('--limit', type=int, help='Maximum rows per kind, the whole backlog by default.')
+
+    def handle(self, *args, **options):
+        drainer = RehiveDrainer(chunk_size=options['chunk_size'],
+                                concurrency=options['concurrency'],
+                                timeout=options['timeout'],
+                                limit=options['limit'])
+        stats = drainer.run(options['kind'])
+        for kind, result in stats.items():
+            rate = result['processed'] / result['seconds'] if result['seconds'] else 0
+            self.stdout.write('%s: %d processed, %d succeeded, %d failed, %d unknown (to reconcile), '
+                              '%d left for retry in %.1fs (%.1f/s)'
+                              % (kind, result['processed'], result['succeeded'], result['failed'], result['unknown'],
+                                 result['retry'], result['seconds'], rate))
@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...exports import export_transactions, EXPORT_FORMATS, EXPORT_MODELS
+
+
+class Command(BaseCommand):
+    help = 'Stream receive or send transactions to a file (or stdout) as NDJSON or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=sorted(EXPORT_MODELS), default='receive')
+        parser.add_argument('--output', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--gzip', action='store_true', default=False)
+        parser.add_argument('--file', help='Output file, defaults to stdout.')
+        parser.add_argument('--date-from', help='YYYY-MM-DD, inclusive.')
+        parser.add_argument('--date-to', help='YYYY-MM-DD, exclusive.')
+        parser.add_argument('--status')
+        parser.add_argument('--currency')
+        parser.add_argument('--account', help='Admin account Stellar address.')
+
+    def handle(self, *args, **options):
+        try:
+            chunks = export_transactions(options['type'],
+                                         output=options['output'],
+                                         compress=options['gzip'],
+                                         date_from=options['date_from'],
+                                         date_to=options['date_to'],
+                                         status=options['status'],
+                                         currency=options['currency'],
+                                         account=options['account'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        f = open(options['file'], 'wb') if options['file'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                f.write(chunk)
+        finally:
+            if options['file']:
+                f.close()
@@ -0,0 +1,16 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from ...health import ingest_health
+
+
+class Command(BaseCommand):
+    help = 'Report ingest lag and backlog per admin account. Exits with status 1 when unhealthy.'
+
+    def handle(self, *args, **options):
+        report = ingest_health()
+        self.stdout.write(json.dumps(report, indent=2, default=str))
+        if not report['healthy']:
+            sys.exit(1)
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ...benchmark.load import LoadTest, ASYNC_WORKER_CLASSES
+from ...benchmark.runner import save_report
+
+
+def worker_config(value: str) -> dict:
+    # worker_class[:workers[:threads]], e.g. sync:9 or gthread:4:8, gevent takes worker connections: gevent:2:500
+    parts = value.split(':')
+    config = {'worker_class': parts[0]}
+    if len(parts) > 1 and parts[1]:
+        config['workers'] = int(parts[1])
+    if len(parts) > 2 and parts[2]:
+        config['worker_connections' if parts[0] in ASYNC_WORKER_CLASSES else 'threads'] = int(parts[2])
+    return config
+
+
+class Command(BaseCommand):
+    help = ('Load test the federation, balance and account endpoints under gunicorn at stepped concurrency, '
+            'for each worker configuration, on a test database seeded with --users user accounts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--workers', nargs='+', default=['sync'],
+                            help='Gunicorn configurations as worker_class[:workers[:threads]], e.g. sync gthread:4:8. '
+                                 'For gevent the third field is the worker connections, e.g. gevent:2:500.')
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16, 64, 128])
+        parser.add_argument('--step-duration', type=float, default=20, help='Seconds per concurrency step.')
+        parser.add_argument('--horizon-latency', type=float, default=50, help='Fake Horizon latency in milliseconds.')
+        parser.add_argument('--output-dir', help='Defaults to BENCHMARK_DIR.')
+        parser.add_argument('--keepdb', action='store_true', default=False,
+                            help='Keep the seeded test database for the next run.')
+
+    def handle(self, *args, **options):
+        try:
+            configs = [worker_config(value) for value in options['workers']]
+        except ValueError:
+            raise CommandError('Invalid worker configuration.')
+
+        load_test = LoadTest(users=options['users'],
+                             configs=configs,
+                             concurrency=options['concurrency'],
+                             step_duration=options['step_duration'],
+                             horizon_latency=options['horizon_latency'] / 1000)
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, keepdb=options['keepdb'])
+        try:
+            report = load_test.run()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        path = save_report(dict(report, kind='loadtest'), options['output_dir'])
+        for result in report['results']:
+            if result['worker_class'] in ASYNC_WORKER_CLASSES:
+                self.stdout.write('%(worker_class)s, %(workers)s workers, %(worker_connections)s connections' % result)
+            else:
+                self.stdout.write('%(worker_class)s, %(workers)s workers, %(threads)s threads' % result)
+            for step in result['steps']:
+                self.stdout.write('  %4d clients: %8.1f req/s  p50 %.3fs  p99 %.3fs  failures %d  db connections %s'
+                                  % (step['concurrency'], step['per_second'], step['p50'] or 0, step['p99'] or 0,
+                                     step['failures'], step['db_connections_max']))
+        self.stdout.write('Report written to %s' % path)
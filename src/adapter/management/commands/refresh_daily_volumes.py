@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from ...aggregates import refresh_volumes
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily transaction volumes, from the watermark or from --since.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to recompute (YYYY-MM-DD).')
+
+    def handle(self, *args, **options):
+        since = datetime.strptime(options['since'], '%Y-%m-%d').date() if options['since'] else None
+        since = refresh_volumes(since)
+        self.stdout.write('Refreshed daily volumes since %s.' % since)
@@ -0,0 +1,74 @@
+"""
+Prometheus metrics for the adapter hot paths.
+
+Gunicorn and Celery processes write to a multiprocess directory (PROMETHEUS_MULTIPROC_DIR)
+per container, set up by their master process under METRICS_DIR, which is shared through /var.
+The metrics/ endpoint aggregates the samples of every process in every container. Processes
+started without one (management commands, shells) keep their metrics in memory.
+"""
+import glob
+import os
+import re
+import time
+
+from celery.signals import task_prerun, task_postrun, worker_process_shutdown
+from django.conf import settings
+from prometheus_client import Counter, Histogram, CollectorRegistry, REGISTRY, generate_latest, multiprocess
+
+HORIZON_LATENCY = Histogram('adapter_horizon_request_seconds', 'Horizon request latency.',
+                            ['endpoint', 'method', 'status'])
+FEDERATION_LATENCY = Histogram('adapter_federation_resolve_seconds', 'Federation address resolution latency.')
+STELLAR_TOML_CACHE = Counter('adapter_stellar_toml_cache_total', 'stellar.toml cache lookups.', ['result'])
+REHIVE_LATENCY = Histogram('adapter_rehive_request_seconds', 'Rehive API request latency.', ['endpoint', 'status'])
+INGEST_LAG = Histogram('adapter_ingest_lag_seconds', 'Time from ledger close to the receive being stored.',
+                       buckets=(1, 2.5, 5, 7.5, 10, 15, 30, 60, 120, 300, 600, float('inf')))
+RECEIVES = Counter('adapter_receives_total', 'Receive transactions stored.', ['currency'])
+SEND_SUBMISSIONS = Counter('adapter_send_submissions_total', 'Send submission outcomes.', ['outcome'])
+TASK_DURATION = Histogram('adapter_task_seconds', 'Celery task duration.', ['task', 'state'])
+
+# Collapse ids and hashes in Horizon paths so label cardinality stays bounded:
+HORIZON_PATH_IDS = re.compile(r'/(G[A-Z2-7]{55}|[0-9a-f]{64}|\d+)(?=/|$)')
+
+
+def horizon_endpoint(path: str) -> str:
+    return HORIZON_PATH_IDS.sub('/{id}', path)
+
+
+def is_multiprocess() -> bool:
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir'))
+
+
+class AllContainersCollector:
+    def collect(self):
+        files = glob.glob(os.path.join(getattr(settings, 'METRICS_DIR'), '*', '*.db'))
+        return multiprocess.MultiProcessCollector.merge(files, accumulate=True)
+
+
+def export():
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        registry.register(AllContainersCollector())
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+_task_starts = {}
+
+
+@task_prerun.connect
+def _task_started(task_id=None, **kwargs):
+    _task_starts[task_id] = time.time()
+
+
+@task_postrun.connect
+def _task_finished(task_id=None, task=None, state=None, **kwargs):
+    start = _task_starts.pop(task_id, None)
+    if start is not None:
+        TASK_DURATION.labels(task.name, state or 'UNKNOWN').observe(time.time() - start)
+
+
+@worker_process_shutdown.connect
+def _worker_shutdown(**kwargs):
+    if is_multiprocess():
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Move the hot Horizon fields out of the stored payment records and compact them. Receives are
+# linked to the hot wallet they were paid to (or the default one) so the ingest cursor finds them,
+# and the ledger is the upper 32 bits of the paging token:
+BACKFILL_SQL = """
+UPDATE adapter_receivetransaction AS t
+SET paging_token = (t.data->>'paging_token')::bigint,
+    operation_id = (t.data->>'id')::bigint,
+    ledger = (t.data->>'paging_token')::bigint >> 32,
+    data = t.data - '_links' - 'paging_token' - 'id' - 'source_account'
+WHERE t.paging_token IS NULL AND t.data ? 'paging_token';
+
+UPDATE adapter_receivetransaction AS t
+SET admin_account_id = COALESCE(
+    (SELECT a.id FROM adapter_adminaccount AS a WHERE a.account_id = t.data->>'to' ORDER BY a.id LIMIT 1),
+    (SELECT a.id FROM adapter_adminaccount AS a WHERE a."default" ORDER BY a.id LIMIT 1))
+WHERE t.admin_account_id IS NULL;
+
+-- Check the deferred foreign keys now, the table is altered later in this transaction:
+SET CONSTRAINTS ALL IMMEDIATE;
+"""
+
+# Payments ingested more than once keep their operation id on the first receive only, the
+# later copies stay for auditing but are no longer matched as that operation:
+DEDUPLICATE_SQL = """
+UPDATE adapter_receivetransaction
+SET operation_id = NULL
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id, row_number() OVER (PARTITION BY admin_account_id, operation_id ORDER BY id) AS n
+        FROM adapter_receivetransaction
+        WHERE operation_id IS NOT NULL
+    ) AS duplicates
+    WHERE n > 1
+);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adapter', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receivetransaction',
+            name='admin_account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='adapter.AdminAccount'),
+        ),
+        migrations.AddField(
+            model_name='receivetransaction',
+            name='paging_token',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='receivetransaction',
+            name='operation_id',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='receivetransaction',
+            name='ledger',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterIndexTogether(
+            name='receivetransaction',
+            index_together=set([('admin_account', 'paging_token')]),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+        migrations.RunSQL(DEDUPLICATE_SQL, migrations.RunSQL.noop),
+        migrations.AlterUniqueTogether(
+            name='receivetransaction',
+            unique_together=set([('admin_account', 'operation_id')]),
+        ),
+    ]
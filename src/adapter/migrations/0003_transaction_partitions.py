@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# Receives are keyed by the time of their Horizon payment, so re-ingesting a payment always
+# lands on the same (admin_account, operation_id, created) row:
+BACKFILL_SQL = """
+UPDATE adapter_receivetransaction
+SET created = (data->>'created_at')::timestamptz
+WHERE data ? 'created_at';
+
+SET CONSTRAINTS ALL IMMEDIATE;
+"""
+
+# Converts a table to monthly range partitions on created (Postgres 11+), keeping its columns,
+# defaults, indexes, unique and foreign key constraints and id sequence. Partitions cover the
+# existing history up to three months ahead (see ensure_partitions), plus a catch-all default:
+PARTITION_SQL = """
+CREATE FUNCTION pg_temp.partition_by_created(tbl text) RETURNS void AS $$
+DECLARE
+    legacy text := tbl || '_legacy';
+    def text;
+    month date;
+BEGIN
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', tbl, legacy);
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                   'PARTITION BY RANGE (created)', tbl, legacy);
+
+    -- Unique constraints on a partitioned table have to include the partition key:
+    EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (id, created)', tbl);
+    EXECUTE format('ALTER SEQUENCE %s OWNED BY %I.id', pg_get_serial_sequence(legacy, 'id'), tbl);
+
+    FOR def IN SELECT indexdef FROM pg_indexes
+               WHERE tablename = legacy AND indexdef NOT LIKE 'CREATE UNIQUE%' LOOP
+        EXECUTE format('CREATE INDEX ON %I USING %s', tbl, split_part(def, ' USING ', 2));
+    END LOOP;
+    FOR def IN SELECT pg_get_constraintdef(oid) FROM pg_constraint
+               WHERE conrelid = legacy::regclass AND contype IN ('u', 'f') LOOP
+        EXECUTE format('ALTER TABLE %I ADD %s', tbl, def);
+    END LOOP;
+
+    EXECUTE format('SELECT date_trunc(''month'', min(created) AT TIME ZONE ''UTC'')::date FROM %I', legacy)
+        INTO month;
+    month := COALESCE(month, date_trunc('month', now() AT TIME ZONE 'UTC')::date);
+    WHILE month <= date_trunc('month', now() AT TIME ZONE 'UTC')::date + interval '3 months' LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                       tbl || '_p' || to_char(month, 'YYYYMM'), tbl,
+                       month::timestamp AT TIME ZONE 'UTC', (month + interval '1 month') AT TIME ZONE 'UTC');
+        month := month + interval '1 month';
+    END LOOP;
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', tbl || '_default', tbl);
+
+    EXECUTE format('INSERT INTO %I SELECT * FROM %I', tbl, legacy);
+    EXECUTE format('DROP TABLE %I', legacy);
+END
+$$ LANGUAGE plpgsql;
+
+SELECT pg_temp.partition_by_created('adapter_receivetransaction');
+SELECT pg_temp.partition_by_created('adapter_sendtransaction');
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adapter', '0002_receivetransaction_horizon_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receivetransaction',
+            name='created',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='sendtransaction',
+            name='created',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+        migrations.AlterUniqueTogether(
+            name='receivetransaction',
+            unique_together=set([('admin_account', 'operation_id', 'created')]),
+        ),
+        migrations.RunSQL(PARTITION_SQL),
+    ]
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import adapter.models
+from django.db import migrations
+
+# Amounts were stored as decimals of the asset unit, they become integer stroops (7 decimal places):
+TO_STROOPS_SQL = 'ALTER TABLE {table} ALTER COLUMN amount TYPE bigint USING (amount * 10000000)::bigint'
+FROM_STROOPS_SQL = 'ALTER TABLE {table} ALTER COLUMN amount TYPE numeric(28, 18) USING amount / 10000000.0'
+
+TABLES = ('adapter_receivetransaction', 'adapter_sendtransaction')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adapter', '0003_transaction_partitions'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [TO_STROOPS_SQL.format(table=table) for table in TABLES],
+            [FROM_STROOPS_SQL.format(table=table) for table in TABLES],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='receivetransaction',
+                    name='amount',
+                    field=adapter.models.StroopField(default=0),
+                ),
+                migrations.AlterField(
+                    model_name='sendtransaction',
+                    name='amount',
+                    field=adapter.models.StroopField(default=0),
+                ),
+            ],
+        ),
+    ]
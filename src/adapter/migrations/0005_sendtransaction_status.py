@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+# Sends Horizon accepted kept the submission response (with the transaction hash) in data:
+BACKFILL_SQL = """
+UPDATE adapter_sendtransaction
+SET status = 'Complete'
+WHERE data ? 'hash';
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adapter', '0004_amounts_in_stroops'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sendtransaction',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Complete', 'Complete')], db_index=True, default='Pending', max_length=24),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
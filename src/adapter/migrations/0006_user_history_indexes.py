@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adapter', '0005_sendtransaction_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='useraccount',
+            name='user_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='useraccount',
+            name='account_id',
+            field=models.CharField(blank=True, db_index=True, max_length=200, null=True),
+        ),
+        migrations.AddField(
+            model_name='sendtransaction',
+            name='user_account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='adapter.UserAccount'),
+        ),
+        migrations.AlterIndexTogether(
+            name='receivetransaction',
+            index_together=set([('admin_account', 'paging_token'), ('user_account', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='sendtransaction',
+            index_together=set([('user_account', 'id')]),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import adapter.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adapter', '0006_user_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyVolume',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('currency', models.CharField(blank=True, default='', max_length=200)),
+                ('issuer', models.CharField(blank=True, default='', max_length=200)),
+                ('direction', models.CharField(choices=[('receive', 'Receive'), ('send', 'Send')], max_length=24)),
+                ('status', models.CharField(blank=True, default='', max_length=24)),
+                ('count', models.BigIntegerField(default=0)),
+                ('volume', adapter.models.StroopField(default=0)),
+                ('admin_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='adapter.AdminAccount')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyvolume',
+            unique_together=set([('day', 'admin_account', 'currency', 'issuer', 'direction', 'status')]),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# Keep the oldest of each duplicated (user_id, account_id) pair and move the transactions
+# of the other copies over to it before they are deleted:
+DEDUPLICATE_SQL = """
+CREATE TEMPORARY TABLE useraccount_duplicates ON COMMIT DROP AS
+SELECT id, min(id) OVER (PARTITION BY user_id, account_id) AS keep_id
+FROM adapter_useraccount
+WHERE user_id IS NOT NULL AND account_id IS NOT NULL;
+
+DELETE FROM useraccount_duplicates WHERE id = keep_id;
+
+UPDATE adapter_receivetransaction AS t SET user_account_id = d.keep_id
+FROM useraccount_duplicates AS d WHERE t.user_account_id = d.id;
+
+UPDATE adapter_sendtransaction AS t SET user_account_id = d.keep_id
+FROM useraccount_duplicates AS d WHERE t.user_account_id = d.id;
+
+DELETE FROM adapter_useraccount WHERE id IN (SELECT id FROM useraccount_duplicates);
+
+SET CONSTRAINTS ALL IMMEDIATE;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adapter', '0007_dailyvolume'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DEDUPLICATE_SQL, migrations.RunSQL.noop),
+        migrations.AlterUniqueTogether(
+            name='useraccount',
+            unique_together=set([('user_id', 'account_id')]),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adapter', '0008_useraccount_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adminaccount',
+            name='paging_token',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.7 on 2026-10-19 16:58
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adapter', '0009_adminaccount_paging_token'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='receivetransaction',
+            index_together=set([('user_account', 'id'), ('admin_account', 'paging_token'), ('admin_account', 'status')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='sendtransaction',
+            index_together=set([('user_account', 'id'), ('admin_account', 'status', 'created')]),
+        ),
+    ]
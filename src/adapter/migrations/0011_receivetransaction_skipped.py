@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adapter', '0010_transaction_status_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='receivetransaction',
+            name='status',
+            field=models.CharField(blank=True, choices=[('Waiting', 'Waiting'), ('Pending', 'Pending'), ('Complete', 'Complete'), ('Failed', 'Failed'), ('Skipped', 'Skipped')], db_index=True, max_length=24, null=True),
+        ),
+        migrations.AlterField(
+            model_name='receivetransaction',
+            name='user_account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='adapter.UserAccount'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adapter', '0011_receivetransaction_skipped'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sendtransaction',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Complete', 'Complete'), ('Failed', 'Failed')], db_index=True, default='Pending', max_length=24),
+        ),
+    ]
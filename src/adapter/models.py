@@ -1,11 +1,9 @@
+from collections import OrderedDict
 from logging import getLogger
 
-from decimal import Decimal
 from django.contrib.postgres.fields import JSONField
-from django.db import models
-
-from .api import Interface
-from .tasks import create_rehive_receive, confirm_rehive_transaction
+from django.db import connection, models
+from django.utils import timezone
 
 logger = getLogger('django')
 
@@ -18,12 +16,49 @@ class MoneyField(models.DecimalField):
         super(MoneyField, self).__init__(verbose_name, name, max_digits, decimal_places, **kwargs)
 
 
+class StroopField(models.BigIntegerField):
+    """Integer amount in the asset's smallest unit (stroops, 7 decimal places)."""
+
+    def __init__(self, verbose_name=None, name=None, **kwargs):
+        kwargs.setdefault('default', 0)
+        super(StroopField, self).__init__(verbose_name, name, **kwargs)
+
+
 # User accounts for receiving
 class UserAccount(models.Model):
-    user_id = models.CharField(max_length=100, null=True, blank=True)
-    account_id = models.CharField(max_length=200, null=True, blank=True)  # Crypto Address
+    user_id = models.CharField(max_length=100, null=True, blank=True, db_index=True)
+    account_id = models.CharField(max_length=200, null=True, blank=True, db_index=True)  # Crypto Address
     last_transaction = JSONField(null=True, blank=True, default={})
 
+    class Meta:
+        unique_together = [('user_id', 'account_id')]
+
+    @classmethod
+    def bulk_get_or_create(cls, accounts) -> list:
+        """
+        Insert (user_id, account_id) pairs in a single statement and return the stored
+        accounts, existing or new, in input order (duplicate pairs once).
+        """
+        accounts = list(OrderedDict.fromkeys(accounts))
+        if not accounts:
+            return []
+        # NULLs never conflict, so they would be inserted again on every call:
+        if any(user_id is None or account_id is None for user_id, account_id in accounts):
+            raise ValueError('Accounts require a user_id and an account_id.')
+
+        # The no-op update makes existing rows (even ones committed concurrently) come back too:
+        user_ids, account_ids = zip(*accounts)
+        with connection.cursor() as cursor:
+            cursor.execute('INSERT INTO {table} (user_id, account_id, last_transaction) '
+                           "SELECT unnest(%s::varchar[]), unnest(%s::varchar[]), '{{}}'::jsonb "
+                           'ON CONFLICT (user_id, account_id) DO UPDATE SET user_id = EXCLUDED.user_id '
+                           'RETURNING id, user_id, account_id, last_transaction'.format(table=cls._meta.db_table),
+                           [list(user_ids), list(account_ids)])
+            stored = {(row[1], row[2]): cls.from_db('default', ['id', 'user_id', 'account_id', 'last_transaction'], row)
+                      for row in cursor.fetchall()}
+
+        return [stored[account] for account in accounts]
+
 
 # Log of all receive transactions processed.
 class ReceiveTransaction(models.Model):
@@ -32,26 +67,65 @@ class ReceiveTransaction(models.Model):
         ('Pending', 'Pending'),
         ('Complete', 'Complete'),
         ('Failed', 'Failed'),
+        # Unknown memo or untrusted asset, stored but never sent to Rehive:
+        ('Skipped', 'Skipped'),
     )
-    user_account = models.ForeignKey(UserAccount)
+    admin_account = models.ForeignKey('AdminAccount', null=True, blank=True)
+    user_account = models.ForeignKey(UserAccount, null=True, blank=True)
     external_id = models.CharField(max_length=100, null=True, blank=True, db_index=True)
     rehive_code = models.CharField(max_length=100, null=True, blank=True, db_index=True)
     recipient = models.CharField(max_length=200, null=True, blank=True)
-    amount = MoneyField(default=Decimal(0))
+    amount = StroopField()
     currency = models.CharField(max_length=200, null=True, blank=True)
     issuer = models.CharField(max_length=200, null=True, blank=True)
     rehive_response = JSONField(null=True, blank=True, default={})
     status = models.CharField(max_length=24, choices=STATUS, null=True, blank=True, db_index=True)
+    # Hot Horizon fields, the rest of the (compacted) record is kept in data:
+    paging_token = models.BigIntegerField(null=True, blank=True, db_index=True)
+    operation_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    ledger = models.BigIntegerField(null=True, blank=True, db_index=True)
     data = JSONField(null=True, blank=True, default={})
     metadata = JSONField(null=True, blank=True, default={})
+    # Partition key, see partitions.py. Receives use the Horizon payment's time:
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        index_together = [('admin_account', 'paging_token'), ('user_account', 'id'), ('admin_account', 'status')]
+        unique_together = [('admin_account', 'operation_id', 'created')]
+
+    @classmethod
+    def create_once(cls, **kwargs):
+        """
+        Insert a receive unless the same Horizon operation (and payment time) is already stored for the account,
+        in a single statement that is safe against concurrent ingest runs. None for duplicates.
+        """
+        tx = cls(**kwargs)
+        fields = [f for f in cls._meta.concrete_fields if not f.primary_key]
+        with connection.cursor() as cursor:
+            cursor.execute('INSERT INTO {table} ({columns}) VALUES ({values}) '
+                           'ON CONFLICT DO NOTHING RETURNING id'.format(
+                               table=cls._meta.db_table,
+                               columns=', '.join(connection.ops.quote_name(f.column) for f in fields),
+                               values=', '.join(['%s'] * len(fields))),
+                           [f.get_db_prep_save(f.pre_save(tx, True), connection) for f in fields])
+            row = cursor.fetchone()
+
+        if row is None:
+            return None
+        tx.id = row[0]
+        tx._state.adding = False
+        tx._state.db = 'default'
+        return tx
 
     def upload_to_rehive(self):
+        from .tasks import create_rehive_receive, confirm_rehive_transaction
+
         if not self.rehive_code:
             if self.status in ['Pending', 'Complete']:
-                create_rehive_receive(self.id)
+                create_rehive_receive.delay(self.id)
         else:
             if self.status == 'Complete':
-                confirm_rehive_transaction(self.id)
+                confirm_rehive_transaction.delay(self.id, 'receive')
 
 
 # Log of all processed sends.
@@ -59,21 +133,29 @@ class SendTransaction(models.Model):
     STATUS = (
         ('Pending', 'Pending'),
         ('Complete', 'Complete'),
+        ('Failed', 'Failed'),
     )
     TYPE = (
         ('send', 'Send'),
         ('receive', 'Receive'),
     )
-    admin_account = models.ForeignKey(AdminAccount)
+    admin_account = models.ForeignKey('AdminAccount')
+    user_account = models.ForeignKey(UserAccount, null=True, blank=True)
     external_id = models.CharField(max_length=100, null=True, blank=True, db_index=True)
     rehive_code = models.CharField(max_length=100, null=True, blank=True, db_index=True)
     recipient = models.CharField(max_length=200, null=True, blank=True)
-    amount = MoneyField(default=Decimal(0))
+    amount = StroopField()
     currency = models.CharField(max_length=200, null=True, blank=True)
     issuer = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=24, choices=STATUS, default='Pending', db_index=True)
     rehive_request = JSONField(null=True, blank=True, default={})
     data = JSONField(null=True, blank=True, default={})
     metadata = JSONField(null=True, blank=True, default={})
+    # Partition key, see partitions.py:
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        index_together = [('user_account', 'id'), ('admin_account', 'status', 'created')]
 
     def execute(self):
         account = AdminAccount.objects.get(default=True)
@@ -87,14 +169,20 @@ class AdminAccount(models.Model):
     account_id = models.CharField(max_length=200, null=True, blank=True)  # Crypto Address
     network = models.CharField(max_length=100, null=True, blank=True)  # e.g. 'testnet'
     default = models.BooleanField(default=False)
+    # Paging token of the last Horizon payment processed by the receive ingest:
+    paging_token = models.BigIntegerField(null=True, blank=True)
 
     # For cryptos like stellar where all transactions are received to single account.
     # Alternative to webhooks.
     def process_receive_transactions(self):
+        from .api import Interface
+
         interface = Interface(account=self)
-        interface.process_receives()
+        return interface.process_receives()
 
     def process_send(self, tx):
+        from .api import Interface
+
         interface = Interface(account=self)
         interface.process_send(tx)
 
@@ -107,5 +195,20 @@ class Asset(models.Model):
     metadata = JSONField(null=False, blank=True, default={})
 
 
-
-
+# Daily transaction count and volume per account, asset, direction and status, see aggregates.py.
+class DailyVolume(models.Model):
+    DIRECTION = (
+        ('receive', 'Receive'),
+        ('send', 'Send'),
+    )
+    day = models.DateField()
+    admin_account = models.ForeignKey(AdminAccount)
+    currency = models.CharField(max_length=200, blank=True, default='')
+    issuer = models.CharField(max_length=200, blank=True, default='')
+    direction = models.CharField(max_length=24, choices=DIRECTION)
+    status = models.CharField(max_length=24, blank=True, default='')
+    count = models.BigIntegerField(default=0)
+    volume = StroopField()
+
+    class Meta:
+        unique_together = [('day', 'admin_account', 'currency', 'issuer', 'direction', 'status')]
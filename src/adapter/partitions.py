@@ -0,0 +1,132 @@
+"""
+Monthly range partitioning (Postgres 11+) of the transaction log tables on `created`.
+
+Tables are converted by the 0003_transaction_partitions migration. Upcoming months
+are created ahead of time by the `ensure_transaction_partitions` task and old months
+are archived to gzipped CSV and dropped with `manage.py archive_transactions`.
+"""
+import gzip
+import os
+import re
+from datetime import date, datetime
+from logging import getLogger
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ReceiveTransaction, SendTransaction
+
+logger = getLogger('django')
+
+PARTITIONED_MODELS = (ReceiveTransaction, SendTransaction)
+
+PARTITION_NAME = re.compile(r'^(?P<table>.+)_p(?P<year>\d{4})(?P<month>\d{2})$')
+
+
+def qn(name):
+    return connection.ops.quote_name(name)
+
+
+def add_months(month: date, count: int) -> date:
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return '%s_p%04d%02d' % (table, month.year, month.month)
+
+
+def is_partitioned(cursor, table: str) -> bool:
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [table])
+    return cursor.fetchone()[0] == 'p'
+
+
+def monthly_partitions(cursor, table: str):
+    """
+    List (name, month) for all monthly partitions of a table, oldest first.
+    """
+    cursor.execute("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                   "WHERE i.inhparent = %s::regclass", [table])
+
+    partitions = []
+    for (name,) in cursor.fetchall():
+        match = PARTITION_NAME.match(name)
+        if match and match.group('table') == table:
+            partitions.append((name, date(int(match.group('year')), int(match.group('month')), 1)))
+
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def create_partition(cursor, table: str, month: date):
+    name = partition_name(table, month)
+    cursor.execute('SELECT to_regclass(%s)', [name])
+    if cursor.fetchone()[0] is not None:
+        return
+
+    end = add_months(month, 1)
+    bounds = [datetime(month.year, month.month, 1, tzinfo=timezone.utc),
+              datetime(end.year, end.month, 1, tzinfo=timezone.utc)]
+    default = qn(table + '_default')
+
+    # Postgres refuses a new partition while the default one holds rows in its range, so
+    # those rows are moved into it with the default partition detached:
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM %s WHERE created >= %%s AND created < %%s)' % default, bounds)
+    stray = cursor.fetchone()[0]
+    if stray:
+        logger.warning('Moving %s rows out of the default partition into %s' % (table, name))
+        cursor.execute('ALTER TABLE %s DETACH PARTITION %s' % (qn(table), default))
+
+    cursor.execute('CREATE TABLE %s PARTITION OF %s FOR VALUES FROM (%%s) TO (%%s)' % (qn(name), qn(table)), bounds)
+
+    if stray:
+        cursor.execute('INSERT INTO %s SELECT * FROM %s WHERE created >= %%s AND created < %%s'
+                       % (qn(name), default), bounds)
+        cursor.execute('DELETE FROM %s WHERE created >= %%s AND created < %%s' % default, bounds)
+        cursor.execute('ALTER TABLE %s ATTACH PARTITION %s DEFAULT' % (qn(table), default))
+
+
+def ensure_partitions(model, months_ahead: int=3):
+    table = model._meta.db_table
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor, table):
+            return
+
+        month = month_start(timezone.now())
+        for i in range(months_ahead + 1):
+            create_partition(cursor, table, add_months(month, i))
+
+
+def archive_partitions(model, before: date, directory: str):
+    """
+    Dump every monthly partition that ends on or before `before` to
+    `<directory>/<partition>.csv.gz`, then detach and drop it.
+    """
+    table = model._meta.db_table
+    os.makedirs(directory, exist_ok=True)
+    archived = []
+
+    with connection.cursor() as cursor:
+        for name, month in monthly_partitions(cursor, table):
+            if add_months(month, 1) > before:
+                continue
+
+            path = os.path.join(directory, '%s.csv.gz' % name)
+            logger.info('Archiving partition %s to %s' % (name, path))
+
+            with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as f:
+                cursor.copy_expert('COPY %s TO STDOUT WITH CSV HEADER' % qn(name), f)
+            os.replace(path + '.tmp', path)
+
+            # Only drop once the archive is safely on disk:
+            with transaction.atomic():
+                cursor.execute('ALTER TABLE %s DETACH PARTITION %s' % (qn(table), qn(name)))
+                cursor.execute('DROP TABLE %s' % qn(name))
+
+            archived.append(path)
+
+    return archived
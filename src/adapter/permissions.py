@@ -2,7 +2,7 @@ import os
 from rest_framework import permissions
 from logging import getLogger
 
-from stellar_adapter import settings
+from . import settings
 
 logger = getLogger('django')
 
@@ -19,5 +19,5 @@ def authenticate(required_secret, request, view):
 
 class AdapterGlobalPermission(permissions.BasePermission):
     def has_permission(self, request, view):
-        return authenticate(getattr(settings, 'ADAPTER_TOKEN'), request, view)
+        return authenticate(getattr(settings, 'ADAPTER_SECRET_KEY'), request, view)
 
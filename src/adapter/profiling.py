@@ -0,0 +1,195 @@
+"""
+Sampling profiler for requests and Celery tasks.
+
+A fraction (PROFILING_SAMPLE_RATE) of requests and tasks is profiled by a background
+thread that records the profiled thread's stack every PROFILING_INTERVAL seconds.
+Stacks are aggregated per view or task name and written to PROFILING_DIR as
+collapsed-stack files (`frame;frame;frame count`), ready for flamegraph.pl or speedscope.
+
+Overhead is bounded by the sample rate, the number of profiles running at once per
+process (PROFILING_MAX_CONCURRENT) and the samples taken per profile (PROFILING_MAX_SAMPLES).
+
+Not available in gevent processes (config.async_wsgi): requests there are greenlets on one
+OS thread, which a sampling thread can neither see nor run next to, so profiling stays off.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from logging import getLogger
+
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = getLogger('django')
+
+_profiles = {}
+_profiles_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(getattr(settings, 'PROFILING_MAX_CONCURRENT', 2))
+_last_flush = time.time()
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return '%s:%s:%s' % (os.path.basename(code.co_filename), code.co_name, frame.f_lineno)
+
+
+def _collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+class Sampler(threading.Thread):
+    """
+    Samples the stack of one thread until stopped.
+    """
+
+    def __init__(self, thread_id: int):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.interval = getattr(settings, 'PROFILING_INTERVAL', 0.005)
+        self.max_samples = getattr(settings, 'PROFILING_MAX_SAMPLES', 2000)
+        self._stopped = threading.Event()
+
+    def run(self):
+        samples = 0
+        while samples < self.max_samples and not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            self.stacks[_collapse(frame)] += 1
+            samples += 1
+
+    def stop(self) -> Counter:
+        self._stopped.set()
+        self.join()
+        return self.stacks
+
+
+def is_gevent_patched() -> bool:
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('threading')
+
+
+def should_profile() -> bool:
+    return (getattr(settings, 'PROFILING_ENABLED', False) and not is_gevent_patched() and
+            random.random() < getattr(settings, 'PROFILING_SAMPLE_RATE', 0.01))
+
+
+def start_profile():
+    """
+    Start sampling the current thread, or return None if no profiling slot is free.
+    """
+    if not _slots.acquire(blocking=False):
+        return None
+    sampler = Sampler(threading.get_ident())
+    sampler.start()
+    return sampler
+
+
+def finish_profile(sampler: Sampler, name: str):
+    try:
+        stacks = sampler.stop()
+    finally:
+        _slots.release()
+
+    with _profiles_lock:
+        _profiles.setdefault(name, Counter()).update(stacks)
+
+    if time.time() - _last_flush > getattr(settings, 'PROFILING_FLUSH_INTERVAL', 60):
+        flush_profiles()
+
+
+def flush_profiles():
+    """
+    Write the aggregated stacks of this process, one collapsed-stack file per view or task.
+    """
+    global _last_flush
+
+    with _profiles_lock:
+        profiles = {name: Counter(stacks) for name, stacks in _profiles.items()}
+        _last_flush = time.time()
+
+    directory = getattr(settings, 'PROFILING_DIR')
+    os.makedirs(directory, exist_ok=True)
+    for name, stacks in profiles.items():
+        path = os.path.join(directory, '%s.%s.collapsed' % (name, os.getpid()))
+        with open(path + '.tmp', 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write('%s %s\n' % (stack, count))
+        os.replace(path + '.tmp', path)
+
+
+@worker_process_shutdown.connect
+def _flush_on_shutdown(**kwargs):
+    if _profiles:
+        flush_profiles()
+
+
+def _view_name(view_func) -> str:
+    view_class = getattr(view_func, 'view_class', getattr(view_func, 'cls', None))
+    if view_class is not None:
+        return '%s.%s' % (view_class.__module__, view_class.__name__)
+    return '%s.%s' % (view_func.__module__, view_func.__name__)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a sample of requests, aggregated per view.
+    """
+
+    def __init__(self):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed()
+        if is_gevent_patched():
+            logger.warning('Profiling is not supported under gevent, the profiling middleware is disabled.')
+            raise MiddlewareNotUsed()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if should_profile():
+            sampler = start_profile()
+            if sampler is not None:
+                request._profile = (sampler, _view_name(view_func))
+
+    @staticmethod
+    def _finish(request):
+        profile = getattr(request, '_profile', None)
+        if profile is not None:
+            del request._profile
+            finish_profile(*profile)
+
+    def process_exception(self, request, exception):
+        # Release the slot even if process_response is never reached for this request:
+        self._finish(request)
+
+    def process_response(self, request, response):
+        self._finish(request)
+        return response
+
+
+def profiled(func):
+    """
+    Profile a sample of calls of a Celery task function, aggregated per function.
+    Apply below @shared_task.
+    """
+    name = '%s.%s' % (func.__module__, func.__name__)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        sampler = start_profile() if should_profile() else None
+        if sampler is None:
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            finish_profile(sampler, name)
+
+    return wrapper
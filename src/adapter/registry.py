@@ -0,0 +1,140 @@
+"""
+In-process registry of trusted assets, so the receive and send paths resolve
+assets without a database query or a stellar.toml fetch.
+
+Each process loads the registry on first use (and Celery workers at start up). It is
+reloaded when the shared version key is bumped, checked at most every
+ASSET_REGISTRY_CHECK_INTERVAL seconds, or after ASSET_REGISTRY_TTL seconds.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+
+from celery.signals import worker_process_init
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Asset
+from .stellar_federation import currencies_from_domain
+
+logger = getLogger('django')
+
+VERSION_KEY = 'adapter:assets:version'
+DOMAINS_KEY = 'adapter:assets:domains'
+
+# Cached for assets that are not trusted, until the next reload:
+UNTRUSTED = object()
+
+
+def is_domain(issuer) -> bool:
+    # Issuers are stored as an account id, a federation address or an anchor domain:
+    return bool(issuer) and '*' not in issuer and '.' in issuer
+
+
+class AssetRegistry:
+    def __init__(self):
+        self._by_account = {}
+        self._by_domain = {}
+        self._version = None
+        self._loaded = 0
+        self._checked = 0
+        self._lock = threading.Lock()
+
+    def _is_stale(self) -> bool:
+        now = time.time()
+        if now - self._loaded > getattr(settings, 'ASSET_REGISTRY_TTL', 300):
+            return True
+        if now - self._checked > getattr(settings, 'ASSET_REGISTRY_CHECK_INTERVAL', 5):
+            self._checked = now
+            return cache.get(VERSION_KEY) != self._version
+        return False
+
+    def load(self):
+        with self._lock:
+            version = cache.get(VERSION_KEY)
+
+            # Anchor stellar.toml currencies first, so that trusted assets take precedence:
+            by_domain = dict(cache.get(DOMAINS_KEY) or {})
+            by_account = {}
+            for asset in Asset.objects.all():
+                by_account[(asset.code, asset.account_id)] = asset
+                if is_domain(asset.issuer):
+                    by_domain[(asset.code, asset.issuer)] = asset.account_id
+
+            self._by_account, self._by_domain = by_account, by_domain
+            self._version = version
+            self._loaded = self._checked = time.time()
+
+        logger.info('Loaded asset registry: %s assets' % len(by_account))
+
+    def _ensure_loaded(self):
+        if self._is_stale():
+            self.load()
+
+    def get(self, code: str, account_id: str):
+        """
+        Trusted Asset by code and issuer account, falling back to the database on a miss. Misses are
+        remembered too, so a stream of payments in an untrusted asset does not query the database each time.
+        """
+        self._ensure_loaded()
+        asset = self._by_account.get((code, account_id))
+        if asset is None:
+            asset = Asset.objects.filter(code=code, account_id=account_id).first()
+            self._by_account[(code, account_id)] = UNTRUSTED if asset is None else asset
+        return None if asset is UNTRUSTED else asset
+
+    def address_for_domain(self, code: str, domain: str):
+        """
+        Issuer account for an asset code of an anchor domain, falling back to its stellar.toml on a miss.
+        """
+        self._ensure_loaded()
+        address = self._by_domain.get((code, domain))
+        if address is None:
+            address = currencies_from_domain(domain).get(code)
+            if address is not None:
+                self._by_domain[(code, domain)] = address
+        return address
+
+
+asset_registry = AssetRegistry()
+
+
+def invalidate_asset_registry():
+    # A new random version rather than incr, which is a get and set on the file cache and resets the timeout:
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def refresh_anchor_currencies():
+    """
+    Fetch CURRENCIES from the stellar.toml of every anchor domain we trust assets from
+    and share the result with all processes.
+    """
+    domains = {issuer for issuer in Asset.objects.values_list('issuer', flat=True).distinct() if is_domain(issuer)}
+
+    def fetch(domain):
+        try:
+            return currencies_from_domain(domain)
+        except Exception as exc:
+            logger.exception(exc)
+            return {}
+
+    mapping = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(16, len(domains)))) as executor:
+        for domain, currencies in zip(domains, executor.map(fetch, domains)):
+            for code, address in currencies.items():
+                mapping[(code, domain)] = address
+
+    cache.set(DOMAINS_KEY, mapping, None)
+    invalidate_asset_registry()
+    return mapping
+
+
+@worker_process_init.connect
+def load_asset_registry(**kwargs):
+    try:
+        asset_registry.load()
+    except Exception as exc:
+        # Loaded lazily on first use instead:
+        logger.exception(exc)
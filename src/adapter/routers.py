@@ -0,0 +1,89 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from logging import getLogger
+
+from django.conf import settings
+from django.db import connections, DatabaseError
+
+logger = getLogger('django')
+
+_state = threading.local()
+_replica_health = {}
+
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+
+@contextmanager
+def read_replica():
+    """
+    Route ORM reads inside the block to a healthy replica. Writes always go to the primary, and
+    once the block has written its later reads go to the primary too, so they see the write.
+    """
+    previous = getattr(_state, 'read_replica', False), getattr(_state, 'pinned', False)
+    _state.read_replica, _state.pinned = True, False
+    try:
+        yield
+    finally:
+        _state.read_replica, _state.pinned = previous
+
+
+def _is_healthy(alias: str) -> bool:
+    checked, healthy = _replica_health.get(alias, (0, False))
+    if time.time() - checked < getattr(settings, 'DATABASE_REPLICA_CHECK_INTERVAL', 5):
+        return healthy
+
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL)
+            lag = cursor.fetchone()[0]
+        healthy = lag is not None and lag <= getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 10)
+        if not healthy:
+            logger.info('Replica %s lagging (%s seconds), reading from primary.' % (alias, lag))
+    except DatabaseError as exc:
+        logger.info('Replica %s unavailable, reading from primary: %s' % (alias, exc))
+        healthy = False
+
+    _replica_health[alias] = (time.time(), healthy)
+    return healthy
+
+
+def get_replica():
+    replicas = [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if _is_healthy(alias)]
+    return random.choice(replicas) if replicas else 'default'
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'read_replica', False) and not getattr(_state, 'pinned', False):
+            return get_replica()
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        if getattr(_state, 'read_replica', False):
+            _state.pinned = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary:
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReadReplicaMixin:
+    """
+    View mixin that serves safe (read-only) requests from a replica.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            with read_replica():
+                return super(ReadReplicaMixin, self).dispatch(request, *args, **kwargs)
+        return super(ReadReplicaMixin, self).dispatch(request, *args, **kwargs)
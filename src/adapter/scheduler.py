@@ -0,0 +1,168 @@
+"""
+Adaptive scheduling for the receive ingest.
+
+Instead of polling Horizon on a fixed beat, each ingest run schedules the next one:
+
+- immediately while payment pages come back full (catching up on a burst),
+- otherwise just after the next expected ledger close, using an EWMA of observed close intervals,
+- skipping further ledgers (up to INGEST_MAX_IDLE_LEDGERS) while polls keep finding nothing.
+
+Payments are only fetched once the ledger head has moved past the last poll. A watchdog beat
+task restarts the chain if it dies. Only the chain holding the current token keeps running, and
+each run holds a per-account Postgres advisory lock so a replaced chain's last run never overlaps
+the new chain's first.
+"""
+import math
+import time
+import uuid
+from contextlib import contextmanager
+from logging import getLogger
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, DatabaseError
+
+from .horizon import get_horizon
+from .utils import parse_horizon_time
+
+logger = getLogger('django')
+
+CHAIN_KEY = 'adapter:ingest:chain:%s'
+HEARTBEAT_KEY = 'adapter:ingest:heartbeat:%s'
+STATE_KEY = 'adapter:ingest:state:%s'
+
+# Weight of the latest ledger close interval in the EWMA:
+CLOSE_INTERVAL_ALPHA = 0.2
+
+# First key of the (namespace, account id) advisory lock held by ingest runs:
+INGEST_LOCK_NAMESPACE = 7301
+
+
+def latest_ledger(network: str) -> dict:
+    return get_horizon(network).get('/ledgers', params={'order': 'desc', 'limit': 1})['_embedded']['records'][0]
+
+
+class IngestScheduler:
+    def __init__(self, account):
+        self.account = account
+        self.state = self.load()
+
+    def load(self) -> dict:
+        return cache.get(STATE_KEY % self.account.id) or {
+            'ledger': None,           # Latest ledger head seen
+            'closed_at': None,        # Close time of that ledger (epoch seconds)
+            'interval': getattr(settings, 'INGEST_LEDGER_INTERVAL', 5.0),
+            'processed_ledger': None, # Ledger head at the last payments poll
+            'processed_closed_at': None,
+            'polled_at': None,
+            'page_full': False,
+            'idle': 0,                # Consecutive polls without new payments
+        }
+
+    # Chain ownership
+    # -----------------------------------------------------------------------------------------------------------------
+    def start_chain(self) -> str:
+        token = uuid.uuid4().hex
+        cache.set(CHAIN_KEY % self.account.id, token, None)
+        return token
+
+    def owns_chain(self, token: str) -> bool:
+        return cache.get(CHAIN_KEY % self.account.id) == token
+
+    def is_alive(self) -> bool:
+        return self.last_heartbeat() is not None
+
+    def last_heartbeat(self):
+        return cache.get(HEARTBEAT_KEY % self.account.id)
+
+    def heartbeat(self, delay: float):
+        cache.set(HEARTBEAT_KEY % self.account.id, time.time(),
+                  int(delay + getattr(settings, 'INGEST_HEARTBEAT_GRACE', 30)))
+
+    @contextmanager
+    def lock(self):
+        """
+        Session level advisory lock on the account for the duration of a run, yields whether it was acquired.
+        Postgres releases it by itself if the worker's connection dies.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', [INGEST_LOCK_NAMESPACE, self.account.id])
+            acquired = cursor.fetchone()[0]
+
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute('SELECT pg_advisory_unlock(%s, %s)', [INGEST_LOCK_NAMESPACE, self.account.id])
+                except DatabaseError as exc:
+                    # The connection is gone, and the lock with it:
+                    logger.info('Could not release the ingest lock: %s' % exc)
+
+    # Scheduling
+    # -----------------------------------------------------------------------------------------------------------------
+    def observe_ledger(self, ledger: dict):
+        sequence = ledger['sequence']
+        closed_at = parse_horizon_time(ledger['closed_at'])
+
+        if self.state['ledger'] and sequence > self.state['ledger']:
+            interval = (closed_at - self.state['closed_at']) / (sequence - self.state['ledger'])
+            if interval > 0:
+                self.state['interval'] = (CLOSE_INTERVAL_ALPHA * interval +
+                                          (1 - CLOSE_INTERVAL_ALPHA) * self.state['interval'])
+
+        self.state['ledger'] = sequence
+        self.state['closed_at'] = closed_at
+
+    def should_poll(self) -> bool:
+        return self.state['page_full'] or self.state['ledger'] != self.state['processed_ledger']
+
+    def observe_poll(self, result: dict):
+        self.state['processed_ledger'] = self.state['ledger']
+        self.state['processed_closed_at'] = self.state['closed_at']
+        self.state['polled_at'] = time.time()
+        self.state['page_full'] = result['page_full']
+        # Idle polls only count up to where the wait reaches INGEST_MAX_IDLE_LEDGERS (see next_delay):
+        max_idle = math.ceil(math.log2(max(1, getattr(settings, 'INGEST_MAX_IDLE_LEDGERS', 4))))
+        self.state['idle'] = 0 if result['payments'] else min(self.state['idle'] + 1, max_idle)
+
+    def next_delay(self) -> float:
+        if self.state['page_full']:
+            return 0
+
+        # Wait for the 1st, 2nd, 4th... ledger close from now while idle:
+        ledgers = min(2 ** self.state['idle'], getattr(settings, 'INGEST_MAX_IDLE_LEDGERS', 4))
+        next_close = (self.state['closed_at'] or time.time()) + ledgers * self.state['interval']
+        delay = next_close + getattr(settings, 'INGEST_CLOSE_OFFSET', 0.5) - time.time()
+
+        # Never wait less than a fraction of a ledger if Horizon's head lags, or more than the cap:
+        return max(getattr(settings, 'INGEST_MIN_DELAY', 1.0),
+                   min(delay, getattr(settings, 'INGEST_MAX_DELAY', 30.0)))
+
+    def save(self):
+        cache.set(STATE_KEY % self.account.id, self.state, None)
+
+    def run(self) -> float:
+        """
+        One ingest step: poll payments if there is anything new and return the delay until the next step.
+        """
+        with self.lock() as acquired:
+            if not acquired:
+                # A run of an overlapping chain is still in progress, check back shortly:
+                logger.info('Receive ingest already running for account %s.' % self.account.id)
+                return getattr(settings, 'INGEST_MIN_DELAY', 1.0)
+
+            # Pick up the state saved by whichever run held the lock last:
+            self.state = self.load()
+            self.observe_ledger(latest_ledger(self.account.network))
+
+            if self.should_poll():
+                result = self.account.process_receive_transactions()
+                self.observe_poll(result)
+                logger.info('Ingested %s receives from %s payments (ledger %s).'
+                            % (result['receives'], result['payments'], self.state['ledger']))
+
+            delay = self.next_delay()
+            self.save()
+            return delay
@@ -4,6 +4,8 @@ from rest_framework import serializers
 
 from logging import getLogger
 
+from .utils import input_to_json
+
 logger = getLogger('django')
 
 
@@ -26,8 +28,37 @@ class UserAccountSerializer(serializers.Serializer):
     user_id = serializers.CharField(required=True)
     metadata = serializers.JSONField(required=False)
 
+    def validate_metadata(self, value):
+        # Metadata may be posted as a JSON string:
+        try:
+            metadata = input_to_json(value)
+        except ValueError:
+            raise serializers.ValidationError('Invalid JSON.')
+        if not isinstance(metadata, dict) or not metadata.get('username'):
+            raise serializers.ValidationError('A username is required.')
+        return metadata
+
+    def validate(self, attrs):
+        if 'metadata' not in attrs:
+            raise serializers.ValidationError({'metadata': 'A username is required.'})
+        return attrs
+
+
+class BulkUserAccountSerializer(serializers.Serializer):
+    accounts = UserAccountSerializer(many=True)
+
 
 class AddAssetSerializer(serializers.Serializer):
-    code = serializers.CharField(required=True)
-    issuer = serializers.CharField(required=True)
+    code = serializers.CharField(required=True, max_length=12)
+    issuer = serializers.CharField(required=True, max_length=200)
     metadata = serializers.JSONField(required=False)
+
+    def validate_metadata(self, value):
+        try:
+            return input_to_json(value)
+        except ValueError:
+            raise serializers.ValidationError('Invalid JSON.')
+
+
+class BulkAddAssetSerializer(serializers.Serializer):
+    assets = AddAssetSerializer(many=True)
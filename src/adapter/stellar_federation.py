@@ -2,46 +2,83 @@
 from collections import OrderedDict
 from logging import getLogger
 
-import requests
-import toml
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework.exceptions import MethodNotAllowed, ValidationError, ParseError
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from src.adapter.exceptions import NotImplementedAPIError
-from src.adapter.models import UserAccount
-from src.adapter.throttling import NoThrottling
+from .exceptions import NotImplementedAPIError
+from .metrics import FEDERATION_LATENCY, STELLAR_TOML_CACHE
+from .models import UserAccount
+from .routers import ReadReplicaMixin
+from .throttling import NoThrottling
+from .utils import http_session
 
 logger = getLogger('django')
 
 STELLAR_WALLET_DOMAIN = 'luuun.com'
 
+STELLAR_TOML_KEY = 'adapter:stellar_toml:%s'
+
+_session = None
+
+
+def federation_session():
+    # Shared, so federation and stellar.toml lookups reuse pooled connections:
+    global _session
+    if _session is None:
+        _session = http_session()
+    return _session
+
+
+def get_stellar_toml(domain):
+    """
+    Parsed stellar.toml of a domain, cached for STELLAR_TOML_CACHE_TIMEOUT seconds.
+    """
+    key = STELLAR_TOML_KEY % domain
+    stellar_toml = cache.get(key)
+    if stellar_toml is None:
+        import toml
+
+        STELLAR_TOML_CACHE.labels('miss').inc()
+        stellar_toml = toml.loads(federation_session().get('https://' + domain + '/.well-known/stellar.toml').text)
+        cache.set(key, stellar_toml, getattr(settings, 'STELLAR_TOML_CACHE_TIMEOUT', 300))
+    else:
+        STELLAR_TOML_CACHE.labels('hit').inc()
+    return stellar_toml
+
 
 def get_federation_details(address):
     if '*' not in address:
         raise TypeError('Invalid federation address')
-    user_id, domain = address.split('*')
-    stellar_toml = requests.get('https://' + domain + '/.well-known/stellar.toml')
-    url = toml.loads(stellar_toml.text)['FEDERATION_SERVER']
-    params = {'type': 'name',
-              'q': address}
-    federation = requests.get(url=url, params=params).json()
+
+    with FEDERATION_LATENCY.time():
+        user_id, domain = address.split('*')
+        url = get_stellar_toml(domain)['FEDERATION_SERVER']
+        params = {'type': 'name',
+                  'q': address}
+        federation = federation_session().get(url=url, params=params).json()
     return federation
 
 
-def address_from_domain(domain, code):
-    logger.info('Fetching address from domain.')
-    stellar_toml = requests.get('https://' + domain + '/.well-known/stellar.toml')
-    currencies = toml.loads(stellar_toml.text)['CURRENCIES']
+def currencies_from_domain(domain):
+    """
+    Map of asset code to issuer address from an anchor's stellar.toml CURRENCIES.
+    """
+    logger.info('Fetching currencies from domain: %s' % (domain,))
+    currencies = get_stellar_toml(domain).get('CURRENCIES', [])
+    return {currency['code']: currency['issuer'] for currency in currencies}
 
-    for currency in currencies:
-        if currency['code'] == code:
-            logger.info('Address: %s' % (currency['issuer'],))
-            return currency['issuer']
+
+def address_from_domain(domain, code):
+    address = currencies_from_domain(domain).get(code)
+    logger.info('Address: %s' % (address,))
+    return address
 
 
-class StellarFederationView(APIView):
+class StellarFederationView(ReadReplicaMixin, APIView):
     allowed_methods = ('GET',)
     throttle_classes = (NoThrottling,)
     permission_classes = (AllowAny,)  # AdapterPermission,) #TODO: re-enable
@@ -55,7 +92,7 @@ class StellarFederationView(APIView):
             if address:
                 account_id = address
                 operating_receive_address = getattr(settings, 'STELLAR_RECEIVE_ADDRESS')
-                if UserAccount.objects.filter(account_id=account_id):
+                if UserAccount.objects.filter(account_id=account_id).exists():
                     return Response(OrderedDict([('stellar_address', address),
                                                  ('account_id', operating_receive_address),
                                                  ('memo_type', 'text'),
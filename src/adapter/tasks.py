@@ -1,21 +1,87 @@
-import requests
 from celery import shared_task
 
+import json
 import logging
+import time
 
 from django.conf import settings
+from .aggregates import move_volume, refresh_volumes
 from .models import AdminAccount, ReceiveTransaction, SendTransaction
+from .scheduler import IngestScheduler
 
 from .exceptions import PlatformRequestFailedError
+from .metrics import REHIVE_LATENCY
+from .profiling import profiled
+from .tracing import span, new_trace
 
 logger = logging.getLogger('django')
 
+REHIVE_RECEIVE_ENDPOINT = '/admins/transactions/receive/'
+REHIVE_UPDATE_ENDPOINT = '/admins/transactions/update/'
 
-@shared_task
-def process_receive():
+
+@shared_task(name='adapter.process_receive.task')
+@profiled
+def process_receive(chain_token=None):
     logger.info('checking stellar receive transactions...')
     hotwallet = AdminAccount.objects.get(name='hotwallet')
-    hotwallet.process_new_transactions()
+    scheduler = IngestScheduler(hotwallet)
+
+    # A newer chain was started by the watchdog, let this one end:
+    if chain_token and not scheduler.owns_chain(chain_token):
+        return
+
+    try:
+        delay = scheduler.run()
+    except Exception as exc:
+        logger.exception(exc)
+        delay = getattr(settings, 'INGEST_ERROR_DELAY', 5.0)
+
+    if chain_token:
+        scheduler.heartbeat(delay)
+        # Each run is its own trace, only linked to the run before it:
+        with new_trace():
+            process_receive.apply_async(args=(chain_token,), countdown=delay)
+
+
+@shared_task(name='adapter.ensure_receive_ingest.task')
+def ensure_receive_ingest():
+    # Watchdog: (re)start the self-scheduling receive ingest if it is not running.
+    hotwallet = AdminAccount.objects.get(name='hotwallet')
+    scheduler = IngestScheduler(hotwallet)
+    if not scheduler.is_alive():
+        logger.info('Starting receive ingest chain.')
+        token = scheduler.start_chain()
+        scheduler.heartbeat(0)
+        with new_trace():
+            process_receive.delay(token)
+
+
+@shared_task(name='adapter.process_send.task')
+@profiled
+def process_send(tx_id: int):
+    tx = SendTransaction.objects.get(id=tx_id)
+    tx.execute()
+
+
+@shared_task(name='adapter.ensure_transaction_partitions.task')
+def ensure_transaction_partitions():
+    from .partitions import PARTITIONED_MODELS, ensure_partitions
+
+    for model in PARTITIONED_MODELS:
+        ensure_partitions(model, getattr(settings, 'TRANSACTION_PARTITION_MONTHS_AHEAD', 3))
+
+
+@shared_task(name='adapter.refresh_daily_volumes.task')
+def refresh_daily_volumes():
+    refresh_volumes()
+
+
+@shared_task(name='adapter.refresh_asset_registry.task')
+def refresh_asset_registry():
+    from .registry import refresh_anchor_currencies
+
+    refresh_anchor_currencies()
 
 
 @shared_task
@@ -24,7 +90,70 @@ def default_task():
     return 'True'
 
 
+def rehive_post(endpoint: str, **kwargs):
+    """
+    POST to the Rehive admin API. Connection errors are raised as PlatformRequestFailedError.
+    """
+    import requests
+
+    start = time.time()
+    with span('rehive.request', endpoint=endpoint) as s:
+        try:
+            response = requests.post(getattr(settings, 'REHIVE_API_URL') + endpoint, **kwargs)
+        except requests.exceptions.RequestException as exc:
+            REHIVE_LATENCY.labels(endpoint, 'error').observe(time.time() - start)
+            raise PlatformRequestFailedError(str(exc))
+        s.set('http.status_code', response.status_code)
+    REHIVE_LATENCY.labels(endpoint, response.status_code).observe(time.time() - start)
+    return response
+
+
+def rehive_headers() -> dict:
+    return {'Authorization': 'Token ' + getattr(settings, 'REHIVE_API_TOKEN')}
+
+
+def rehive_receive_request(tx) -> dict:
+    # The receive id lets a request with an unknown outcome be matched up with Rehive's transactions:
+    return {'recipient': tx.recipient,
+            'amount': tx.amount,
+            'currency': tx.currency,
+            'issuer': tx.issuer,
+            'metadata': dict(tx.metadata or {}, receive_id=tx.id)}
+
+
+def rehive_confirm_request(tx) -> dict:
+    return {'tx_code': tx.rehive_code, 'status': 'Confirmed'}
+
+
+def apply_rehive_receive(tx, status_code: int, body: str):
+    """
+    Update a receive (without saving it) from Rehive's answer to its creation request.
+    """
+    if status_code == 200:
+        tx.rehive_response = json.loads(body)
+        tx.rehive_code = (tx.rehive_response.get('data') or {}).get('tx_code')
+        tx.status = 'Pending'
+    else:
+        logger.info('Failed transaction update request: HTTP %s Error: %s' % (status_code, body))
+        tx.status = 'Failed'
+        tx.rehive_response = {'status': status_code, 'data': body}
+
+
+def apply_rehive_confirm(tx, status_code: int, body: str):
+    """
+    Update a transaction (without saving it) from Rehive's answer to its confirmation request.
+    Failed attempts are counted, the drainer gives up after REHIVE_CONFIRM_MAX_ATTEMPTS.
+    """
+    if status_code == 200:
+        tx.rehive_response = json.loads(body)
+    else:
+        logger.info('Failed transaction update request: HTTP %s Error: %s' % (status_code, body))
+        attempts = (tx.rehive_response or {}).get('attempts', 0) + 1
+        tx.rehive_response = {'status': status_code, 'data': body, 'attempts': attempts}
+
+
 @shared_task(bind=True, name='adapter.confirm_rehive_tx.task', max_retries=24, default_retry_delay=60 * 60)
+@profiled
 def confirm_rehive_transaction(self, tx_id: int, tx_type: str):
     if tx_type == 'receive':
         tx = ReceiveTransaction.objects.get(id=tx_id)
@@ -35,24 +164,15 @@ def confirm_rehive_transaction(self, tx_id: int, tx_type: str):
 
     logger.info('Transaction update request.')
 
-    # Update URL
-    url = getattr(settings, 'REHIVE_API_URL') + '/admins/transactions/update/'
-
-    # Add Authorization headers
-    headers = {'Authorization': 'Token ' + getattr(settings, 'REHIVE_API_TOKEN')}
-
     try:
         # Make request
-        r = requests.post(url, json={'tx_code': tx.rehive_code, 'status': 'Confirmed'}, headers=headers)
-
-        if r.status_code == 200:
-            tx.rehive_response = r.json()
-        else:
-            logger.info(headers)
-            logger.info('Failed transaction update request: HTTP %s Error: %s' % (r.status_code, r.text))
-            tx.rehive_response = {'status': r.status_code, 'data': r.text}
+        r = rehive_post(REHIVE_UPDATE_ENDPOINT, json=rehive_confirm_request(tx), headers=rehive_headers())
+        apply_rehive_confirm(tx, r.status_code, r.text)
+        # Sends have no stored Rehive response:
+        if tx_type == 'receive':
+            tx.save(update_fields=['rehive_response'])
 
-    except (requests.exceptions.RequestException, requests.exceptions.MissingSchema) as e:
+    except PlatformRequestFailedError:
         try:
             logger.info('Retry transaction update request due to connection error.')
             self.retry(countdown=5 * 60, exc=PlatformRequestFailedError)
@@ -61,37 +181,22 @@ def confirm_rehive_transaction(self, tx_id: int, tx_type: str):
 
 
 @shared_task(bind=True, name='adapter.create_rehive_receive.task', max_retries=24, default_retry_delay=60 * 60)
+@profiled
 def create_rehive_receive(self, tx_id: int):
     tx = ReceiveTransaction.objects.get(id=tx_id)
-    url = getattr(settings, 'REHIVE_API_URL') + '/admins/transactions/receive/'
-    headers = {'Authorization': 'Token ' + getattr(settings, 'REHIVE_API_TOKEN')}
 
     try:
         # Make request:
-        r = requests.post(url,
-                          json={'recipient': tx.recipient,
-                                'amount': tx.amount,
-                                'currency': tx.currency,
-                                'issuer': tx.issuer,
-                                'metadata': tx.metadata},
-                          headers=headers)
-
-        if r.status_code == 200:
-            tx.rehive_response = r.json()
-            tx.status = 'Pending'
-            tx.save()
-        else:
-            logger.info(headers)
-            logger.info('Failed transaction update request: HTTP %s Error: %s' % (r.status_code, r.text))
-            tx.status = 'Failed'
-            tx.rehive_response = {'status': r.status_code, 'data': r.text}
-
-    except (requests.exceptions.RequestException, requests.exceptions.MissingSchema) as e:
+        r = rehive_post(REHIVE_RECEIVE_ENDPOINT, json=rehive_receive_request(tx), headers=rehive_headers())
+
+        old_status = tx.status
+        apply_rehive_receive(tx, r.status_code, r.text)
+        tx.save()
+        move_volume(tx, 'receive', old_status)
+
+    except PlatformRequestFailedError:
         try:
             logger.info('Retry transaction update request due to connection error.')
             self.retry(countdown=5 * 60, exc=PlatformRequestFailedError)
         except PlatformRequestFailedError:
             logger.info('Final transaction update request failure due to connection error.')
-
-
-
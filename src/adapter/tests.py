@@ -1,3 +1,764 @@
-from django.test import TestCase
+import asyncio
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from .aggregates import move_volume, record_volume, refresh_volumes
+from .api import Interface
+from .drainer import UNKNOWN_OUTCOME, RehiveDrainer
+from .exceptions import HorizonError, HorizonUnavailableError
+from .health import account_health
+from .history import transaction_history
+from .horizon import HorizonPool
+from .models import AdminAccount, Asset, DailyVolume, ReceiveTransaction, SendTransaction, UserAccount
+from .registry import AssetRegistry, invalidate_asset_registry
+from .routers import ReplicaRouter, read_replica
+from .scheduler import IngestScheduler
+from .tracing import current_span, new_trace, propagation_headers, span
+from .utils import MAX_STROOPS, MIN_STROOPS, http_session, str_to_stroops, stroops_to_str
+
+
+class StroopConversionTests(SimpleTestCase):
+    def test_str_to_stroops(self):
+        self.assertEqual(str_to_stroops('12.3400000'), 123400000)
+        self.assertEqual(str_to_stroops('12.34'), 123400000)
+        self.assertEqual(str_to_stroops('12'), 120000000)
+        self.assertEqual(str_to_stroops('.5'), 5000000)
+        self.assertEqual(str_to_stroops('0.0000001'), 1)
+        self.assertEqual(str_to_stroops(' 1.5 '), 15000000)
+
+    def test_str_to_stroops_truncates_extra_decimals(self):
+        self.assertEqual(str_to_stroops('1.23456789'), 12345678)
+        self.assertEqual(str_to_stroops('0.00000009'), 0)
+        self.assertEqual(str_to_stroops('-1.23456789'), -12345678)
+
+    def test_str_to_stroops_divisibility(self):
+        self.assertEqual(str_to_stroops('1.25', 2), 125)
+        self.assertEqual(str_to_stroops('1.259', 2), 125)
+        self.assertEqual(str_to_stroops('3', 0), 3)
+
+    def test_str_to_stroops_negative(self):
+        self.assertEqual(str_to_stroops('-12.34'), -123400000)
+        self.assertEqual(str_to_stroops('-0.0000001'), -1)
+        self.assertEqual(str_to_stroops('+2'), 20000000)
+
+    def test_str_to_stroops_int64_bound(self):
+        self.assertEqual(str_to_stroops('922337203685.4775807'), MAX_STROOPS)
+        self.assertEqual(str_to_stroops('-922337203685.4775808'), MIN_STROOPS)
+        with self.assertRaises(ValueError):
+            str_to_stroops('922337203685.4775808')
+        with self.assertRaises(ValueError):
+            str_to_stroops('-922337203685.4775809')
+
+    def test_str_to_stroops_invalid(self):
+        for amount in ('', '-', '.', 'abc', '1.2.3', '1.-5', '--1', '1e5'):
+            with self.assertRaises(ValueError):
+                str_to_stroops(amount)
+
+    def test_stroops_to_str(self):
+        self.assertEqual(stroops_to_str(123400000), '12.3400000')
+        self.assertEqual(stroops_to_str(1), '0.0000001')
+        self.assertEqual(stroops_to_str(0), '0.0000000')
+        self.assertEqual(stroops_to_str(125, 2), '1.25')
+
+    def test_stroops_to_str_negative(self):
+        self.assertEqual(stroops_to_str(-123400000), '-12.3400000')
+        self.assertEqual(stroops_to_str(-1), '-0.0000001')
+
+    def test_stroops_to_str_int64_bound(self):
+        self.assertEqual(stroops_to_str(MAX_STROOPS), '922337203685.4775807')
+        self.assertEqual(stroops_to_str(MIN_STROOPS), '-922337203685.4775808')
+
+    def test_round_trip(self):
+        for amount in (0, 1, -1, 123400000, 10 ** 7, MAX_STROOPS, MIN_STROOPS):
+            self.assertEqual(str_to_stroops(stroops_to_str(amount)), amount)
+
+
+@override_settings(HTTP_TIMEOUT=7)
+class HttpSessionTests(SimpleTestCase):
+    def send(self, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        with mock.patch('requests.adapters.HTTPAdapter.send', return_value=response) as send:
+            http_session().get('http://federation.example.com/', **kwargs)
+        return send.call_args[1]['timeout']
+
+    def test_default_timeout(self):
+        self.assertEqual(self.send(), 7)
+
+    def test_request_timeout_takes_precedence(self):
+        self.assertEqual(self.send(timeout=2), 2)
+
+
+class StubResponse:
+    def __init__(self, status_code: int=200, body=None):
+        self.status_code = status_code
+        self.body = body if body is not None else {}
+        self.text = str(self.body)
+
+    def json(self):
+        return self.body
+
+
+class StubSession:
+    """
+    Stands in for a node's requests session, answering every request with `response`
+    (raised if it is an exception) after `delay` seconds.
+    """
+    def __init__(self, response=None, delay: float=0):
+        self.response = response if response is not None else StubResponse()
+        self.delay = delay
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        time.sleep(self.delay)
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+def stub_pool(*sessions) -> HorizonPool:
+    pool = HorizonPool(['http://horizon-%s' % i for i in range(len(sessions))])
+    for node, session in zip(pool.nodes, sessions):
+        node._session = session
+    return pool
+
+
+class HorizonPoolTests(SimpleTestCase):
+    def test_ewma_latency(self):
+        node = stub_pool(StubSession()).nodes[0]
+        node.record_success(1.0)
+        self.assertEqual(node.latency, 1.0)
+        node.record_success(0.5)
+        self.assertAlmostEqual(node.latency, 0.9)
+
+    def test_ranked_by_latency(self):
+        pool = stub_pool(StubSession(), StubSession(), StubSession())
+        slow, fast, unmeasured = pool.nodes
+        slow.record_success(0.8)
+        fast.record_success(0.1)
+        self.assertEqual(pool.ranked(), [unmeasured, fast, slow])
+
+        unmeasured.record_failure()
+        self.assertEqual(pool.ranked(), [fast, slow, unmeasured])
+
+    def test_get_uses_fastest_node(self):
+        slow = StubSession(StubResponse(body={'node': 'slow'}))
+        fast = StubSession(StubResponse(body={'node': 'fast'}))
+        pool = stub_pool(slow, fast)
+        pool.nodes[0].record_success(0.8)
+        pool.nodes[1].record_success(0.1)
+
+        self.assertEqual(pool.get('/ledgers'), {'node': 'fast'})
+        self.assertEqual(len(slow.calls), 0)
+
+    def test_get_fails_over(self):
+        down = StubSession(requests.exceptions.ConnectionError('refused'))
+        erroring = StubSession(StubResponse(503))
+        up = StubSession(StubResponse(body={'node': 'up'}))
+        pool = stub_pool(down, erroring, up)
+
+        self.assertEqual(pool.get('/ledgers'), {'node': 'up'})
+        self.assertFalse(pool.nodes[0].healthy)
+        self.assertFalse(pool.nodes[1].healthy)
+        self.assertEqual(pool.ranked()[0], pool.nodes[2])
+
+    def test_get_all_nodes_down(self):
+        pool = stub_pool(StubSession(StubResponse(500)), StubSession(StubResponse(502)))
+        with self.assertRaises(HorizonUnavailableError):
+            pool.get('/ledgers')
+
+    def test_client_errors_do_not_fail_over(self):
+        missing, other = StubSession(StubResponse(404)), StubSession()
+        pool = stub_pool(missing, other)
+
+        with self.assertRaises(HorizonError) as context:
+            pool.get('/accounts/unknown')
+        self.assertEqual(context.exception.status_code, 404)
+        self.assertEqual(len(other.calls), 0)
+        self.assertTrue(pool.nodes[0].healthy)
+
+    def test_hedged_get_duplicates_slow_reads(self):
+        slow = StubSession(StubResponse(body={'node': 'slow'}), delay=1)
+        backup = StubSession(StubResponse(body={'node': 'backup'}))
+        pool = stub_pool(slow, backup)
+        # The primary usually answers in 10ms, so a read is hedged after that:
+        for i in range(20):
+            pool.nodes[0].record_success(0.01)
+        pool.nodes[1].record_success(0.05)
+
+        start = time.time()
+        self.assertEqual(pool.get('/ledgers', hedge=True), {'node': 'backup'})
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(len(slow.calls), 1)
+
+    def test_hedged_get_fast_primary(self):
+        primary, backup = StubSession(StubResponse(body={'node': 'primary'})), StubSession()
+        pool = stub_pool(primary, backup)
+        pool.nodes[0].record_success(0.01)
+        pool.nodes[1].record_success(0.05)
+        pool.nodes[0].samples.extend([1.0] * 20)
+
+        self.assertEqual(pool.get('/ledgers', hedge=True), {'node': 'primary'})
+        self.assertEqual(len(backup.calls), 0)
+
+    def test_hedged_get_primary_failure(self):
+        down = StubSession(requests.exceptions.ConnectionError('refused'))
+        backup = StubSession(StubResponse(body={'node': 'backup'}))
+        pool = stub_pool(down, backup)
+        pool.nodes[0].record_success(0.01)
+        pool.nodes[0].samples.extend([1.0] * 20)
+        pool.nodes[1].record_success(0.05)
+
+        self.assertEqual(pool.get('/ledgers', hedge=True), {'node': 'backup'})
+
+    def test_submit_fails_over_and_stays_pinned(self):
+        down = StubSession(StubResponse(504))
+        up = StubSession(StubResponse(body={'hash': 'abc', 'sequence': '42'}))
+        pool = stub_pool(down, up)
+
+        self.assertEqual(pool.submit(b'envelope'), {'hash': 'abc', 'sequence': '42'})
+        self.assertEqual(pool.submit_url, 'http://horizon-1')
+        self.assertEqual(pool.sequence('GACCOUNT'), '42')
+        self.assertEqual(up.calls[-1], ('GET', 'http://horizon-1/accounts/GACCOUNT'))
+        self.assertEqual(len(down.calls), 1)
+
+    def test_sequence_fails_over(self):
+        down = StubSession(requests.exceptions.Timeout('timed out'))
+        up = StubSession(StubResponse(body={'sequence': '7'}))
+        pool = stub_pool(down, up)
+
+        self.assertEqual(pool.sequence('GACCOUNT'), '7')
+        self.assertEqual(pool.submit_url, 'http://horizon-1')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   INGEST_LEDGER_INTERVAL=5.0, INGEST_CLOSE_OFFSET=0.5, INGEST_MIN_DELAY=1.0,
+                   INGEST_MAX_DELAY=30.0, INGEST_MAX_IDLE_LEDGERS=4)
+class IngestSchedulerTests(SimpleTestCase):
+    now = 1500000000.0
+
+    def scheduler(self, **state) -> IngestScheduler:
+        scheduler = IngestScheduler(AdminAccount(id=1, network='testnet'))
+        scheduler.state.update(state)
+        return scheduler
+
+    def next_delay(self, **state) -> float:
+        with mock.patch('time.time', return_value=self.now):
+            return self.scheduler(**state).next_delay()
+
+    def test_full_page_polls_immediately(self):
+        self.assertEqual(self.next_delay(page_full=True, closed_at=self.now - 1), 0)
+
+    def test_waits_for_next_ledger_close(self):
+        # Closed a second ago, the next close is 4 seconds away, plus the offset:
+        self.assertEqual(self.next_delay(closed_at=self.now - 1, idle=0), 4.5)
+
+    def test_idle_polls_skip_ledgers(self):
+        self.assertEqual(self.next_delay(closed_at=self.now - 1, idle=1), 9.5)
+        self.assertEqual(self.next_delay(closed_at=self.now - 1, idle=2), 19.5)
+        # At most INGEST_MAX_IDLE_LEDGERS ledgers are skipped:
+        self.assertEqual(self.next_delay(closed_at=self.now - 1, idle=10), 19.5)
+
+    def test_uses_observed_close_interval(self):
+        self.assertEqual(self.next_delay(closed_at=self.now, interval=6.0), 6.5)
+
+    def test_unknown_close_time_counts_from_now(self):
+        self.assertEqual(self.next_delay(closed_at=None), 5.5)
+
+    def test_lagging_head_waits_minimum_delay(self):
+        self.assertEqual(self.next_delay(closed_at=self.now - 60), 1.0)
+
+    def test_delay_is_capped(self):
+        self.assertEqual(self.next_delay(closed_at=self.now, interval=20.0, idle=3), 30.0)
+
+    def test_idle_count_is_clamped(self):
+        scheduler = self.scheduler(idle=0)
+        for i in range(5):
+            scheduler.observe_poll({'payments': 0, 'page_full': False})
+        self.assertEqual(scheduler.state['idle'], 2)
+        scheduler.observe_poll({'payments': 1, 'page_full': False})
+        self.assertEqual(scheduler.state['idle'], 0)
+
+    def test_observe_ledger_updates_interval(self):
+        scheduler = self.scheduler(ledger=100, closed_at=1000.0, interval=5.0)
+        scheduler.observe_ledger({'sequence': 102, 'closed_at': '1970-01-01T00:16:56Z'})  # 1016, 8s per ledger
+
+        self.assertEqual(scheduler.state['ledger'], 102)
+        self.assertEqual(scheduler.state['closed_at'], 1016.0)
+        self.assertAlmostEqual(scheduler.state['interval'], 0.2 * 8 + 0.8 * 5)
+
+
+class ReceiveIngestTests(TestCase):
+
+    def setUp(self):
+        self.account = AdminAccount.objects.create(account_id='GHOT', network='testnet', default=True)
+        UserAccount.objects.create(user_id='user@example.com', account_id='user*rehive.com')
+        horizon = mock.Mock()
+        horizon.transaction.return_value = {'memo': 'user', 'ledger': 1}
+        with mock.patch('adapter.api.get_horizon', return_value=horizon):
+            self.interface = Interface(self.account)
+
+    def payment(self, **kwargs) -> dict:
+        payment = {'id': '4294971393', 'paging_token': '4294971393', 'transaction_hash': 'abc',
+                   'created_at': '2017-07-14T02:40:00Z', 'from': 'GSENDER', 'to': 'GHOT',
+                   'asset_type': 'native', 'amount': '1.5000000'}
+        payment.update(kwargs)
+        return payment
+
+    def test_credits_known_user(self):
+        self.assertTrue(self.interface._process_receive(self.payment()))
+        tx = ReceiveTransaction.objects.get()
+        self.assertEqual((tx.status, tx.recipient, tx.amount), ('Waiting', 'user@example.com', 15000000))
+
+    def test_unknown_memo_is_stored_as_skipped(self):
+        self.interface.horizon.transaction.return_value = {'memo': 'nobody', 'ledger': 1}
+
+        self.assertFalse(self.interface._process_receive(self.payment()))
+        tx = ReceiveTransaction.objects.get()
+        self.assertEqual((tx.status, tx.user_account), ('Skipped', None))
+        self.assertEqual(tx.metadata['skipped'], 'unknown memo')
+        self.assertEqual(tx.metadata['memo'], 'nobody')
+
+    def test_untrusted_asset_is_stored_as_skipped(self):
+        payment = self.payment(asset_type='credit_alphanum4', asset_code='FAKE', asset_issuer='GISSUER')
+
+        self.assertFalse(self.interface._process_receive(payment))
+        tx = ReceiveTransaction.objects.get()
+        self.assertEqual((tx.status, tx.currency, tx.issuer), ('Skipped', 'FAKE', 'GISSUER'))
+        self.assertEqual(tx.metadata['skipped'], 'untrusted asset')
+
+    def test_skipped_payment_is_stored_once(self):
+        self.interface.horizon.transaction.return_value = {'memo': 'nobody', 'ledger': 1}
+
+        self.interface._process_receive(self.payment())
+        self.interface._process_receive(self.payment())
+        self.assertEqual(ReceiveTransaction.objects.count(), 1)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   HEALTH_MAX_LAG_LEDGERS=12, HEALTH_MAX_LAG_SECONDS=60, HEALTH_MAX_PENDING_SEND_AGE=300)
+class HealthTests(TestCase):
+
+    def setUp(self):
+        self.account = AdminAccount.objects.create(name='hotwallet', account_id='GHOT', network='testnet')
+        self.scheduler = IngestScheduler(self.account)
+        self.scheduler.heartbeat(5)
+
+    def health(self, **state) -> dict:
+        self.scheduler.state.update(state)
+        self.scheduler.save()
+        return account_health(self.account)
+
+    def test_caught_up_account_without_payments_is_healthy(self):
+        report = self.health(ledger=100, processed_ledger=100, closed_at=time.time(),
+                             processed_closed_at=time.time())
+        self.assertEqual(report['lag_ledgers'], 0)
+        self.assertIsNone(report['last_payment_ledger'])
+        self.assertTrue(report['healthy'], report['problems'])
+
+    def test_not_polled_yet_is_healthy(self):
+        self.assertTrue(self.health()['healthy'])
+
+    def test_lag_from_last_poll(self):
+        report = self.health(ledger=120, processed_ledger=100, closed_at=time.time(),
+                             processed_closed_at=time.time())
+        self.assertEqual(report['lag_ledgers'], 20)
+        self.assertEqual(report['problems'], ['ingest lag (ledgers)'])
+
+    def test_old_pending_send_is_unhealthy(self):
+        SendTransaction.objects.create(admin_account=self.account, amount=1, status='Pending',
+                                       created=timezone.now() - timedelta(seconds=301))
+        self.assertEqual(self.health()['problems'], ['pending sends'])
+
+    def test_failed_and_recent_sends_are_healthy(self):
+        SendTransaction.objects.create(admin_account=self.account, amount=1, status='Failed',
+                                       created=timezone.now() - timedelta(seconds=3600))
+        SendTransaction.objects.create(admin_account=self.account, amount=1, status='Pending')
+        report = self.health()
+        self.assertEqual(report['pending_sends'], 1)
+        self.assertTrue(report['healthy'], report['problems'])
+
+
+class SendFailureTests(TestCase):
+
+    def setUp(self):
+        self.account = AdminAccount.objects.create(account_id='GHOT', network='testnet', default=True)
+        with mock.patch('adapter.api.get_horizon'):
+            self.interface = Interface(self.account)
+        self.interface._builder = mock.Mock()
+        self.tx = SendTransaction.objects.create(admin_account=self.account, amount=10000000, currency='XLM',
+                                                 recipient='G' * 56)
+
+    def test_rejected_submission_fails_the_send(self):
+        with mock.patch.object(Interface, '_submit', return_value={'status': 400, 'title': 'Transaction Failed'}):
+            self.interface.process_send(self.tx)
+        self.tx.refresh_from_db()
+        self.assertEqual(self.tx.status, 'Failed')
+        self.assertEqual(self.tx.data['title'], 'Transaction Failed')
+
+    def test_submission_error_fails_the_send(self):
+        with mock.patch.object(Interface, '_submit', side_effect=HorizonUnavailableError('down')):
+            self.interface.process_send(self.tx)
+        self.tx.refresh_from_db()
+        self.assertEqual(self.tx.status, 'Failed')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   ASSET_REGISTRY_TTL=300, ASSET_REGISTRY_CHECK_INTERVAL=0)
+class AssetRegistryTests(TestCase):
+
+    def setUp(self):
+        self.registry = AssetRegistry()
+        self.registry.load()
+
+    def test_untrusted_asset_is_looked_up_once(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.registry.get('FAKE', 'GISSUER'))
+            self.assertIsNone(self.registry.get('FAKE', 'GISSUER'))
+
+    def test_invalidation_reloads_other_processes(self):
+        self.assertIsNone(self.registry.get('USD', 'GISSUER'))
+        asset = Asset.objects.create(code='USD', issuer='GISSUER', account_id='GISSUER')
+        invalidate_asset_registry()
+
+        self.assertEqual(self.registry.get('USD', 'GISSUER'), asset)
+
+
+@override_settings(REHIVE_CONFIRM_MAX_ATTEMPTS=2)
+class RehiveDrainerTests(TestCase):
+
+    def setUp(self):
+        self.account = AdminAccount.objects.create(account_id='GHOT', network='testnet', default=True)
+
+    def receive(self, **kwargs) -> ReceiveTransaction:
+        return ReceiveTransaction.objects.create(admin_account=self.account, amount=1, currency='XLM', **kwargs)
+
+    def drain(self, kind: str, *results) -> dict:
+        results = list(results)
+
+        async def post(session, semaphore, kind, tx):
+            return results.pop(0)
+
+        drainer = RehiveDrainer()
+        loop = asyncio.new_event_loop()
+        try:
+            with mock.patch.object(drainer, '_post', side_effect=post):
+                return loop.run_until_complete(drainer._drain(kind, None, None))
+        finally:
+            loop.close()
+
+    def test_unsent_receive_is_retried(self):
+        tx = self.receive(status='Waiting')
+        self.assertEqual(self.drain('receive', (None, 'connection refused'))['retry'], 1)
+        tx.refresh_from_db()
+        self.assertEqual(tx.status, 'Waiting')
+
+    def test_receive_with_unknown_outcome_is_not_posted_again(self):
+        tx = self.receive(status='Waiting')
+        self.assertEqual(self.drain('receive', (UNKNOWN_OUTCOME, 'timeout'))['unknown'], 1)
+        tx.refresh_from_db()
+        self.assertEqual(tx.status, 'Failed')
+        self.assertEqual(self.drain('receive')['processed'], 0)
+
+    def test_confirm_attempts_are_capped(self):
+        tx = self.receive(status='Complete', rehive_code='abc')
+        self.drain('confirm', (500, 'error'))
+        self.drain('confirm', (500, 'error'))
+        tx.refresh_from_db()
+        self.assertEqual(tx.rehive_response['attempts'], 2)
+        self.assertEqual(self.drain('confirm')['processed'], 0)
+
+
+@override_settings(ROOT_URLCONF='config.urls_adapter')
+class AdapterAPITestCase(APITestCase):
+    """
+    Requests to the adapter API, authenticated with the adapter secret.
+    """
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Secret secret')
+
+
+class TransactionHistoryTests(AdapterAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.account = AdminAccount.objects.create(account_id='GHOT', network='testnet', default=True)
+        self.user_account = UserAccount.objects.create(user_id='user@example.com', account_id='user*rehive.com')
+        other = UserAccount.objects.create(user_id='other@example.com', account_id='other*rehive.com')
+        self.ids = []
+        for n in range(5):
+            self.ids.append(self.receive(self.user_account).id)
+            self.receive(other)
+        self.ids.reverse()
+
+    def receive(self, user_account) -> ReceiveTransaction:
+        return ReceiveTransaction.objects.create(admin_account=self.account, user_account=user_account, amount=1)
+
+    def page(self, cursor=None, limit=2):
+        rows, next_cursor = transaction_history('receive', [self.user_account.id], cursor=cursor, limit=limit)
+        return [row['id'] for row in rows], next_cursor
+
+    def test_pages_newest_first(self):
+        ids, cursor = self.page()
+        self.assertEqual((ids, cursor), (self.ids[:2], self.ids[1]))
+        ids, cursor = self.page(cursor)
+        self.assertEqual((ids, cursor), (self.ids[2:4], self.ids[3]))
+        ids, cursor = self.page(cursor)
+        self.assertEqual((ids, cursor), (self.ids[4:], None))
+
+    def test_full_last_page_has_no_cursor(self):
+        self.assertEqual(self.page(limit=5), (self.ids, None))
+        self.assertEqual(self.page(limit=4), (self.ids[:4], self.ids[3]))
+
+    def test_view(self):
+        response = self.client.get('/api/1/user/transactions/', {'user_id': 'user@example.com', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['next'], self.ids[1])
+        self.assertEqual([row['id'] for row in response.data['results']], self.ids[:2])
+
+    def test_bad_parameters(self):
+        for params in ({'cursor': 'abc'}, {'limit': 'ten'}, {'limit': ''}, {'type': 'refund'}, {}):
+            if params:
+                params['user_id'] = 'user@example.com'
+            response = self.client.get('/api/1/user/transactions/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+@override_settings(STELLAR_WALLET_DOMAIN='rehive.com')
+class BulkUserAccountTests(AdapterAPITestCase):
+    url = '/api/1/user/accounts/bulk/'
+
+    def post(self, *entries):
+        return self.client.post(self.url, {'accounts': list(entries)}, format='json')
+
+    @staticmethod
+    def entry(user_id, username) -> dict:
+        return {'user_id': user_id, 'metadata': {'username': username}}
+
+    def test_creates_in_input_order(self):
+        response = self.post(self.entry('b@example.com', 'b'), self.entry('a@example.com', 'a'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([a['account_id'] for a in response.data['accounts']], ['b*rehive.com', 'a*rehive.com'])
+        self.assertEqual(UserAccount.objects.count(), 2)
+
+    def test_deduplicates(self):
+        response = self.post(self.entry('a@example.com', 'a'), self.entry('a@example.com', 'a'))
+        self.assertEqual(len(response.data['accounts']), 1)
+        self.post(self.entry('a@example.com', 'a'))
+        self.assertEqual(UserAccount.objects.count(), 1)
+
+    def test_returns_existing_accounts(self):
+        existing = UserAccount.objects.create(user_id='a@example.com', account_id='a*rehive.com',
+                                              last_transaction={'id': 1})
+        stored = UserAccount.bulk_get_or_create([('b@example.com', 'b*rehive.com'), ('a@example.com', 'a*rehive.com')])
+        self.assertEqual(stored[1].id, existing.id)
+        self.assertEqual(stored[1].last_transaction, {'id': 1})
+        self.assertEqual(stored[0].account_id, 'b*rehive.com')
+
+    def test_invalid_entries(self):
+        for entry in ('a@example.com', {'user_id': None, 'metadata': {'username': 'a'}},
+                      {'user_id': 'a@example.com'}, {'user_id': 'a@example.com', 'metadata': '{'},
+                      {'user_id': 'a@example.com', 'metadata': {'name': 'a'}}):
+            self.assertEqual(self.post(entry).status_code, 400, entry)
+        self.assertEqual(self.client.post(self.url, {}, format='json').status_code, 400)
+        self.assertEqual(UserAccount.objects.count(), 0)
+
+    def test_null_user_id_is_rejected(self):
+        with self.assertRaises(ValueError):
+            UserAccount.bulk_get_or_create([(None, 'a*rehive.com')])
+
+
+class BulkAddAssetTests(AdapterAPITestCase):
+    url = '/api/1/assets/add/bulk/'
+
+    def setUp(self):
+        super().setUp()
+        AdminAccount.objects.create(account_id='GHOT', network='testnet', default=True)
+        self.builders = []
+        patches = [mock.patch('adapter.api.get_horizon'),
+                   mock.patch.object(Interface, '_new_builder', side_effect=self.new_builder),
+                   mock.patch.object(Interface, '_submit', side_effect=self.submit)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def new_builder(self):
+        self.builders.append(mock.Mock())
+        return self.builders[-1]
+
+    def submit(self, builder):
+        # The second transaction is rejected:
+        return {'status': 400} if self.builders.index(builder) == 1 else {'hash': 'x'}
+
+    @staticmethod
+    def issuer(n: int) -> str:
+        return ('GISSUER%s' % n).ljust(56, 'A')
+
+    def test_batches_trust_operations(self):
+        Asset.objects.create(code='A0', issuer=self.issuer(0), account_id=self.issuer(0))
+        assets = [{'code': 'A%s' % n, 'issuer': self.issuer(n)} for n in range(251)]
+        response = self.client.post(self.url, {'assets': assets}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([len(b.append_trust_op.call_args_list) for b in self.builders], [100, 100, 50])
+        statuses = [a['status'] for a in response.data['assets']]
+        self.assertEqual(statuses, ['existing'] + ['trusted'] * 100 + ['failed'] * 100 + ['trusted'] * 50)
+        self.assertEqual(Asset.objects.count(), 151)
+
+    def test_invalid_payloads(self):
+        for payload in ({}, {'assets': 'USD'}, {'assets': ['USD']}, {'assets': [{'code': 'USD'}]},
+                        {'assets': [{'code': 'USD', 'issuer': self.issuer(1), 'metadata': '{'}]},
+                        {'assets': [{'code': 'X' * 13, 'issuer': self.issuer(1)}]}):
+            self.assertEqual(self.client.post(self.url, payload, format='json').status_code, 400, payload)
+        self.assertEqual(self.builders, [])
+
+
+class DailyVolumeTests(TestCase):
+
+    def setUp(self):
+        self.account = AdminAccount.objects.create(account_id='GHOT', network='testnet', default=True)
+
+    def receive(self, amount: int, status: str='Waiting', days_ago: int=0) -> ReceiveTransaction:
+        tx = ReceiveTransaction.objects.create(admin_account=self.account, amount=amount, currency='XLM',
+                                               status=status, created=timezone.now() - timedelta(days=days_ago))
+        if status != 'Skipped':
+            record_volume(tx, 'receive')
+        return tx
+
+    def move(self, tx, status: str):
+        old_status, tx.status = tx.status, status
+        tx.save()
+        move_volume(tx, 'receive', old_status)
+
+    @staticmethod
+    def volumes() -> dict:
+        # Buckets emptied by moves stay behind with a zero count:
+        return {(v.day, v.direction, v.status): (v.count, v.volume) for v in DailyVolume.objects.exclude(count=0)}
+
+    def test_status_moves(self):
+        tx = self.receive(10)
+        self.receive(5)
+        self.move(tx, 'Pending')
+        self.move(tx, 'Complete')
+        self.move(tx, 'Complete')
+
+        self.assertEqual(sorted(self.volumes().values()), [(1, 5), (1, 10)])
+        self.assertEqual({v[2] for v in self.volumes()}, {'Waiting', 'Complete'})
+        self.assertFalse(DailyVolume.objects.filter(count__lt=0).exists())
+        self.assertFalse(DailyVolume.objects.filter(volume__lt=0).exists())
+
+    def test_refresh_matches_incremental_totals(self):
+        for days_ago in (0, 1, 3):
+            tx = self.receive(10 + days_ago, days_ago=days_ago)
+            self.move(tx, 'Pending')
+            self.receive(100, days_ago=days_ago)
+        self.receive(1000, status='Skipped')
+        SendTransaction.objects.create(admin_account=self.account, amount=7, currency='XLM')
+        record_volume(SendTransaction.objects.get(), 'send')
+        incremental = self.volumes()
+
+        # Rebuilding the whole history and only the lookback window give the same totals:
+        refresh_volumes(since=(timezone.now() - timedelta(days=10)).date())
+        self.assertEqual(self.volumes(), incremental)
+        DailyVolume.objects.filter(day=timezone.now().date()).update(count=99)
+        with override_settings(DAILY_VOLUME_LOOKBACK_DAYS=2):
+            refresh_volumes()
+        self.assertEqual(self.volumes(), incremental)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_REPLICA_MAX_LAG=10, DATABASE_REPLICA_CHECK_INTERVAL=5)
+class ReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.lag = 0
+        self.cursor = mock.MagicMock()
+        self.cursor.__enter__.return_value.fetchone.side_effect = lambda: (self.lag,)
+        patches = [mock.patch.dict('adapter.routers._replica_health', clear=True),
+                   mock.patch('adapter.routers.connections', {'replica': mock.Mock(cursor=lambda: self.cursor)})]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def read(self) -> str:
+        return self.router.db_for_read(UserAccount)
+
+    def test_reads_outside_the_block_use_the_primary(self):
+        self.assertEqual(self.read(), 'default')
+
+    def test_reads_from_healthy_replica(self):
+        with read_replica():
+            self.assertEqual(self.read(), 'replica')
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        self.lag = 11
+        with read_replica():
+            self.assertEqual(self.read(), 'default')
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        self.cursor.__enter__.side_effect = DatabaseError('connection refused')
+        with read_replica():
+            self.assertEqual(self.read(), 'default')
+
+    def test_health_is_cached_for_the_check_interval(self):
+        with read_replica(), mock.patch('time.time', return_value=1000.0):
+            self.assertEqual(self.read(), 'replica')
+            self.lag = 11
+            self.assertEqual(self.read(), 'replica')
+        with read_replica(), mock.patch('time.time', return_value=1006.0):
+            self.assertEqual(self.read(), 'default')
+
+    def test_write_pins_later_reads_to_the_primary(self):
+        with read_replica():
+            self.assertEqual(self.router.db_for_write(UserAccount), 'default')
+            self.assertEqual(self.read(), 'default')
+        with read_replica():
+            self.assertEqual(self.read(), 'replica')
+
+
+class SendViewTests(AdapterAPITestCase):
+    url = '/api/1/send/'
+
+    def setUp(self):
+        super().setUp()
+        AdminAccount.objects.create(account_id='GHOT', network='testnet', default=True)
+
+    def post(self, amount):
+        return self.client.post(self.url, {'tx_code': 'abc', 'to_user': 'G' * 56, 'amount': amount,
+                                           'currency': 'XLM', 'issuer': ''}, format='json')
+
+    def test_queues_send_in_stroops(self):
+        with mock.patch('adapter.views.process_send') as process_send:
+            self.assertEqual(self.post('15000000').status_code, 200)
+            self.assertEqual(self.post(10 ** 15).status_code, 200)
+        self.assertEqual(sorted(SendTransaction.objects.values_list('amount', flat=True)), [15000000, 10 ** 15])
+        self.assertEqual(process_send.delay.call_count, 2)
+
+    def test_invalid_amounts(self):
+        for amount in (None, '', 'ten', '1.5', 1.5, '0', '-1', MAX_STROOPS + 1):
+            self.assertEqual(self.post(amount).status_code, 400, amount)
+        self.assertFalse(SendTransaction.objects.exists())
+
+
+class TracingTests(SimpleTestCase):
+    def test_propagates_current_trace(self):
+        with span('ingest.run') as s:
+            self.assertEqual(propagation_headers(), {'trace_id': s.trace_id, 'parent_span_id': s.span_id,
+                                                     'correlation_id': ''})
+        self.assertEqual(propagation_headers(), {})
+
+    def test_new_trace_links_instead_of_propagating(self):
+        with span('ingest.run') as s:
+            with new_trace():
+                self.assertIsNone(current_span())
+                self.assertEqual(propagation_headers(), {'link_trace_id': s.trace_id, 'link_span_id': s.span_id})
+            self.assertIs(current_span(), s)
+        self.assertEqual(propagation_headers(), {})
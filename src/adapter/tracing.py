@@ -0,0 +1,250 @@
+"""
+Lightweight tracing of the send and receive pipelines.
+
+Stages are wrapped in spans (`with span('send.submit'): ...`). Spans nest per thread and
+carry a correlation id (the Horizon transaction hash of a receive, the Rehive tx_code or
+id of a send). The trace, parent span and correlation id travel to Celery tasks in the
+message headers, so the Rehive upload and send execution join the trace that queued them.
+Tasks queued inside `new_trace()` (the self-scheduling ingest) start a trace of their own
+instead, linked to the span that queued them.
+
+Finished spans are exported in batches, as OTLP/JSON, either appended to TRACING_FILE
+(one export request per line) or POSTed to an OTLP/HTTP collector at TRACING_OTLP_ENDPOINT.
+"""
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from logging import getLogger
+
+from celery.signals import before_task_publish, task_prerun, task_postrun
+from django.conf import settings
+
+logger = getLogger('django')
+
+HEADERS = ('trace_id', 'parent_span_id', 'correlation_id')
+LINK_HEADERS = ('link_trace_id', 'link_span_id')
+
+_local = threading.local()
+_spans = queue.Queue(maxsize=10000)
+_exporter = None
+_exporter_lock = threading.Lock()
+_task_spans = {}
+
+
+def is_enabled() -> bool:
+    return bool(getattr(settings, 'TRACING_FILE', None) or getattr(settings, 'TRACING_OTLP_ENDPOINT', None))
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str=None, parent_id: str=None, correlation_id: str=None):
+        self.name = name
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.correlation_id = correlation_id
+        self.attributes = {}
+        self.links = []
+        self.error = None
+        self.start = time.time()
+        self.end = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict:
+        attributes = dict(self.attributes)
+        if self.correlation_id:
+            attributes['correlation.id'] = self.correlation_id
+        data = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,
+            'startTimeUnixNano': str(int(self.start * 1e9)),
+            'endTimeUnixNano': str(int(self.end * 1e9)),
+            'attributes': [{'key': k, 'value': {'stringValue': str(v)}} for k, v in attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1},
+        }
+        if self.parent_id:
+            data['parentSpanId'] = self.parent_id
+        if self.links:
+            data['links'] = [{'traceId': trace_id, 'spanId': span_id} for trace_id, span_id in self.links]
+        return data
+
+
+def _stack() -> list:
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def current_span():
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def start_span(name: str, correlation_id: str=None, parent: dict=None) -> Span:
+    """
+    Start a span as a child of the current span, or of `parent` (propagated headers) if given.
+    """
+    current = current_span()
+    if parent:
+        trace_id, parent_id = parent.get('trace_id'), parent.get('parent_span_id')
+        correlation_id = correlation_id or parent.get('correlation_id')
+    elif current:
+        trace_id, parent_id = current.trace_id, current.span_id
+        correlation_id = correlation_id or current.correlation_id
+    else:
+        trace_id, parent_id = None, None
+
+    s = Span(name, trace_id, parent_id, correlation_id)
+    _stack().append(s)
+    return s
+
+
+def end_span(s: Span, error: Exception=None):
+    s.end = time.time()
+    if error is not None:
+        s.error = '%s: %s' % (type(error).__name__, error)
+
+    stack = _stack()
+    if s in stack:
+        stack.remove(s)
+
+    if is_enabled():
+        _ensure_exporter()
+        try:
+            _spans.put_nowait(s)
+        except queue.Full:
+            # Never slow the pipelines down for tracing:
+            pass
+
+
+@contextmanager
+def span(name: str, correlation_id: str=None, **attributes):
+    s = start_span(name, correlation_id)
+    s.attributes.update(attributes)
+    try:
+        yield s
+    except Exception as exc:
+        end_span(s, exc)
+        raise
+    else:
+        end_span(s)
+
+
+@contextmanager
+def new_trace():
+    """
+    Tasks queued inside start a new trace, linked to the current span rather than joining its trace.
+    """
+    stack = _stack()
+    saved = list(stack)
+    _local.link = saved[-1] if saved else None
+    del stack[:]
+    try:
+        yield
+    finally:
+        stack[:] = saved
+        _local.link = None
+
+
+def propagation_headers() -> dict:
+    s = current_span()
+    if s is None:
+        link = getattr(_local, 'link', None)
+        if link is None:
+            return {}
+        return {'link_trace_id': link.trace_id, 'link_span_id': link.span_id}
+    return {'trace_id': s.trace_id, 'parent_span_id': s.span_id, 'correlation_id': s.correlation_id or ''}
+
+
+# Export
+# ---------------------------------------------------------------------------------------------------------------------
+def _export_request(spans) -> dict:
+    return {'resourceSpans': [{
+        'resource': {'attributes': [
+            {'key': 'service.name', 'value': {'stringValue': getattr(settings, 'TRACING_SERVICE_NAME', 'adapter')}},
+            {'key': 'process.pid', 'value': {'stringValue': str(os.getpid())}},
+        ]},
+        'scopeSpans': [{'scope': {'name': 'adapter.tracing'}, 'spans': [s.to_otlp() for s in spans]}],
+    }]}
+
+
+def export(spans):
+    payload = _export_request(spans)
+    endpoint = getattr(settings, 'TRACING_OTLP_ENDPOINT', None)
+    if endpoint:
+        import requests
+
+        requests.post(endpoint, json=payload, timeout=5)
+    path = getattr(settings, 'TRACING_FILE', None)
+    if path:
+        with open(path, 'a') as f:
+            f.write(json.dumps(payload) + '\n')
+
+
+def _export_loop():
+    batch_size = getattr(settings, 'TRACING_BATCH_SIZE', 100)
+    while True:
+        spans = [_spans.get()]
+        deadline = time.time() + getattr(settings, 'TRACING_FLUSH_INTERVAL', 1.0)
+        while len(spans) < batch_size:
+            try:
+                spans.append(_spans.get(timeout=max(0, deadline - time.time())))
+            except queue.Empty:
+                break
+        try:
+            export(spans)
+        except Exception as exc:
+            logger.info('Span export failed: %s' % exc)
+
+
+def _ensure_exporter():
+    global _exporter
+    # The exporter thread does not survive a fork, start one per process:
+    if _exporter is None or not _exporter.is_alive():
+        with _exporter_lock:
+            if _exporter is None or not _exporter.is_alive():
+                _exporter = threading.Thread(target=_export_loop, name='span-exporter', daemon=True)
+                _exporter.start()
+
+
+# Celery propagation
+# ---------------------------------------------------------------------------------------------------------------------
+@before_task_publish.connect
+def _inject_headers(headers=None, **kwargs):
+    if headers is not None:
+        headers.update(propagation_headers())
+
+
+def _task_header(task, key):
+    value = (getattr(task.request, 'headers', None) or {}).get(key)
+    return value or getattr(task.request, key, None)
+
+
+@task_prerun.connect
+def _start_task_span(task_id=None, task=None, **kwargs):
+    parent = {key: _task_header(task, key) for key in HEADERS}
+    s = start_span(task.name, parent=parent if parent['trace_id'] else None)
+    s.set('celery.task_id', task_id)
+    link = [_task_header(task, key) for key in LINK_HEADERS]
+    if all(link):
+        s.links.append(tuple(link))
+    _task_spans[task_id] = s
+
+
+@task_postrun.connect
+def _end_task_span(task_id=None, state=None, **kwargs):
+    s = _task_spans.pop(task_id, None)
+    if s is not None:
+        # Drop spans the task left open:
+        stack = _stack()
+        if s in stack:
+            del stack[stack.index(s) + 1:]
+        s.set('celery.state', state)
+        end_span(s)
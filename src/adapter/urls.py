@@ -1,7 +1,8 @@
 from django.conf.urls import patterns, url, include
 from rest_framework.urlpatterns import format_suffix_patterns
 
-from stellar_adapter import views
+from . import views
+from .stellar_federation import StellarFederationView
 
 urlpatterns = (
     url(r'^purchase/$', views.PurchaseView.as_view(), name='purchase'),
@@ -10,9 +11,17 @@ urlpatterns = (
     url(r'^send/$', views.SendView.as_view(), name='send'),
     url(r'^operating/balance/$', views.BalanceView.as_view(), name='operating_balance'),
     url(r'^operating/account/$', views.OperatingAccountView.as_view(), name='operating_account'),
+    url(r'^health/ingest/$', views.IngestHealthView.as_view(), name='ingest_health'),
+    url(r'^metrics/$', views.MetricsView.as_view(), name='metrics'),
+    url(r'^qr/(?P<digest>[0-9a-f]{64})\.(?P<fmt>png|svg)$', views.QRCodeView.as_view(), name='qr_code'),
+    url(r'^assets/add/bulk/$', views.BulkAddAssetView.as_view(), name='add_assets_bulk'),
     url(r'^assets/add/', views.AddAssetView.as_view(), name='operating_account'),
+    url(r'^transactions/volumes/$', views.DailyVolumeView.as_view(), name='transaction_volumes'),
+    url(r'^transactions/export/$', views.TransactionExportView.as_view(), name='transaction_export'),
+    url(r'^user/transactions/$', views.UserTransactionHistoryView.as_view(), name='user_transactions'),
+    url(r'^user/accounts/bulk/$', views.BulkUserAccountView.as_view(), name='user_accounts_bulk'),
     url(r'^user/account/$', views.UserAccountView.as_view(), name='user_account'),
-    url(r'^federation/$', views.StellarFederationView.as_view(), name='stellar_federation'),
+    url(r'^federation/$', StellarFederationView.as_view(), name='stellar_federation'),
     url(r'^$', views.adapter_root)
 
 )
@@ -1,5 +1,22 @@
+import calendar
+import hashlib
+import io
 import json
+import os
+from datetime import datetime
 from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.urlresolvers import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# Image factory (imported on first use, it pulls in PIL) and content type per format:
+QR_CODE_FORMATS = {
+    'png': ('qrcode.image.pil.PilImage', 'image/png'),
+    'svg': ('qrcode.image.svg.SvgImage', 'image/svg+xml'),
+}
 
 
 def input_to_json(metadata):
@@ -12,17 +29,124 @@ def input_to_json(metadata):
         return json.loads('{}')
 
 
+# Horizon record fields that are either stored in dedicated columns or never read back:
+HORIZON_RECORD_EXCLUDE = ('_links', 'paging_token', 'id', 'source_account')
+
+
+def compact_horizon_record(record: dict, exclude=HORIZON_RECORD_EXCLUDE) -> dict:
+    return {k: v for k, v in record.items() if k not in exclude}
+
+
+def parse_horizon_time(value: str) -> float:
+    return calendar.timegm(datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').timetuple())
+
+
+def horizon_datetime(value: str) -> datetime:
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+
+
+# Range of the bigint amount columns:
+MIN_STROOPS = -2 ** 63
+MAX_STROOPS = 2 ** 63 - 1
+
+
 def to_cents(amount: Decimal, divisibility: int) -> int:
-    return int(amount * Decimal('10')**Decimal(divisibility))
+    if isinstance(amount, str):
+        return str_to_stroops(amount, divisibility)
+    # scaleb shifts the exponent exactly, no power or division needed:
+    return int(Decimal(amount).scaleb(divisibility))
 
 
 def from_cents(amount: int, divisibility: int) -> Decimal:
-    return Decimal(amount) / Decimal('10')**Decimal(divisibility)
+    return Decimal(amount).scaleb(-divisibility)
+
+
+def str_to_stroops(amount: str, divisibility: int=7) -> int:
+    """
+    Parse a decimal string such as Horizon's '12.3400000' into an integer
+    amount of the smallest unit, truncating like `to_cents`.
+
+    Raises ValueError for malformed amounts and for amounts outside the
+    64 bit range the amount columns can store.
+    """
+    amount = amount.strip()
+    sign = -1 if amount.startswith('-') else 1
+    whole, _, fraction = (amount[1:] if amount[:1] in '+-' else amount).partition('.')
+    if not (whole + fraction).isdigit():
+        raise ValueError('Invalid amount: %s' % amount)
+    fraction = fraction[:divisibility]
+    value = sign * (int(whole or 0) * 10 ** divisibility +
+                    int(fraction or 0) * 10 ** (divisibility - len(fraction)))
+    if not MIN_STROOPS <= value <= MAX_STROOPS:
+        raise ValueError('Amount out of range: %s' % amount)
+    return value
+
+
+def stroops_to_str(amount: int, divisibility: int=7) -> str:
+    """
+    Format an integer amount of the smallest unit as a decimal string ('12.3400000').
+    """
+    whole, fraction = divmod(abs(amount), 10 ** divisibility)
+    return '%s%d.%0*d' % ('-' if amount < 0 else '', whole, divisibility, fraction)
+
+
+@lru_cache(maxsize=256)
+def render_qr_code(value: str, size: int=300, fmt: str='png') -> bytes:
+    import qrcode
+
+    qr = qrcode.QRCode(border=4)
+    qr.add_data(value)
+    qr.make(fit=True)
+    # Scale modules so the image is as close to the requested size as possible:
+    qr.box_size = max(1, size // (qr.modules_count + 2 * qr.border))
+
+    stream = io.BytesIO()
+    qr.make_image(image_factory=import_string(QR_CODE_FORMATS[fmt][0])).save(stream)
+    return stream.getvalue()
+
+
+def qr_code_path(digest: str, fmt: str) -> str:
+    return os.path.join(getattr(settings, 'CACHE_DIR'), 'qr', '%s.%s' % (digest, fmt))
+
+
+def create_qr_code(value, size=300, fmt='png') -> str:
+    # Content address of the rendered image:
+    digest = hashlib.sha256(('%s|%s|%s' % (value, size, fmt)).encode('utf-8')).hexdigest()
+    path = qr_code_path(digest, fmt)
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = '%s.%s.tmp' % (path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            f.write(render_qr_code(value, size, fmt))
+        os.replace(tmp_path, path)
+
+    return digest
+
+
+def create_qr_code_url(value, size=300, fmt='png'):
+    digest = create_qr_code(value, size, fmt)
+    return reverse('adapter-api:qr_code', kwargs={'digest': digest, 'fmt': fmt})
+
+
+def http_session():
+    """
+    requests session keeping up to HTTP_POOL_MAXSIZE connections per host alive. Sessions are
+    shared by concurrent requests, so the pool is sized for the worker's concurrency. Requests
+    without a timeout of their own time out after HTTP_TIMEOUT seconds, so a hung upstream can't
+    hold a (green) thread and a pooled connection forever.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
 
+    class TimeoutHTTPAdapter(HTTPAdapter):
+        def send(self, request, timeout=None, **kwargs):
+            if timeout is None:
+                timeout = getattr(settings, 'HTTP_TIMEOUT', 10)
+            return super().send(request, timeout=timeout, **kwargs)
 
-def create_qr_code_url(value, size=300):
-    url = "https://chart.googleapis.com/chart?%s" % urllib.parse.urlencode({'chs': size,
-                                                                            'cht': 'qr',
-                                                                            'chl': value,
-                                                                            'choe': 'UTF-8'})
-    return url
+    session = requests.Session()
+    adapter = TimeoutHTTPAdapter(pool_maxsize=getattr(settings, 'HTTP_POOL_MAXSIZE', 10))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
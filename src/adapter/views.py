@@ -1,5 +1,8 @@
 from collections import OrderedDict
 
+from django.http import HttpResponse, Http404, StreamingHttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST
+
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.exceptions import APIException, ParseError, ValidationError
 from rest_framework.permissions import AllowAny
@@ -9,16 +12,26 @@ from rest_framework.generics import GenericAPIView
 from rest_framework.reverse import reverse
 from rest_framework.views import APIView
 
-from src.adapter.utils import from_cents, create_qr_code_url, input_to_json
+from .utils import str_to_stroops, stroops_to_str, input_to_json, qr_code_path, QR_CODE_FORMATS
+from .aggregates import record_volume, daily_volumes
 from .api import Interface
+from .exports import export_transactions
+from .health import ingest_health
+from .history import transaction_history, user_account_ids, DEFAULT_PAGE_SIZE
+from .metrics import export as export_metrics
 from .models import UserAccount, Asset, AdminAccount, SendTransaction
 from .permissions import AdapterGlobalPermission
+from .registry import invalidate_asset_registry
+from .routers import ReadReplicaMixin
 
 from logging import getLogger
 
 from .throttling import NoThrottling
+from .tracing import span
 
-from .serializers import TransactionSerializer, UserAccountSerializer, AddAssetSerializer
+from .tasks import process_send
+from .serializers import TransactionSerializer, UserAccountSerializer, AddAssetSerializer, \
+    BulkUserAccountSerializer, BulkAddAssetSerializer
 
 logger = getLogger('django')
 
@@ -115,7 +128,16 @@ class SendView(GenericAPIView):
     def post(self, request, *args, **kwargs):
         tx_code = request.data.get('tx_code')
         to_user = request.data.get('to_user')
-        amount = from_cents(request.data.get('amount'), 7)
+        # Rehive amounts are already integers in the smallest unit (stroops):
+        amount = str(request.data.get('amount'))
+        try:
+            if '.' in amount:
+                raise ValueError('Amounts are integer stroops: %s' % amount)
+            amount = str_to_stroops(amount, divisibility=0)
+        except ValueError as exc:
+            raise ParseError(str(exc))
+        if amount <= 0:
+            raise ParseError('Amount must be positive.')
         currency = request.data.get('currency')
         issuer = request.data.get('issuer')
 
@@ -123,24 +145,29 @@ class SendView(GenericAPIView):
         print(currency)
 
         logger.info('To: ' + to_user)
-        logger.info('Amount: ' + str(amount))
+        logger.info('Amount: ' + stroops_to_str(amount))
         logger.info('Currency: ' + currency)
 
-        tx = SendTransaction.objects.create(rehive_code=tx_code,
-                                            recipient=to_user,
-                                            amount=amount,
-                                            currency=currency,
-                                            issuer=issuer)
-
-        tx.execute()
+        with span('send.enqueue', correlation_id=tx_code):
+            tx = SendTransaction.objects.create(admin_account=AdminAccount.objects.get(default=True),
+                                                user_account=UserAccount.objects.filter(
+                                                    user_id=request.data.get('from_user')).first(),
+                                                rehive_code=tx_code,
+                                                recipient=to_user,
+                                                amount=amount,
+                                                currency=currency,
+                                                issuer=issuer)
+            record_volume(tx, 'send')
+
+            # Submitted by the send workers:
+            process_send.delay(tx.id)
         return Response({'status': 'success'})
 
     def get(self, request, *args, **kwargs):
         raise exceptions.MethodNotAllowed('GET')
 
 
-# TODO: Multi asset balance
-class BalanceView(APIView):
+class BalanceView(ReadReplicaMixin, APIView):
     allowed_methods = ('GET',)
     throttle_classes = (NoThrottling,)
     permission_classes = (AllowAny, AdapterGlobalPermission,)
@@ -151,11 +178,12 @@ class BalanceView(APIView):
     def get(self, request, *args, **kwargs):
         account = AdminAccount.objects.get(default=True)
         interface = Interface(account=account)
-        balance = interface.get_balance()
-        return Response({'balance': balance})
+        balances = interface.get_balances()
+        balance = next((b['balance'] for b in balances if b['currency'] == 'XLM' and not b['issuer']), None)
+        return Response({'balance': balance, 'balances': balances})
 
 
-class OperatingAccountView(APIView):
+class OperatingAccountView(ReadReplicaMixin, APIView):
     allowed_methods = ('GET',)
     throttle_classes = (NoThrottling,)
     permission_classes = (AllowAny, AdapterGlobalPermission,)
@@ -166,7 +194,65 @@ class OperatingAccountView(APIView):
     def get(self, request, *args, **kwargs):
         account = AdminAccount.objects.get(default=True)
         interface = Interface(account=account)
-        return Response(interface.get_account_details())
+        details = interface.get_account_details()
+        for key in ('qr_code', 'qr_code_svg'):
+            details['metadata'][key] = request.build_absolute_uri(details['metadata'][key])
+        return Response(details)
+
+
+class QRCodeView(APIView):
+    allowed_methods = ('GET',)
+    throttle_classes = (NoThrottling,)
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    def post(self, request, *args, **kwargs):
+        raise exceptions.MethodNotAllowed('POST')
+
+    def get(self, request, *args, **kwargs):
+        digest = kwargs['digest']
+        fmt = kwargs['fmt']
+
+        # Content addressed, so any cached copy is valid forever:
+        if request.META.get('HTTP_IF_NONE_MATCH') == '"%s"' % digest:
+            response = HttpResponse(status=304)
+        else:
+            try:
+                with open(qr_code_path(digest, fmt), 'rb') as f:
+                    response = HttpResponse(f.read(), content_type=QR_CODE_FORMATS[fmt][1])
+            except FileNotFoundError:
+                raise Http404
+
+        response['ETag'] = '"%s"' % digest
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+
+class IngestHealthView(APIView):
+    allowed_methods = ('GET',)
+    throttle_classes = (NoThrottling,)
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    def post(self, request, *args, **kwargs):
+        raise exceptions.MethodNotAllowed('POST')
+
+    def get(self, request, *args, **kwargs):
+        # Unhealthy answers 503 so load balancers and monitors can act on the status alone:
+        report = ingest_health()
+        return Response(report, status=200 if report['healthy'] else 503)
+
+
+class MetricsView(APIView):
+    allowed_methods = ('GET',)
+    throttle_classes = (NoThrottling,)
+    permission_classes = (AdapterGlobalPermission,)
+
+    def post(self, request, *args, **kwargs):
+        raise exceptions.MethodNotAllowed('POST')
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(export_metrics(), content_type=CONTENT_TYPE_LATEST)
 
 
 class UserAccountView(GenericAPIView):
@@ -191,6 +277,33 @@ class UserAccountView(GenericAPIView):
         raise exceptions.MethodNotAllowed('GET')
 
 
+class BulkUserAccountView(GenericAPIView):
+    allowed_methods = ('POST',)
+    throttle_classes = (NoThrottling,)
+    permission_classes = (AllowAny, AdapterGlobalPermission,)
+    serializer_class = BulkUserAccountSerializer
+
+    # Rows per INSERT statement:
+    batch_size = 10000
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        accounts = [(entry['user_id'], Interface.new_account_id(metadata=entry['metadata']))
+                    for entry in serializer.validated_data['accounts']]
+
+        stored = []
+        for i in range(0, len(accounts), self.batch_size):
+            stored += UserAccount.bulk_get_or_create(accounts[i:i + self.batch_size])
+
+        return Response({'accounts': [OrderedDict([('account_id', account.account_id), ('user_id', account.user_id)])
+                                      for account in stored]})
+
+    def get(self, request, *args, **kwargs):
+        raise exceptions.MethodNotAllowed('GET')
+
+
 class AddAssetView(GenericAPIView):
     allowed_methods = ('POST',)
     throttle_classes = (NoThrottling,)
@@ -215,6 +328,7 @@ class AddAssetView(GenericAPIView):
             if not Asset.objects.filter(code=asset_code, account_id=issuer_address).exists():
                 interface.trust_issuer(asset_code, issuer)
                 Asset.objects.create(code=asset_code, issuer=issuer, account_id=issuer_address, metadata=metadata)
+                invalidate_asset_registry()
             else:
                 logger.info('Issuer already trusted: %s %s' % (issuer, asset_code))
                 issuer = Asset.objects.get(code=asset_code, account_id=issuer_address).issuer
@@ -231,3 +345,145 @@ class AddAssetView(GenericAPIView):
 
     def get(self, request, *args, **kwargs):
         raise exceptions.MethodNotAllowed('GET')
+
+
+class TransactionExportView(GenericAPIView):
+    allowed_methods = ('GET',)
+    throttle_classes = (NoThrottling,)
+    permission_classes = (AdapterGlobalPermission,)
+
+    def post(self, request, *args, **kwargs):
+        raise exceptions.MethodNotAllowed('POST')
+
+    def get(self, request, *args, **kwargs):
+        tx_type = request.query_params.get('type', 'receive')
+        output = request.query_params.get('output', 'ndjson')
+        compress = request.query_params.get('gzip') in ('true', 'True', '1')
+
+        try:
+            chunks = export_transactions(tx_type,
+                                         output=output,
+                                         compress=compress,
+                                         date_from=request.query_params.get('date_from'),
+                                         date_to=request.query_params.get('date_to'),
+                                         status=request.query_params.get('status'),
+                                         currency=request.query_params.get('currency'),
+                                         account=request.query_params.get('account'))
+        except ValueError as exc:
+            raise ParseError(str(exc))
+
+        content_type = 'application/x-ndjson' if output == 'ndjson' else 'text/csv'
+        filename = '%s_transactions.%s' % (tx_type, output)
+        if compress:
+            content_type = 'application/gzip'
+            filename += '.gz'
+
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+        return response
+
+
+class UserTransactionHistoryView(ReadReplicaMixin, GenericAPIView):
+    allowed_methods = ('GET',)
+    throttle_classes = (NoThrottling,)
+    permission_classes = (AdapterGlobalPermission,)
+
+    def post(self, request, *args, **kwargs):
+        raise exceptions.MethodNotAllowed('POST')
+
+    def get(self, request, *args, **kwargs):
+        user_id = request.query_params.get('user_id')
+        account_id = request.query_params.get('account_id')
+        if not (user_id or account_id):
+            raise ParseError('Either user_id or account_id is required.')
+
+        try:
+            cursor = request.query_params.get('cursor')
+            cursor = int(cursor) if cursor else None
+            limit = int(request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+            rows, next_cursor = transaction_history(request.query_params.get('type', 'receive'),
+                                                    user_account_ids(user_id=user_id, account_id=account_id),
+                                                    cursor=cursor,
+                                                    limit=limit)
+        except ValueError as exc:
+            raise ParseError(str(exc))
+
+        return Response(OrderedDict([('next', next_cursor),
+                                     ('results', rows)]))
+
+
+class DailyVolumeView(ReadReplicaMixin, GenericAPIView):
+    allowed_methods = ('GET',)
+    throttle_classes = (NoThrottling,)
+    permission_classes = (AdapterGlobalPermission,)
+
+    def post(self, request, *args, **kwargs):
+        raise exceptions.MethodNotAllowed('POST')
+
+    def get(self, request, *args, **kwargs):
+        volumes = daily_volumes(date_from=request.query_params.get('date_from'),
+                                date_to=request.query_params.get('date_to'),
+                                account=request.query_params.get('account'),
+                                currency=request.query_params.get('currency'),
+                                direction=request.query_params.get('direction'),
+                                status=request.query_params.get('status'))
+        return Response({'results': list(volumes)})
+
+
+class BulkAddAssetView(GenericAPIView):
+    allowed_methods = ('POST',)
+    throttle_classes = (NoThrottling,)
+    permission_classes = (AllowAny, AdapterGlobalPermission,)
+    serializer_class = BulkAddAssetSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        entries = serializer.validated_data['assets']
+
+        account = AdminAccount.objects.get(default=True)
+        interface = Interface(account=account)
+
+        # Resolve all issuers concurrently:
+        addresses = interface.resolve_issuer_addresses([(e['code'], e['issuer']) for e in entries])
+
+        existing = set(Asset.objects.filter(
+            code__in={e['code'] for e in entries},
+            account_id__in={a for a in addresses.values() if a}).values_list('code', 'account_id'))
+
+        # Each new (code, address) pair is trusted once, in as few transactions as possible:
+        new_assets = OrderedDict()
+        for entry in entries:
+            address = addresses[(entry['code'], entry['issuer'])]
+            if address and (entry['code'], address) not in existing:
+                new_assets.setdefault((entry['code'], address), entry)
+
+        trusted = set(interface.trust_issuers(list(new_assets)))
+        Asset.objects.bulk_create([Asset(code=code,
+                                         issuer=entry['issuer'],
+                                         account_id=address,
+                                         metadata=entry.get('metadata') or {})
+                                   for (code, address), entry in new_assets.items() if (code, address) in trusted])
+        if trusted:
+            invalidate_asset_registry()
+
+        results = []
+        for entry in entries:
+            address = addresses[(entry['code'], entry['issuer'])]
+            if not address:
+                status = 'unresolved'
+            elif (entry['code'], address) in existing:
+                status = 'existing'
+            elif (entry['code'], address) in trusted:
+                status = 'trusted'
+            else:
+                status = 'failed'
+            results.append(OrderedDict([('code', entry['code']),
+                                        ('issuer', entry['issuer']),
+                                        ('account_id', address),
+                                        ('status', status)]))
+
+        return Response({'status': 'success', 'assets': results})
+
+    def get(self, request, *args, **kwargs):
+        raise exceptions.MethodNotAllowed('GET')
@@ -0,0 +1,35 @@
+"""
+Cooperative (gevent) WSGI config for the I/O-bound adapter endpoints: federation, operating
+balance and account, and send enqueueing.
+
+Django 1.9 has no ASGI support, so the async serving mode runs the same views on gevent
+workers instead: gunicorn's gevent worker monkey patches sockets, threads and locks before
+this module is loaded, and psycopg2 is made cooperative here with psycogreen. Every request
+runs in a greenlet, so a worker process waits on hundreds of Horizon, federation, broker and
+Postgres calls at once instead of one per thread.
+
+Serve with:
+
+    gunicorn config.async_wsgi:application --config file:config/gunicorn.py \
+        --worker-class gevent --worker-connections 200
+
+Each in-flight request holds its own database connection, so workers x worker-connections
+must stay below the Postgres connection limit.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+from gevent import monkey
+from psycogreen.gevent import patch_psycopg
+
+if not monkey.is_module_patched('socket'):
+    raise ImproperlyConfigured('config.async_wsgi must be served by a gevent worker (--worker-class gevent).')
+
+patch_psycopg()
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings_adapter")
+
+application = get_wsgi_application()
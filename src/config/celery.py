@@ -2,6 +2,7 @@ from __future__ import absolute_import
 
 import os
 from celery import Celery
+from celery.signals import celeryd_init
 from django.conf import settings
 
 if not os.environ.get("DJANGO_SETTINGS_MODULE", ''):
@@ -11,6 +12,14 @@ app = Celery('config')
 app.config_from_object('django.conf:settings')
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 
+
+@celeryd_init.connect
+def setup_metrics(**kwargs):
+    # Before the tasks (and prometheus_client) are imported and the pool forks:
+    from .metrics import setup_metrics_dir
+    setup_metrics_dir(settings.METRICS_DIR)
+
+
 @app.task(bind=True)
 def debug_task(self):
     print('Request: {0!r}'.format(self.request))
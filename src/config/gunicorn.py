@@ -9,3 +9,16 @@ log_level = 'info'
 log_file = '-'
 pythonpath = '/app/'
 forwarded_allow_ips = '*'
+
+
+def on_starting(server):
+    # Before any worker forks (and imports prometheus_client):
+    from config.metrics import setup_metrics_dir
+    from config.plugins.adapter import METRICS_DIR
+    setup_metrics_dir(METRICS_DIR)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid, os.environ['PROMETHEUS_MULTIPROC_DIR'])
@@ -0,0 +1,18 @@
+"""
+Prometheus multiprocess directory setup, run by the gunicorn and celery master processes before they fork.
+"""
+import os
+import shutil
+import socket
+
+
+def setup_metrics_dir(root: str) -> str:
+    # Pids are only unique within a container, so each one writes to its own directory under the shared root:
+    directory = os.path.join(root, socket.gethostname())
+
+    # Files left by the previous run would otherwise be aggregated (and their pids reused) forever:
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = directory
+    return directory
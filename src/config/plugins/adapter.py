@@ -0,0 +1,41 @@
+import os
+
+# Adapter runtime settings, shared by the full (config.settings) and lean (config.settings_adapter) profiles.
+
+_project_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../..'))
+
+# Root of the Prometheus multiprocess directories of all gunicorn and celery containers (see config/metrics.py):
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(_project_dir, 'var/metrics'))
+
+# Cache
+# ---------------------------------------------------------------------------------------------------------------------
+# File based so that web and worker processes sharing /var see the same entries and invalidations.
+CACHE_DIR = os.path.join(_project_dir, 'var/cache')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'django'),
+    }
+}
+
+# Transaction table partitioning and cold data archiving
+# ---------------------------------------------------------------------------------------------------------------------
+ARCHIVE_DIR = os.path.join(_project_dir, 'var/archive')
+TRANSACTION_PARTITION_MONTHS_AHEAD = 3
+TRANSACTION_RETENTION_MONTHS = int(os.environ.get('TRANSACTION_RETENTION_MONTHS', 12))
+
+# Collapsed-stack profiles written by the sampling profiler:
+PROFILING_DIR = os.path.join(_project_dir, 'var/profiles')
+
+# JSON reports of manage.py benchmark:
+BENCHMARK_DIR = os.path.join(_project_dir, 'var/benchmarks')
+
+# Upper bound (seconds) on how stale a served operating account balance can be.
+ADAPTER_BALANCE_CACHE_TIMEOUT = int(os.environ.get('ADAPTER_BALANCE_CACHE_TIMEOUT', 15))
+
+# Connections kept alive per upstream host (Horizon, federation servers). Raise it with the
+# worker concurrency, e.g. to the gevent worker-connections of the async serving mode:
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 10))
+
+# Default (connect, read) timeout in seconds of upstream requests that don't set their own:
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', 10))
@@ -10,3 +10,17 @@ DATABASES = {
         'PORT': os.environ.get('POSTGRES_1_PORT_5432_TCP_PORT', '7654')
     }
 }
+
+# Read replicas (comma separated host:port list) used for read-only endpoints and reporting.
+DATABASE_REPLICAS = []
+for i, replica in enumerate(filter(None, os.environ.get('POSTGRES_REPLICAS', '').split(','))):
+    host, _, port = replica.partition(':')
+    alias = 'replica_%s' % i
+    DATABASES[alias] = dict(DATABASES['default'], HOST=host, PORT=port or DATABASES['default']['PORT'])
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['adapter.routers.ReplicaRouter']
+
+# Replicas further behind the primary than this (seconds) are skipped:
+DATABASE_REPLICA_MAX_LAG = int(os.environ.get('DATABASE_REPLICA_MAX_LAG', 10))
+DATABASE_REPLICA_CHECK_INTERVAL = 5
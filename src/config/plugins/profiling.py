@@ -0,0 +1,17 @@
+import os
+
+# Sampling profiler for requests and Celery tasks (see adapter/profiling.py):
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '') in ['True', True, 'true']
+
+# Fraction of requests and tasks that are profiled:
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01))
+
+# Seconds between stack samples:
+PROFILING_INTERVAL = 0.005
+
+# Bounds on overhead, per process:
+PROFILING_MAX_CONCURRENT = 2
+PROFILING_MAX_SAMPLES = 2000
+
+# Seconds between writes of the aggregated profiles:
+PROFILING_FLUSH_INTERVAL = 60
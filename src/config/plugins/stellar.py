@@ -0,0 +1,18 @@
+import os
+
+# Account federation lookups resolve to (payments to it are ingested with the memo):
+STELLAR_RECEIVE_ADDRESS = os.environ.get('STELLAR_RECEIVE_ADDRESS', '')
+
+# Horizon servers per network, comma separated (e.g. HORIZON_PUBLIC_ENDPOINTS=https://a.org,https://b.org).
+# Networks without an entry use the SDF servers.
+HORIZON_ENDPOINTS = {}
+for network in ('public', 'testnet'):
+    endpoints = os.environ.get('HORIZON_%s_ENDPOINTS' % network.upper(), '')
+    if endpoints:
+        HORIZON_ENDPOINTS[network] = endpoints.split(',')
+
+HORIZON_TIMEOUT = 20
+
+# Hedged reads are duplicated to a second server once the first is slower than this percentile:
+HORIZON_HEDGE_PERCENTILE = 95
+HORIZON_HEDGE_DEFAULT_DELAY = 0.5
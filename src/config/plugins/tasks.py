@@ -1,8 +1,6 @@
 from datetime import timedelta
 import os
 
-CELERY_IMPORTS = ("wander.models",)
-
 CELERY_ENABLE_UTC = True
 CELERY_TIMEZONE = "UTC"
 
@@ -14,18 +12,77 @@ HOST_NAME = os.environ.get('HOST_NAME', 'local')
 default_queue = '-'.join(('general', HOST_NAME))
 CELERY_DEFAULT_QUEUE = default_queue
 
-BROKER_TRANSPORT = 'sqs'
-BROKER_TRANSPORT_OPTIONS = {
-    'region': 'eu-west-1',
-    'visibility_timeout': 43200,
-    'polling_interval': 1,
+# Dedicated queues (and worker pools, see docker-compose.yml) so latency critical work
+# never waits behind bulk Rehive retries or maintenance:
+ingest_queue = '-'.join(('ingest', HOST_NAME))
+send_queue = '-'.join(('send', HOST_NAME))
+rehive_queue = '-'.join(('rehive', HOST_NAME))
+maintenance_queue = '-'.join(('maintenance', HOST_NAME))
+
+CELERY_ROUTES = {
+    'adapter.process_receive.task': {'queue': ingest_queue},
+    'adapter.ensure_receive_ingest.task': {'queue': ingest_queue},
+    'adapter.process_send.task': {'queue': send_queue},
+    'adapter.create_rehive_receive.task': {'queue': rehive_queue},
+    'adapter.confirm_rehive_tx.task': {'queue': rehive_queue},
+    'adapter.ensure_transaction_partitions.task': {'queue': maintenance_queue},
+    'adapter.refresh_daily_volumes.task': {'queue': maintenance_queue},
+    'adapter.refresh_asset_registry.task': {'queue': maintenance_queue},
 }
 
+# BROKER_TRANSPORT=memory gives an in-process broker for tests, optionally with CELERY_ALWAYS_EAGER=True.
+BROKER_TRANSPORT = os.environ.get('BROKER_TRANSPORT', 'sqs')
+if BROKER_TRANSPORT == 'memory':
+    BROKER_URL = 'memory://'
+    CELERY_ALWAYS_EAGER = os.environ.get('CELERY_ALWAYS_EAGER', '') in ['True', True, 'true']
+else:
+    BROKER_TRANSPORT_OPTIONS = {
+        'region': 'eu-west-1',
+        'visibility_timeout': 43200,
+        'polling_interval': 1,
+    }
+
 CELERYBEAT_SCHEDULE = {
+    # The receive ingest schedules itself around ledger closes, the beat only restarts it if it stopped:
     'check_stellar_receive': {
-        'task': 'stellar_adapter.tasks.process_receive',
-        'schedule': timedelta(seconds=1),
+        'task': 'adapter.ensure_receive_ingest.task',
+        'schedule': timedelta(seconds=15),
+        'args': ()
+    },
+    'refresh_asset_registry': {
+        'task': 'adapter.refresh_asset_registry.task',
+        'schedule': timedelta(hours=1),
+        'args': ()
+    },
+    'refresh_daily_volumes': {
+        'task': 'adapter.refresh_daily_volumes.task',
+        'schedule': timedelta(minutes=15),
+        'args': ()
+    },
+    'ensure_transaction_partitions': {
+        'task': 'adapter.ensure_transaction_partitions.task',
+        'schedule': timedelta(days=1),
         'args': ()
     },
 }
 
+# Adaptive receive ingest (see adapter/scheduler.py), times in seconds:
+INGEST_LEDGER_INTERVAL = 5.0
+INGEST_CLOSE_OFFSET = 0.5
+INGEST_MIN_DELAY = 1.0
+INGEST_MAX_DELAY = 30.0
+INGEST_MAX_IDLE_LEDGERS = 4
+INGEST_ERROR_DELAY = 5.0
+
+# Set where drain_rehive runs regularly, only then are stale Waiting receives a health problem:
+REHIVE_DRAINER_ENABLED = os.environ.get('REHIVE_DRAINER_ENABLED', '') in ['True', True, 'true']
+# Failed confirmations of a receive before the drainer stops retrying it:
+REHIVE_CONFIRM_MAX_ATTEMPTS = int(os.environ.get('REHIVE_CONFIRM_MAX_ATTEMPTS', 24))
+
+# Ingest health (see adapter/health.py), an account over any threshold is reported unhealthy:
+HEALTH_MAX_LAG_LEDGERS = int(os.environ.get('HEALTH_MAX_LAG_LEDGERS', 12))
+HEALTH_MAX_LAG_SECONDS = int(os.environ.get('HEALTH_MAX_LAG_SECONDS', 60))
+HEALTH_MAX_WAITING_RECEIVES = int(os.environ.get('HEALTH_MAX_WAITING_RECEIVES', 500))
+HEALTH_WAITING_RECEIVE_AGE = int(os.environ.get('HEALTH_WAITING_RECEIVE_AGE', 300))
+HEALTH_MAX_PENDING_SEND_AGE = int(os.environ.get('HEALTH_MAX_PENDING_SEND_AGE', 300))
+HEALTH_COUNT_LIMIT = 10000
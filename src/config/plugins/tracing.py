@@ -0,0 +1,11 @@
+import os
+
+# Spans of the send and receive pipelines (see adapter/tracing.py) are exported as OTLP/JSON
+# to a file and/or an OTLP/HTTP collector (e.g. http://collector:4318/v1/traces). Off when neither is set.
+TRACING_FILE = os.environ.get('TRACING_FILE')
+TRACING_OTLP_ENDPOINT = os.environ.get('TRACING_OTLP_ENDPOINT')
+TRACING_SERVICE_NAME = os.environ.get('TRACING_SERVICE_NAME', 'adapter')
+
+# Spans per export request and seconds to wait for a batch to fill:
+TRACING_BATCH_SIZE = 100
+TRACING_FLUSH_INTERVAL = 1.0
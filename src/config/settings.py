@@ -19,6 +19,10 @@ from .plugins.rest_framework import *
 from .plugins.database import *
 from .plugins.tasks import *
 from .plugins.authentication import *
+from .plugins.stellar import *
+from .plugins.profiling import *
+from .plugins.tracing import *
+from .plugins.adapter import *
 
 
 # LOGGING
@@ -76,6 +80,7 @@ MIDDLEWARE_CLASSES = [
     'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'adapter.profiling.ProfilingMiddleware',
 ]
 
 MIDDLEWARE_CLASSES += ['django.middleware.locale.LocaleMiddleware', ]
@@ -189,8 +194,6 @@ FIXTURE_DIRS = ['config/fixtures']
 
 SITE_HEADER = 'Wander'
 
-CACHE_DIR = os.path.join(PROJECT_DIR, 'var/cache')
-
 AUTH_USER_MODEL = 'administration.User'
 
 FORMAT_MODULE_PATH = 'config.formats'
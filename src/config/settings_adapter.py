@@ -0,0 +1,85 @@
+"""
+Lean settings profile for processes that only run the adapter: Celery workers and the
+adapter API (select with DJANGO_SETTINGS_MODULE=config.settings_adapter).
+
+Only the apps, middleware and plugins src/adapter needs are loaded, so workers skip the
+admin, allauth, two-factor auth, guardian, user sessions, flatpages, twilio, SES and JWT
+imports and app registry setup that the full config.settings profile pays for.
+"""
+
+from logging import getLogger
+
+import os
+
+from .plugins.secrets import *
+from .plugins.database import *
+from .plugins.tasks import *
+from .plugins.stellar import *
+from .plugins.profiling import *
+from .plugins.tracing import *
+from .plugins.adapter import *
+
+
+# LOGGING
+# ---------------------------------------------------------------------------------------------------------------------#
+logger = getLogger('django')
+
+
+# Project paths
+# ---------------------------------------------------------------------------------------------------------------------#
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.abspath(os.path.join(BASE_DIR, '..'))
+
+ALLOWED_HOSTS = ['*']
+
+# Installed apps
+# ---------------------------------------------------------------------------------------------------------------------
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'rest_framework',
+
+    'adapter',
+]
+
+# Middleware
+# ---------------------------------------------------------------------------------------------------------------------
+MIDDLEWARE_CLASSES = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'adapter.profiling.ProfilingMiddleware',
+]
+
+ROOT_URLCONF = 'config.urls_adapter'
+
+WSGI_APPLICATION = 'config.wsgi.application'
+
+# REST FRAMEWORK
+# ---------------------------------------------------------------------------------------------------------------------
+# Adapter views authenticate with the adapter secret (see adapter/permissions.py):
+REST_FRAMEWORK = {
+    'DEFAULT_PERMISSION_CLASSES': (
+        'rest_framework.permissions.IsAuthenticated',
+    ),
+    'DEFAULT_AUTHENTICATION_CLASSES': (),
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+    ),
+    'UNAUTHENTICATED_USER': None,
+}
+
+# Internationalization
+# ---------------------------------------------------------------------------------------------------------------------
+LANGUAGE_CODE = 'en'
+
+TIME_ZONE = 'Africa/Johannesburg'
+
+USE_I18N = False
+
+USE_L10N = False
+
+USE_TZ = True
+
+# Other
+# ---------------------------------------------------------------------------------------------------------------------
+VERSION = '1.0.0'
@@ -0,0 +1,6 @@
+from django.conf.urls import include, url
+
+# Adapter API only, for the lean config.settings_adapter profile:
+urlpatterns = [
+    url(r'^api/1/', include('adapter.urls', namespace='adapter-api')),
+]